@@ -1,5 +1,6 @@
 """ Palpiteiro web-app. """
 
+import concurrent.futures
 import os
 import time
 
@@ -7,14 +8,97 @@ import pandas as pd
 import streamlit as st
 
 import helper
+import palpiteiro.cache
 import palpiteiro.data
 import palpiteiro.draft
+import palpiteiro.recommendations
 
 # Constants.
 APP_NAME = "Palpiteiro"
 SUBTITLE = "Recomendação de escalações para o Cartola FC"
 THIS_FOLDER = os.path.dirname(__file__)
 FAVICON = os.path.join("img", "soccerball.png")
+DRAFT_TIME_BUDGET = 10  # seconds
+DRAFT_PATIENCE = 200  # generations
+RECOMMENDATIONS_STEP = 0.5  # cartoletas
+# Folder to record the live drafts generations statistics, for profiling.
+DRAFT_STATS_FOLDER = os.environ.get("PALPITEIRO_DRAFT_STATS")
+
+
+@st.cache(allow_output_mutation=True)
+def http_cache() -> palpiteiro.cache.HTTPCache:
+    """ Cartola FC responses cache, shared by all sessions. """
+    return palpiteiro.cache.HTTPCache(os.path.join(THIS_FOLDER, "cache", "cartola"))
+
+
+@st.cache(allow_output_mutation=True)
+def cartola_fc_api() -> palpiteiro.data.CartolaFCAPI:
+    """ Cartola FC API with a pooled session, shared by all sessions and stages. """
+    return palpiteiro.data.CartolaFCAPI(cache=http_cache())
+
+
+# Data preparation stages. They are shared by all sessions on the server and run
+# again only when the market round or the odds bucket changes, so keys must have
+# both even if a stage doesn't use them. Outputs aren't hashed, don't mutate them.
+
+
+@st.cache(allow_output_mutation=True, show_spinner=False, max_entries=4)
+def load_clubs(
+    market: tuple, odds_bucket: str  # pylint: disable=unused-argument
+) -> pd.DataFrame:
+    """ Clubs with odds. """
+    return palpiteiro.data.get_clubs_with_odds(
+        key=st.secrets["THE_ODDS_API"],
+        cache_folder=os.path.join(THIS_FOLDER, "cache"),
+        cartola_api=cartola_fc_api(),
+    )
+
+
+@st.cache(allow_output_mutation=True, show_spinner=False, max_entries=4)
+def load_players(market: tuple, odds_bucket: str) -> list:
+    """ Players that may play for clubs with odds, with predicted points. """
+    players = palpiteiro.create_all_players(
+        cartola_fc_api().players(), load_clubs(market, odds_bucket)
+    )
+    # Keep only players that may play.
+    players = [player for player in players if player.status in [2, 7]]
+    # Keep only players from teams that have odds available.
+    return [player for player in players if pd.notna(player.club.win_odds)]
+
+
+@st.cache(allow_output_mutation=True, show_spinner=False, max_entries=4)
+def load_schemes(market: tuple) -> list:  # pylint: disable=unused-argument
+    """ Schemes. """
+    return palpiteiro.create_schemes(cartola_fc_api().schemes())
+
+
+@st.cache(allow_output_mutation=True, show_spinner=False, max_entries=4)
+def load_matches(market: tuple, odds_bucket: str) -> str:
+    """ Matches with odds. """
+    return palpiteiro.data.get_matches(
+        key=st.secrets["THE_ODDS_API"],
+        strf="%d/%m/%y",
+        clubs=load_clubs(market, odds_bucket),
+        cache_folder=os.path.join(THIS_FOLDER, "cache"),
+    )
+
+
+@st.cache(allow_output_mutation=True)
+def precompute_executor() -> concurrent.futures.ThreadPoolExecutor:
+    """ Background worker for the recommendations, shared by all sessions. """
+    return concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+
+@st.cache(allow_output_mutation=True, show_spinner=False, max_entries=4)
+def load_recommendations(market: tuple, odds_bucket: str) -> concurrent.futures.Future:
+    """ Start drafting line-ups for the default selections in the background. """
+    return precompute_executor().submit(
+        palpiteiro.recommendations.RecommendationTable.precompute,
+        players=load_players(market, odds_bucket),
+        schemes=load_schemes(market),
+        step=RECOMMENDATIONS_STEP,
+    )
+
 
 # Page title and configs.
 st.set_page_config(page_title=APP_NAME, page_icon=FAVICON)
@@ -25,24 +109,18 @@ st.text(SUBTITLE)
 st.sidebar.title("Configurações")
 money = st.sidebar.number_input("Cartoletas", min_value=0.0, value=100.0, format="%.1f")
 
-# Get clubs.
-key = st.secrets["THE_ODDS_API"]
-clubs = palpiteiro.data.get_clubs_with_odds(
-    key=key, cache_folder=os.path.join(THIS_FOLDER, "cache")
-)
-
-# Initialize Cartola FC API.
-cartola_fc_api = palpiteiro.data.CartolaFCAPI()
+# Stages keys. The market changes with the round and when it opens or closes.
+market_status = cartola_fc_api().market_status()
+market_key = (market_status.get("rodada_atual"), market_status.get("status_mercado"))
+odds_key = palpiteiro.data.odds_bucket()
 
-# Players.
-players = palpiteiro.create_all_players(cartola_fc_api.players(), clubs)
-# Keep only players that may play.
-players = [player for player in players if player.status in [2, 7]]
-# Keep only players from teams that have odds available.
-players = [player for player in players if pd.notna(player.club.win_odds)]
+# Get clubs, players and schemes.
+clubs = load_clubs(market_key, odds_key)
+players = load_players(market_key, odds_key)
+all_schemes = load_schemes(market_key)
 
-# Schemes.
-schemes = palpiteiro.create_schemes(cartola_fc_api.schemes())
+# Recommendations start as soon as the market changes, before anyone asks.
+recommendations = load_recommendations(market_key, odds_key)
 
 # Select teams.
 clubs_names = sorted(clubs.dropna(subset=["win_odds"])["nome"])
@@ -52,7 +130,9 @@ selected_clubs = st.sidebar.multiselect(
 players = [player for player in players if player.club.name in selected_clubs]
 
 # Select schemes.
-schemes = st.sidebar.multiselect("Esquemas Táticos", options=schemes, default=schemes)
+schemes = st.sidebar.multiselect(
+    "Esquemas Táticos", options=all_schemes, default=all_schemes
+)
 
 # About the app
 with open(os.path.join(THIS_FOLDER, "SOBRE.md"), encoding="utf-8") as file:
@@ -83,23 +163,42 @@ if len(schemes) == 0:
 # Get line up.
 if st.button("Escalar"):
     with st.spinner("Por favor aguarde enquanto o algoritmo escolhe os jogadores..."):
-        try:
-            line_up = palpiteiro.draft.draft(
-                individuals=100,
-                generations=1000,
-                players=players,
-                schemes=schemes,
-                max_price=money,
-                tournament_size=5,
-            )
-        except RecursionError:
-            st.error(
-                "Não foi possível montar um escalação para esta quantidade de cartoletas "
-                "com os times e formações táticas selecionados. "
-                "Experimente adicionar mais time e formações táticas, "
-                "ou aumentar a quantidade de cartoletas."
-            )
-            st.stop()
+        # Default selections are answered from the recommendations.
+        line_up = None
+        all_clubs = len(selected_clubs) == len(clubs_names)
+        if all_clubs and len(schemes) == len(all_schemes):
+            concurrent.futures.wait([recommendations], timeout=DRAFT_TIME_BUDGET)
+            if recommendations.done() and recommendations.exception() is None:
+                line_up = recommendations.result().line_up(money)
+
+        # Custom selections, or budgets the recommendations don't have, are drafted.
+        if line_up is None:
+            recorder = palpiteiro.draft.GenerationRecorder()
+            try:
+                line_up = palpiteiro.draft.draft(
+                    individuals=100,
+                    generations=1000,
+                    players=players,
+                    schemes=schemes,
+                    max_price=money,
+                    tournament_size=5,
+                    time_budget=DRAFT_TIME_BUDGET,
+                    patience=DRAFT_PATIENCE,
+                    observer=recorder if DRAFT_STATS_FOLDER else None,
+                )
+            except palpiteiro.draft.InfeasibleBudget:
+                st.error(
+                    "Não foi possível montar um escalação para esta quantidade de "
+                    "cartoletas com os times e formações táticas selecionados. "
+                    "Experimente adicionar mais time e formações táticas, "
+                    "ou aumentar a quantidade de cartoletas."
+                )
+                st.stop()
+
+            if DRAFT_STATS_FOLDER:
+                recorder.to_csv(
+                    os.path.join(DRAFT_STATS_FOLDER, f"{time.time():.6f}.csv")
+                )
 
     # Show line up.
     st.header("Aqui está a sua escalação")
@@ -130,11 +229,4 @@ if st.button("Escalar"):
     st.text(f"Custo Total\t\t{line_up.price:.1f} cartoletas")
 
     st.header("Partidas Consideradas")
-    st.text(
-        palpiteiro.data.get_matches(
-            key=key,
-            strf="%d/%m/%y",
-            clubs=clubs,
-            cache_folder=os.path.join(THIS_FOLDER, "cache"),
-        )
-    )
+    st.text(load_matches(market_key, odds_key))
@@ -0,0 +1,90 @@
+""" Betting lines cleaning of large payloads, against the per-match cleaning. """
+
+import argparse
+import datetime
+import os
+
+import numpy as np
+import pandas as pd
+
+import palpiteiro.data
+
+from benchmarks import fixtures
+from benchmarks.suite import measure
+
+
+def per_match(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Clean betting lines one match at a time, like before vectorizing.
+
+    Repeated sites are averaged as many times as they show up.
+    """
+    data = data[data["sites_count"] > 0].copy()
+
+    delta = datetime.timedelta(hours=3)  # From UTC to BRT
+    data["date"] = [time_stamp - delta for time_stamp in data["commence_time"]]
+    data["home_team_index"] = [
+        teams.index(home) for teams, home in zip(data["teams"], data["home_team"])
+    ]
+    data["away_team_index"] = 1 - data["home_team_index"]
+    data["away_team"] = [
+        teams[home_idx]
+        for teams, home_idx in zip(data["teams"], data["away_team_index"])
+    ]
+    odds = [
+        np.array([row["odds"]["h2h"] for row in sites]).mean(0)
+        for sites in data["sites"]
+    ]
+    data["home_team_odds"] = [
+        row[i] for row, i in zip(odds, data["home_team_index"] * 2)
+    ]
+    data["draw_odds"] = [row[1] for row in odds]
+    data["away_team_odds"] = [
+        row[i] for row, i in zip(odds, data["away_team_index"] * 2)
+    ]
+    return data[
+        [
+            "date",
+            "home_team",
+            "away_team",
+            "home_team_odds",
+            "draw_odds",
+            "away_team_odds",
+        ]
+    ]
+
+
+def payload(copies: int, regions: int) -> pd.DataFrame:
+    """ Repeat the tests betting lines, with each site listed once per region. """
+    raw = pd.read_json(os.path.join(fixtures.TESTS_DATA_FOLDER, "betting_lines.json"))
+    data = pd.concat([raw] * copies, ignore_index=True)
+    data["sites"] = [
+        [dict(site, region=region) for region in range(regions) for site in sites]
+        for sites in data["sites"]
+    ]
+    data["sites_count"] = data["sites"].str.len()
+    return data
+
+
+def main():
+    """ Run benchmark. """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print("copies\tregions\tper_match\tvectorized\tspeedup")
+    for copies, regions in [(1, 1), (10, 1), (50, 1), (10, 5), (50, 5)]:
+        data = payload(copies, regions)
+        slow = measure((lambda data=data: per_match(data), 1), args.repeat)["best"]
+        fast = measure(
+            (lambda data=data: palpiteiro.data.TheOddsAPI.clean_betting_lines(data), 1),
+            args.repeat,
+        )["best"]
+        print(
+            f"{copies}\t{regions}\t{slow * 1000:.1f} ms\t{fast * 1000:.1f} ms"
+            f"\t{slow / fast:.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+""" Player construction with per-player and batched model inference. """
+
+import time
+
+import joblib
+
+import palpiteiro
+
+from benchmarks import fixtures
+
+
+def per_player(players, clubs, model):
+    """
+    Create players calling the model once per player, like before batching.
+
+    Each predictable player is predicted with a one-row nested list.
+    """
+    players_dict = players.to_dict(orient="index")
+    clubs_dict = clubs.to_dict(orient="index")
+    created = []
+    for i in players.index:
+        player = palpiteiro.Player(i, players_dict, clubs_dict, predict=False)
+        features = player.features
+        if features is not None:
+            player.predicted_points = model.predict([features])[0][0]
+        created.append(player)
+    return created
+
+
+def batched(players, clubs):
+    """ Create players calling the model once for all of them. """
+    return palpiteiro.create_all_players(players, clubs)
+
+
+def main():
+    """ Run benchmark. """
+    players = fixtures.load_players_data()
+    clubs = fixtures.load_clubs()
+    batched(players, clubs)  # Warm up, like loading the model.
+
+    # The scikit-learn pipeline is the baseline. Unpickling it needs its packages.
+    try:
+        pipeline = joblib.load(palpiteiro.MODEL_PATH)
+    except ImportError as error:
+        print(f"per_player_pipeline\tskipped ({error})")
+    else:
+        start = time.perf_counter()
+        per_player(players, clubs, pipeline)
+        print(f"per_player_pipeline\t{time.perf_counter() - start:.3f} s")
+
+    start = time.perf_counter()
+    per_player(players, clubs, palpiteiro.get_model())
+    print(f"per_player_knn\t{time.perf_counter() - start:.3f} s")
+
+    start = time.perf_counter()
+    batched(players, clubs)
+    print(f"batched\t{time.perf_counter() - start:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
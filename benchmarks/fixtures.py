@@ -0,0 +1,61 @@
+""" Offline data for the benchmarks. """
+
+import json
+import os
+from typing import List
+
+import pandas as pd
+
+import palpiteiro
+import palpiteiro.data
+
+THIS_FOLDER = os.path.dirname(__file__)
+TESTS_DATA_FOLDER = os.path.join(THIS_FOLDER, "..", "tests", "data")
+CLUBS_NAMES_PATH = os.path.join(palpiteiro.data.THIS_FOLDER, "data", "clubs_names.json")
+
+
+def load_clubs() -> pd.DataFrame:
+    """ Create clubs dataframe with odds without requesting the Cartola FC API. """
+    with open(CLUBS_NAMES_PATH, encoding="utf-8") as file:
+        names = json.load(file)["nome"]
+
+    clubs = pd.DataFrame(
+        {
+            "nome": [aliases[0] for aliases in names.values()],
+            "abreviacao": [aliases[0][:3].upper() for aliases in names.values()],
+            "escudos": [{"45x45": "", "30x30": ""} for _ in names],
+        },
+        index=[int(club_id) for club_id in names],
+    )
+
+    odds = palpiteiro.data.TheOddsAPI(
+        "1902", cache_folder=TESTS_DATA_FOLDER, cache_file="betting_lines.json",
+    ).betting_lines()  # Fake key. But doesn't matter.
+    return palpiteiro.data.merge_clubs_and_odds(clubs, odds)
+
+
+def load_players_data() -> pd.DataFrame:
+    """ Load players dataframe from the tests data. """
+    return pd.read_csv(os.path.join(TESTS_DATA_FOLDER, "players.csv"), index_col=0)
+
+
+def load_players() -> List[palpiteiro.Player]:
+    """ Create players that may play for clubs with odds available. """
+    players = palpiteiro.create_all_players(load_players_data(), load_clubs())
+    players = [player for player in players if player.status in [2, 7]]
+    return [player for player in players if pd.notna(player.club.win_odds)]
+
+
+def load_schemes() -> List[palpiteiro.Scheme]:
+    """ Create Cartola FC schemes. """
+    schemes = [
+        # Goalkeepers, fullbacks, defenders, midfielders, forwards and coaches.
+        (1, 0, 3, 4, 3, 1),
+        (1, 0, 3, 5, 2, 1),
+        (1, 2, 2, 3, 3, 1),
+        (1, 2, 2, 4, 2, 1),
+        (1, 2, 2, 5, 1, 1),
+        (1, 2, 3, 3, 2, 1),
+        (1, 2, 3, 4, 1, 1),
+    ]
+    return [palpiteiro.Scheme(*scheme) for scheme in schemes]
@@ -0,0 +1,58 @@
+""" Startup latency of importing palpiteiro modules in a fresh interpreter. """
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+MODULES = ["palpiteiro", "palpiteiro.data", "palpiteiro.draft"]
+
+# Modules that only predicting should import.
+HEAVY_MODULES = ["joblib", "sklearn"]
+
+SCRIPT = """
+import sys
+import time
+
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(elapsed, ",".join(heavy))
+"""
+
+
+def import_time(module: str):
+    """ Import a module in a new process. Get seconds and heavy modules imported. """
+    output = subprocess.run(
+        [sys.executable, "-c", SCRIPT.format(module=module, heavy=HEAVY_MODULES)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.split()
+    return float(output[0]), output[1:]
+
+
+def main():
+    """ Run benchmark. Fails if an import is slower than the maximum seconds. """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=None)
+    args = parser.parse_args()
+
+    print("module\tseconds\theavy")
+    slow = []
+    for module in MODULES:
+        results = [import_time(module) for _ in range(args.repeat)]
+        seconds = statistics.median(elapsed for elapsed, _ in results)
+        heavy = ",".join(results[0][1]) or "-"
+        print(f"{module}\t{seconds:.3f}\t{heavy}")
+        if args.max_seconds is not None and seconds > args.max_seconds:
+            slow.append(module)
+
+    if slow:
+        sys.exit(f"Imports slower than {args.max_seconds} s: {', '.join(slow)}")
+
+
+if __name__ == "__main__":
+    main()
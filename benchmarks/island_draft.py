@@ -0,0 +1,55 @@
+""" Wall-clock speedup of the island model draft against the single process draft. """
+
+import argparse
+import os
+import time
+
+import palpiteiro.draft
+
+from benchmarks import fixtures
+
+
+def main():
+    """ Run benchmark. """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--individuals", type=int, default=100)
+    parser.add_argument("--generations", type=int, default=400)
+    parser.add_argument("--max-processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--max-price", type=float, default=100)
+    args = parser.parse_args()
+
+    players = fixtures.load_players()
+    schemes = fixtures.load_schemes()
+    parameters = {
+        "individuals": args.individuals,
+        "generations": args.generations,
+        "players": players,
+        "schemes": schemes,
+        "max_price": args.max_price,
+        "tournament_size": 5,
+    }
+
+    # Both drafts evaluate individuals * generations line-ups, the islands split the
+    # generations among them.
+    start = time.perf_counter()
+    line_up = palpiteiro.draft.draft(**parameters)
+    reference = time.perf_counter() - start
+    print("processes\tseconds\tspeedup\tpoints")
+    print(f"draft\t{reference:.2f}\t1.00\t{line_up.predicted_points:.1f}")
+
+    processes = 1
+    while processes <= args.max_processes:
+        start = time.perf_counter()
+        line_up = palpiteiro.draft.island_draft(
+            **parameters, islands=processes, processes=processes
+        )
+        elapsed = time.perf_counter() - start
+        print(
+            f"{processes}\t{elapsed:.2f}\t{reference / elapsed:.2f}"
+            f"\t{line_up.predicted_points:.1f}"
+        )
+        processes *= 2
+
+
+if __name__ == "__main__":
+    main()
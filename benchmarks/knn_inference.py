@@ -0,0 +1,47 @@
+""" Throughput of the nearest neighbors model against the scikit-learn pipeline. """
+
+import argparse
+import time
+
+import joblib
+import numpy as np
+
+import palpiteiro
+import palpiteiro.inference
+
+from benchmarks import fixtures
+
+
+def throughput(model, features: np.ndarray, batch_size: int, repeat: int) -> float:
+    """ Get predictions per second predicting features in batches. """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for begin in range(0, len(features), batch_size):
+            model.predict(features[begin : begin + batch_size])
+    return repeat * len(features) / (time.perf_counter() - start)
+
+
+def main():
+    """ Run benchmark. """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pipeline = joblib.load(palpiteiro.MODEL_PATH)
+    predictor = palpiteiro.inference.KNNPredictor.from_pipeline(pipeline)
+
+    table = palpiteiro.PlayerTable(fixtures.load_players_data(), fixtures.load_clubs())
+    _, features = table.features()
+
+    difference = np.abs(pipeline.predict(features) - predictor.predict(features))
+    print(f"max difference\t{difference.max():.2e}")
+
+    print("batch\tpipeline/s\tpredictor/s\tspeedup")
+    for batch_size in [1, 10, 100, len(features)]:
+        slow = throughput(pipeline, features, batch_size, args.repeat)
+        fast = throughput(predictor, features, batch_size, args.repeat)
+        print(f"{batch_size}\t{slow:.0f}\t{fast:.0f}\t{fast / slow:.2f}")
+
+
+if __name__ == "__main__":
+    main()
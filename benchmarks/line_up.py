@@ -0,0 +1,51 @@
+""" Micro-benchmark of LineUp aggregates and their gain in draft. """
+
+import time
+import timeit
+
+import palpiteiro
+import palpiteiro.draft
+
+from benchmarks import fixtures
+
+
+def recomputed_aggregates(line_up: palpiteiro.LineUp):
+    """ Compute price, predicted points and scheme from scratch. """
+    price = sum([player.price for player in line_up])
+    points = sum([player.predicted_points for player in line_up])
+    scheme = palpiteiro.Scheme(
+        *[len([p for p in line_up if p.position == pos]) for pos in range(1, 7)]
+    )
+    return price, points + line_up.captain.predicted_points, scheme
+
+
+def maintained_aggregates(line_up: palpiteiro.LineUp):
+    """ Read price, predicted points and scheme kept by the line up. """
+    return line_up.price, line_up.predicted_points, line_up.scheme
+
+
+def main():
+    """ Run benchmark. """
+    players = fixtures.load_players()
+    schemes = fixtures.load_schemes()
+    line_up = palpiteiro.draft.random_line_up(players, schemes, 100)
+
+    number = 100000
+    for func in (recomputed_aggregates, maintained_aggregates):
+        seconds = timeit.timeit(lambda: func(line_up), number=number)
+        print(f"{func.__name__}\t{1e6 * seconds / number:.2f} us per read")
+
+    start = time.perf_counter()
+    palpiteiro.draft.draft(
+        individuals=100,
+        generations=100,
+        players=players,
+        schemes=schemes,
+        max_price=100,
+        tournament_size=5,
+    )
+    print(f"draft\t{time.perf_counter() - start:.2f} s (100 x 100)")
+
+
+if __name__ == "__main__":
+    main()
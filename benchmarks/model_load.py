@@ -0,0 +1,65 @@
+""" Cold load time and private memory of the pickled and memory-mapped models. """
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+LOADERS = {
+    "pickle": "palpiteiro.inference.load_model(palpiteiro.MODEL_PATH)",
+    "artifact": (
+        "palpiteiro.inference.KNNPredictor.load(palpiteiro.MODEL_ARTIFACT_PATH)"
+    ),
+}
+
+# Anonymous memory can't be shared between processes, unlike mapped files pages.
+SCRIPT = """
+import time
+
+import palpiteiro
+import palpiteiro.inference
+
+
+def anonymous():
+    with open("/proc/self/smaps_rollup") as file:
+        for line in file:
+            if line.startswith("Anonymous:"):
+                return int(line.split()[1]) / 1024
+
+
+before = anonymous()
+start = time.perf_counter()
+model = {loader}
+model.fit_x.sum()  # Touch every page of the training matrix.
+print(time.perf_counter() - start, anonymous() - before)
+"""
+
+
+def load(loader: str):
+    """ Load the model in a new process. Get seconds and anonymous memory in MB. """
+    output = subprocess.run(
+        [sys.executable, "-c", SCRIPT.format(loader=LOADERS[loader])],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.split()
+    return float(output[0]), float(output[1])
+
+
+def main():
+    """ Run benchmark. Needs Linux /proc/self/smaps_rollup. """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--loaders", nargs="+", default=list(LOADERS))
+    args = parser.parse_args()
+
+    print("loader\tseconds\tprivate MB")
+    for loader in args.loaders:
+        results = [load(loader) for _ in range(args.repeat)]
+        seconds = statistics.median(elapsed for elapsed, _ in results)
+        memory = statistics.median(private for _, private in results)
+        print(f"{loader}\t{seconds:.3f}\t{memory:.1f}")
+
+
+if __name__ == "__main__":
+    main()
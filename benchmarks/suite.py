@@ -0,0 +1,171 @@
+""" Offline benchmark suite of the hot paths, compared against a stored baseline. """
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, Tuple
+
+import pandas as pd
+
+import palpiteiro
+import palpiteiro.data
+import palpiteiro.draft
+
+from benchmarks import fixtures
+
+THIS_FOLDER = os.path.dirname(__file__)
+BASELINE_PATH = os.path.join(THIS_FOLDER, "baseline.json")
+
+# Population and generations of the draft benchmarks.
+DRAFT_SIZES = [(50, 50), (100, 100), (200, 100)]
+
+# A benchmark is a function to time and how many times it is called per run.
+Benchmark = Tuple[Callable[[], Any], int]
+
+
+def create_benchmarks() -> Dict[str, Benchmark]:
+    """ Load the tests data and create benchmarks. """
+    players_data = fixtures.load_players_data()
+    clubs = fixtures.load_clubs()
+    clubs_data = clubs[["nome", "abreviacao", "escudos"]]
+    raw_odds = pd.read_json(
+        os.path.join(fixtures.TESTS_DATA_FOLDER, "betting_lines.json")
+    )
+    odds = palpiteiro.data.TheOddsAPI.clean_betting_lines(raw_odds)
+
+    players = fixtures.load_players()
+    schemes = fixtures.load_schemes()
+    index = palpiteiro.draft.PlayerIndex(players)
+    line_up = palpiteiro.draft.random_line_up(players, schemes, 100, index)
+    other = palpiteiro.draft.random_line_up(players, schemes, 100, index)
+
+    benchmarks: Dict[str, Benchmark] = {
+        "random_line_up": (
+            lambda: palpiteiro.draft.random_line_up(players, schemes, 100, index),
+            1000,
+        ),
+        "mutate_line_up": (
+            lambda: palpiteiro.draft.mutate_line_up(
+                line_up, players, schemes, 100, index=index
+            ),
+            1000,
+        ),
+        "crossover_line_up": (
+            lambda: palpiteiro.draft.crossover_line_up(line_up, other, 100),
+            1000,
+        ),
+        "create_all_players": (
+            lambda: palpiteiro.create_all_players(players_data, clubs),
+            10,
+        ),
+        "merge_clubs_and_odds": (
+            lambda: palpiteiro.data.merge_clubs_and_odds(clubs_data, odds),
+            100,
+        ),
+        "clean_betting_lines": (
+            lambda: palpiteiro.data.TheOddsAPI.clean_betting_lines(raw_odds),
+            100,
+        ),
+    }
+    for individuals, generations in DRAFT_SIZES:
+        benchmarks[f"draft_{individuals}x{generations}"] = (
+            lambda individuals=individuals, generations=generations: (
+                palpiteiro.draft.draft(
+                    individuals=individuals,
+                    generations=generations,
+                    players=players,
+                    schemes=schemes,
+                    max_price=100,
+                    tournament_size=5,
+                )
+            ),
+            1,
+        )
+    return benchmarks
+
+
+def measure(benchmark: Benchmark, repeat: int) -> Dict[str, float]:
+    """ Time a benchmark. Seconds per call are the median and the best of the runs. """
+    func, number = benchmark
+    func()  # Warm up, like loading the model.
+
+    runs = []
+    for _ in range(repeat):
+        random.seed(0)
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        runs.append((time.perf_counter() - start) / number)
+    return {"seconds": statistics.median(runs), "best": min(runs), "number": number}
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    tolerance: float,
+) -> Dict[str, float]:
+    """ Get the ratio to the baseline of the benchmarks that got slower. """
+    ratios = {
+        name: result["seconds"] / baseline[name]["seconds"]
+        for name, result in results.items()
+        if name in baseline
+    }
+    return {name: ratio for name, ratio in ratios.items() if ratio > 1 + tolerance}
+
+
+def main():
+    """ Run benchmarks. Fails if some got slower than the baseline. """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--benchmarks", nargs="+", default=None)
+    parser.add_argument("--output", default=None, help="Write results as JSON.")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    benchmarks = create_benchmarks()
+    names = list(benchmarks) if args.benchmarks is None else args.benchmarks
+
+    baseline = {}
+    if os.path.isfile(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)["results"]
+
+    print("benchmark\tseconds\tbaseline\tratio")
+    results = {}
+    for name in names:
+        results[name] = measure(benchmarks[name], args.repeat)
+        seconds = results[name]["seconds"]
+        if name in baseline:
+            reference = baseline[name]["seconds"]
+            print(f"{name}\t{seconds:.6f}\t{reference:.6f}\t{seconds / reference:.2f}")
+        else:
+            print(f"{name}\t{seconds:.6f}\t-\t-")
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    for path in [args.output, args.baseline if args.save_baseline else None]:
+        if path is not None:
+            with open(path, "w", encoding="utf-8") as file:
+                json.dump(report, file, indent=4)
+
+    slower = compare(results, baseline, args.tolerance)
+    if slower:
+        sys.exit(
+            "Slower than the baseline: "
+            + ", ".join(f"{name} ({ratio:.2f}x)" for name, ratio in slower.items())
+        )
+
+
+if __name__ == "__main__":
+    main()
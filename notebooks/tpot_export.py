@@ -1,5 +1,3 @@
-import numpy as np
-import pandas as pd
 from sklearn.linear_model import RidgeCV
 from sklearn.model_selection import train_test_split
 from sklearn.neighbors import KNeighborsRegressor
@@ -7,11 +5,12 @@ from sklearn.pipeline import make_pipeline
 from sklearn.preprocessing import StandardScaler
 from tpot.builtins import StackingEstimator
 
-# NOTE: Make sure that the outcome column is labeled 'target' in the data file
-tpot_data = pd.read_csv("PATH/TO/DATA/FILE", sep="COLUMN_SEPARATOR", dtype=np.float64)
-features = tpot_data.drop("target", axis=1)
+import palpiteiro.dataset
+
+# Features and points of the historical dataset. See palpiteiro.training to retrain.
+features, target = palpiteiro.dataset.features(palpiteiro.dataset.load_columns())
 training_features, testing_features, training_target, testing_target = train_test_split(
-    features, tpot_data["target"], random_state=None
+    features, target, random_state=None
 )
 
 # Average CV score on the training set was: -15.414579276900241
@@ -2,14 +2,62 @@
 
 
 import os
-from typing import Sequence, Optional, List, Dict
+import threading
+from typing import Any, Sequence, Optional, List, Dict, Set, Tuple
 
-import joblib
+import numpy as np
 import pandas as pd
 
 THIS_FOLDER = os.path.dirname(__file__)
 MODEL_PATH = os.path.join(THIS_FOLDER, "data", "model.pkl")
-MODEL = joblib.load(MODEL_PATH)
+# Memory-mapped export of the model. See palpiteiro.inference.
+MODEL_ARTIFACT_PATH = os.path.join(THIS_FOLDER, "data", "model")
+
+# Loaded on the first prediction. Unpickling it also imports scikit-learn,
+# which tools that never predict should not pay for.
+_MODEL: Any = None
+_MODEL_LOCK = threading.Lock()
+
+# Serializes predicted points updates of all tables, which are rare.
+_PREDICTED_POINTS_LOCK = threading.Lock()
+
+
+def get_model() -> Any:
+    """
+    Get the machine learning model. It is loaded only the first time.
+
+    It is memory-mapped from MODEL_ARTIFACT_PATH if that is up to date. Otherwise
+    the pipeline is unpickled and replaced by a palpiteiro.inference.KNNPredictor
+    when possible.
+    """
+    global _MODEL  # pylint: disable=global-statement
+    if _MODEL is None:
+        with _MODEL_LOCK:
+            if _MODEL is None:
+                import palpiteiro.inference  # pylint: disable=import-outside-toplevel
+
+                _MODEL = palpiteiro.inference.load_model(
+                    MODEL_PATH, MODEL_ARTIFACT_PATH
+                )
+    return _MODEL
+
+
+def set_model(model: Any) -> None:
+    """
+    Replace the machine learning model with any object with a predict method.
+
+    Set it to None to load the model from MODEL_PATH again on the next prediction.
+    """
+    global _MODEL  # pylint: disable=global-statement
+    with _MODEL_LOCK:
+        _MODEL = model
+
+
+def __getattr__(name: str) -> Any:
+    """ Keep palpiteiro.MODEL available, loading the model when accessed. """
+    if name == "MODEL":
+        return get_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class Club:
@@ -66,7 +114,14 @@ class Club:
 
 
 class Player:
-    """ Cartola FC player. """
+    """
+    Cartola FC player.
+
+    A lightweight view of a row from a PlayerTable. Players from create_all_players
+    share a single table, so they hold nothing but the table and the row index.
+    """
+
+    __slots__ = ("table", "row")
 
     # Mapping from Cartola FC API position to machine learning model position.
     position_map = {
@@ -97,19 +152,29 @@ class Player:
     }
 
     def __init__(
-        self, player_id: int, players: dict, clubs: dict,
+        self, player_id: int, players: Any, clubs: Any, predict: bool = True,
     ):
-        self.id = player_id
-        self.players = players
-        self.clubs = clubs
-
-        self._dict = players[self.id]
+        # A table with just this player and its club.
+        if isinstance(players, pd.DataFrame):
+            players = {player_id: players.loc[player_id].to_dict()}
+        club_id = players[player_id]["clube_id"]
+        if isinstance(clubs, pd.DataFrame):
+            clubs = {club_id: clubs.loc[club_id].to_dict()}
+        self.table = PlayerTable.from_rows(
+            {player_id: players[player_id]}, {club_id: clubs[club_id]}
+        )
+        self.row = 0
 
-        # Get player club.
-        self.club = Club(club_id=self._dict["clube_id"], clubs=self.clubs)
+        if predict:
+            self.update_predicted_points()
 
-        self.predicted_points = 0
-        self.update_predicted_points()
+    @classmethod
+    def view(cls, table: "PlayerTable", row: int) -> "Player":
+        """ Create a player from a table row. """
+        player = cls.__new__(cls)
+        player.table = table
+        player.row = row
+        return player
 
     def __eq__(self, other: "Player") -> bool:
         return self.id == other.id
@@ -120,20 +185,30 @@ class Player:
     def __repr__(self) -> str:
         return f"<{self.__str__()}>"
 
+    @property
+    def id(self) -> int:  # pylint: disable=invalid-name
+        """ Player ID. """
+        return self.table.scalars["id"][self.row]
+
+    @property
+    def club(self) -> Club:
+        """ Player club. """
+        return self.table.clubs[self.table.scalars["club"][self.row]]
+
     @property
     def name(self) -> str:
         """ Player name. """
-        return self._dict["apelido"]
+        return self.table.name[self.row]
 
     @property
     def photo(self) -> str:
         """ Player photo. """
-        return self._dict["foto"].replace("_FORMATO", "_140x140")
+        return self.table.photo[self.row].replace("_FORMATO", "_140x140")
 
     @property
     def position(self) -> int:
         """ Player position. """
-        return self._dict["posicao_id"]
+        return self.table.scalars["position"][self.row]
 
     @property
     def position_abbreviation(self) -> str:
@@ -143,37 +218,46 @@ class Player:
     @property
     def status(self) -> int:
         """ Player status. """
-        return self._dict["status_id"]
+        return self.table.scalars["status"][self.row]
 
     @property
     def matches(self) -> int:
         """ Player amount of played matches. """
-        return self._dict["jogos_num"]
+        return self.table.scalars["matches"][self.row]
 
     @property
     def points(self) -> float:
         """ Player points on club's last match. """
-        return self._dict["pontos_num"]
+        return self.table.scalars["points"][self.row]
 
     @property
     def mean(self) -> float:
         """ Player mean points considering matches he has played. """
-        return self._dict["media_num"]
+        return self.table.scalars["mean"][self.row]
 
     @property
     def price(self) -> float:
         """ Player price. """
-        return self._dict["preco_num"]
+        return self.table.scalars["price"][self.row]
 
     @property
     def variation(self) -> float:
         """ Player price variation. """
-        return self._dict["variacao_num"]
+        return self.table.scalars["variation"][self.row]
 
     @property
     def scouts(self) -> Dict[str, int]:
         """ Player scouts. """
-        return self._dict["scout"]
+        return self.table.scouts[self.row]
+
+    @property
+    def predicted_points(self) -> float:
+        """ Get and set predicted points. """
+        return self.table.scalars["predicted_points"][self.row]
+
+    @predicted_points.setter
+    def predicted_points(self, value: float):
+        self.table.set_predicted_points([self.row], [value])
 
     @property
     def win_odds(self) -> float:
@@ -190,39 +274,18 @@ class Player:
         """ Get odds of his club losing in the next match. """
         return self.club.lose_odds
 
+    @property
+    def features(self) -> Optional[List[float]]:
+        """ Machine learning model features. None if there is no need to predict. """
+        rows, features = self.table.features([self.row])
+        if len(rows) == 0:
+            return None
+        return features[0].tolist()
+
     def update_predicted_points(self) -> float:
         """ Estimate predicted points using a machine learning model. """
-        status = self.status_map[self.status]
-        # If the player is suspended, injured or null,
-        # it is expected to score no points at all.
-        if status in [0, 1, 2]:
-            return 0.0
-
-        # Can't make predictions if there aren't odds on the player's club.
-        if any(
-            [pd.isna(self.win_odds), pd.isna(self.lose_odds), pd.isna(self.draw_odds)]
-        ):
-            return 0.0
-            # raise ValueError(
-            #     f"Can't make predictions for {self} "
-            #     f"because {self.club} does not have available odds."
-            # )
-
-        self.predicted_points = MODEL.predict(
-            [
-                [
-                    self.position_map[self.position],
-                    status,
-                    self.matches,
-                    self.mean,
-                    self.price,
-                    self.variation,
-                    self.win_odds,
-                    self.lose_odds,
-                    self.draw_odds,
-                ]
-            ]
-        )[0][0]
+        self.table.predict([self.row])
+        return self.predicted_points
 
     @property
     def is_predictable(self):
@@ -230,11 +293,230 @@ class Player:
         return pd.notna(self.win_odds)
 
 
-def create_all_players(players: pd.DataFrame, clubs: pd.DataFrame) -> List[Player]:
+class PlayerTable:
+    """
+    Columnar table of Cartola FC players.
+
+    Each attribute is a NumPy array with one row per player, so the whole market can
+    be filtered, predicted and drafted at once. Arrays are read-only, and
+    predicted points are changed through set_predicted_points. The same values are
+    also kept as Python lists in scalars, which are faster to read one at a time.
+    """
+
+    # Numeric attributes that players read one at a time.
+    scalar_attributes = [
+        "position",
+        "status",
+        "matches",
+        "points",
+        "mean",
+        "price",
+        "variation",
+    ]
+
+    # Cartola FC API columns kept in the table.
+    player_columns = [
+        "apelido",
+        "foto",
+        "clube_id",
+        "posicao_id",
+        "status_id",
+        "jogos_num",
+        "pontos_num",
+        "media_num",
+        "preco_num",
+        "variacao_num",
+        "scout",
+    ]
+
+    def __init__(self, players: pd.DataFrame, clubs: pd.DataFrame):
+        self._fill(
+            players.index.tolist(),
+            {column: players[column].tolist() for column in self.player_columns},
+            clubs.to_dict(orient="index"),
+        )
+
+    @classmethod
+    def from_rows(
+        cls, players: Dict[int, dict], clubs: Dict[int, dict]
+    ) -> "PlayerTable":
+        """
+        Create table from dicts of rows, like DataFrame.to_dict(orient="index").
+
+        Cheaper than going through data frames for a few players.
+        """
+        columns = {
+            column: [row[column] for row in players.values()]
+            for column in cls.player_columns
+        }
+        table = cls.__new__(cls)
+        table._fill(list(players), columns, clubs)
+        return table
+
+    def _fill(
+        self,
+        player_ids: List[int],
+        columns: Dict[str, List[Any]],
+        clubs: Dict[int, dict],
+    ) -> None:
+        """ Create arrays from columns of players data. """
+        self.id = np.array(player_ids, dtype=int)
+        self.position = np.array(columns["posicao_id"], dtype=int)
+        self.status = np.array(columns["status_id"], dtype=int)
+        self.matches = np.array(columns["jogos_num"], dtype=float)
+        self.points = np.array(columns["pontos_num"], dtype=float)
+        self.mean = np.array(columns["media_num"], dtype=float)
+        self.price = np.array(columns["preco_num"], dtype=float)
+        self.variation = np.array(columns["variacao_num"], dtype=float)
+        self.predicted_points = np.zeros(len(player_ids))
+        self.name = np.array(columns["apelido"], dtype=object)
+        self.photo = np.array(columns["foto"], dtype=object)
+        self.scouts = np.empty(len(player_ids), dtype=object)
+        self.scouts[:] = columns["scout"]
+
+        # Clubs are shared by their players. Players point to them by index.
+        self.clubs = [Club(club_id, clubs) for club_id in clubs]
+        clubs_rows = {club_id: row for row, club_id in enumerate(clubs)}
+        self.club = np.array(
+            [clubs_rows[club_id] for club_id in columns["clube_id"]], dtype=int
+        )
+
+        # Odds of each player's club.
+        odds_columns = ["win_odds", "draw_odds", "lose_odds"]
+        odds = np.array(
+            [
+                [club.get(column, np.nan) for column in odds_columns]
+                for club in clubs.values()
+            ],
+            dtype=float,
+        ).reshape(-1, 3)
+        self.win_odds, self.draw_odds, self.lose_odds = odds[self.club].T
+
+        # Model encoding of positions and status. Unknown status is -1.
+        self.model_position = np.array(
+            [Player.position_map[position] for position in self.position], dtype=int
+        )
+        self.model_status = np.array(
+            [Player.status_map.get(status, -1) for status in self.status], dtype=int
+        )
+
+        self.scalars: Dict[str, List[Any]] = {
+            "id": self.id.tolist(),
+            "club": self.club.tolist(),
+            "predicted_points": self.predicted_points.tolist(),
+        }
+        for attribute in self.scalar_attributes:
+            self.scalars[attribute] = getattr(self, attribute).tolist()
+
+        for array in vars(self).values():
+            if isinstance(array, np.ndarray):
+                array.setflags(write=False)
+
+        self.rows = {player_id: row for row, player_id in enumerate(self.scalars["id"])}
+
+    def __len__(self) -> int:
+        return len(self.id)
+
+    def __getitem__(self, row: int) -> Player:
+        return Player.view(self, row)
+
+    def players(self) -> List[Player]:
+        """ Get a player view of each row. """
+        return [Player.view(self, row) for row in range(len(self))]
+
+    def player(self, player_id: int) -> Player:
+        """ Get player by ID. """
+        return Player.view(self, self.rows[player_id])
+
+    def set_predicted_points(self, rows: Sequence[int], values: Sequence[float]):
+        """
+        Update predicted points of some rows.
+
+        The array is never written: a new read-only array replaces it, so arrays read
+        before, like by a draft in another thread, don't change. Only the given rows
+        of scalars are written. Updates from several threads run one at a time.
+        """
+        rows = np.asarray(rows, dtype=int)
+        with _PREDICTED_POINTS_LOCK:
+            predicted_points = self.predicted_points.copy()
+            predicted_points[rows] = values
+            predicted_points.setflags(write=False)
+            self.predicted_points = predicted_points
+
+            scalars = self.scalars["predicted_points"]
+            for row, value in zip(rows.tolist(), predicted_points[rows].tolist()):
+                scalars[row] = value
+
+    def features(
+        self, rows: Optional[Sequence[int]] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get rows that need predictions and their machine learning model features.
+
+        Players that are suspended, injured or null are expected to score no points
+        at all, and players from clubs without odds can't be predicted.
+        """
+        rows = np.arange(len(self)) if rows is None else np.asarray(rows, dtype=int)
+        predictable = (
+            (self.model_status[rows] > 2)
+            & ~np.isnan(self.win_odds[rows])
+            & ~np.isnan(self.lose_odds[rows])
+            & ~np.isnan(self.draw_odds[rows])
+        )
+        rows = rows[predictable]
+        features = np.column_stack(
+            [
+                self.model_position[rows],
+                self.model_status[rows],
+                self.matches[rows],
+                self.mean[rows],
+                self.price[rows],
+                self.variation[rows],
+                self.win_odds[rows],
+                self.lose_odds[rows],
+                self.draw_odds[rows],
+            ]
+        )
+        return rows, features
+
+    def predict(
+        self, rows: Optional[Sequence[int]] = None, chunk_size: int = 1000
+    ) -> None:
+        """ Update predicted points calling the model once per chunk of players. """
+        rows, features = self.features(rows)
+        if len(rows) == 0:
+            return
+
+        model = get_model()
+        predictions = []
+        for start in range(0, len(rows), chunk_size):
+            chunk = features[start : start + chunk_size]
+            prediction = np.asarray(model.predict(chunk)).reshape(len(chunk), -1)
+            predictions.append(prediction[:, 0])
+        self.set_predicted_points(rows, np.concatenate(predictions))
+
+
+def predict_players(players: Sequence[Player], chunk_size: int = 1000) -> None:
+    """
+    Update players predicted points calling the model once per chunk of players.
+
+    Equivalent to calling update_predicted_points on each player.
+    """
+    tables: Dict[int, Tuple[PlayerTable, List[int]]] = {}
+    for player in players:
+        tables.setdefault(id(player.table), (player.table, []))[1].append(player.row)
+
+    for table, rows in tables.values():
+        table.predict(rows, chunk_size=chunk_size)
+
+
+def create_all_players(
+    players: pd.DataFrame, clubs: pd.DataFrame, chunk_size: int = 1000
+) -> List[Player]:
     """ Create all players from a players dataframe. """
-    players_dict = players.to_dict(orient="index")
-    clubs_dict = clubs.to_dict(orient="index")
-    return [Player(i, players_dict, clubs_dict) for i in players.index]
+    table = PlayerTable(players, clubs)
+    table.predict(chunk_size=chunk_size)
+    return table.players()
 
 
 class Scheme:
@@ -315,7 +597,12 @@ def create_schemes(schemes: pd.DataFrame) -> List[Scheme]:
 
 
 class LineUp:
-    """ Cartola FC team line-up. """
+    """
+    Cartola FC team line-up.
+
+    Price and predicted points are added up as players come and go, so they go stale
+    if players predicted points change after they joined the line-up.
+    """
 
     # Cartola FC ID to Position:
     # 1 - Goalkeeper
@@ -326,10 +613,19 @@ class LineUp:
     # 6 - Coach
 
     def __init__(self, players: Sequence[Player]):
-        self.players = list(players)
-        self.players_ids = {player.id for player in self.players}
+        self.players: List[Player] = []
+        self.players_ids: Set[int] = set()
         self._captain: Optional[Player] = None
 
+        # Aggregates are kept up to date as players come and go.
+        self._price = 0.0
+        self._predicted_points = 0.0
+        self._positions_count = {pos: 0 for pos in range(1, 7)}
+        self._best_player: Optional[Player] = None
+
+        for player in players:
+            self.add(player)
+
     def __eq__(self, other: "LineUp") -> bool:
         these_players = sorted(self.players, key=lambda x: x.id)
         other_players = sorted(other.players, key=lambda x: x.id)
@@ -342,7 +638,9 @@ class LineUp:
         return self.players[key]
 
     def __setitem__(self, key: int, value: Player) -> None:
+        self._discount(self.players[key])
         self.players[key] = value
+        self._account(value)
 
     def __len__(self) -> int:
         return len(self.players)
@@ -359,15 +657,37 @@ class LineUp:
     def __repr__(self) -> str:
         return f"<{self.__str__()}>"
 
+    def _account(self, player: Player) -> None:
+        """ Update aggregates with a player that came in. """
+        self.players_ids.add(player.id)
+        self._price += player.price
+        self._predicted_points += player.predicted_points
+        self._positions_count[player.position] += 1
+        if (
+            self._best_player is not None
+            and player.predicted_points > self._best_player.predicted_points
+        ):
+            self._best_player = player
+
+    def _discount(self, player: Player) -> None:
+        """ Update aggregates with a player that went out. """
+        self.players_ids.remove(player.id)
+        self._price -= player.price
+        self._predicted_points -= player.predicted_points
+        self._positions_count[player.position] -= 1
+        # Find out the best player again only when needed.
+        if self._best_player is not None and self._best_player.id == player.id:
+            self._best_player = None
+
     def add(self, player: Player) -> None:
         """ Add player to the line up. """
         self.players.append(player)
-        self.players_ids.add(player.id)
+        self._account(player)
 
     def remove(self, player: Player) -> None:
         """ Remove player from the line up. """
         self.players.remove(player)
-        self.players_ids.remove(player.id)
+        self._discount(player)
 
     def is_valid(self, schemes: Sequence[Scheme]):
         """ Checks if the line-up is valid. """
@@ -412,26 +732,35 @@ class LineUp:
 
     @captain.setter
     def captain(self, value: Player):
-        if value not in self.players:
+        if value not in self:
             raise ValueError("The captain must be one of the players from the line-up")
         self._captain = value
 
+    @property
+    def best_player(self) -> Player:
+        """ Get the player with the most predicted points. """
+        if self._best_player is None:
+            if len(self.players) == 0:
+                raise ValueError("This line up does not have players yet.")
+            self._best_player = max(self.players, key=lambda x: x.predicted_points)
+        return self._best_player
+
     @property
     def scheme(self) -> Scheme:
         """ Get scheme. """
         return Scheme(
-            goalkeepers=len(self.goalkeepers),
-            fullbacks=len(self.fullbacks),
-            defenders=len(self.defenders),
-            midfielders=len(self.midfielders),
-            forwards=len(self.forwards),
-            coaches=len(self.coaches),
+            goalkeepers=self._positions_count[1],
+            fullbacks=self._positions_count[2],
+            defenders=self._positions_count[3],
+            midfielders=self._positions_count[4],
+            forwards=self._positions_count[5],
+            coaches=self._positions_count[6],
         )
 
     @property
     def price(self) -> float:
         """ Get line up price. """
-        return sum([player.price for player in self.players])
+        return self._price
 
     @property
     def points(self) -> int:
@@ -446,18 +775,22 @@ class LineUp:
     @property
     def predicted_points(self) -> int:
         """ Get line up points. """
-        return sum(
-            [
-                2 * player.predicted_points
-                if player == self.captain
-                else player.predicted_points
-                for player in self.players
-            ]
-        )
+        # The captain scores twice.
+        captain = self.captain
+        if captain.id in self.players_ids:
+            return self._predicted_points + captain.predicted_points
+        return self._predicted_points
 
     def copy(self):
         """ Copy to a new instance. """
-        return LineUp(self.players)
+        line_up = LineUp([])
+        line_up.players = self.players.copy()
+        line_up.players_ids = self.players_ids.copy()
+        line_up._price = self._price
+        line_up._predicted_points = self._predicted_points
+        line_up._positions_count = self._positions_count.copy()
+        line_up._best_player = self._best_player
+        return line_up
 
     @property
     def dataframe(self):
@@ -0,0 +1,260 @@
+""" Replay past rounds: draft with predicted points and score with actual points. """
+
+import argparse
+import concurrent.futures
+import random
+import time
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+import palpiteiro
+import palpiteiro.dataset
+import palpiteiro.draft
+import palpiteiro.history
+import palpiteiro.inference
+
+# Players that may play, like in the app.
+STATUSES = [2, 7]
+
+# Goalkeepers, fullbacks, defenders, midfielders, forwards and coaches.
+SCHEMES = [
+    (1, 0, 3, 4, 3, 1),
+    (1, 0, 3, 5, 2, 1),
+    (1, 2, 2, 3, 3, 1),
+    (1, 2, 2, 4, 2, 1),
+    (1, 2, 2, 5, 1, 1),
+    (1, 2, 3, 3, 2, 1),
+    (1, 2, 3, 4, 1, 1),
+]
+
+# Draft parameters, like in the app but without a time budget to be reproducible.
+DRAFT_PARAMETERS = {
+    "individuals": 100,
+    "generations": 1000,
+    "tournament_size": 5,
+    "patience": 200,
+}
+
+
+# Cartola FC IDs of the dataset positions and status.
+POSITION_IDS = {position: i for i, position in palpiteiro.Player.position_map.items()}
+STATUS_IDS = {status: i for i, status in palpiteiro.Player.status_map.items()}
+
+
+def round_pool(
+    data: pd.DataFrame, year: int, round_: int
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Rebuild players and clubs data frames of a past round, like the API ones.
+
+    Data is the historical dataset of palpiteiro.dataset. Columns are the ones
+    create_all_players needs. There are no scouts, names nor last points, and
+    players of unknown positions are left out.
+    """
+    rows = data[(data["year"] == year) & (data["round"] == round_)]
+    rows = rows[rows["position"] != -1].drop_duplicates("id").set_index("id")
+
+    players = pd.DataFrame(
+        {
+            "apelido": rows.index.astype(str),
+            "foto": "",
+            "clube_id": rows["club"],
+            "posicao_id": rows["position"].map(POSITION_IDS),
+            "status_id": rows["status"].map(STATUS_IDS),
+            "jogos_num": rows["matches"],
+            "pontos_num": np.nan,
+            "media_num": rows["mean"],
+            "preco_num": rows["price"],
+            "variacao_num": rows["variation"],
+            "scout": [{} for _ in range(len(rows))],
+        },
+        index=rows.index,
+    )
+
+    clubs = rows.groupby("club")[["win", "draw", "lose"]].first()
+    clubs.columns = ["win_odds", "draw_odds", "lose_odds"]
+    clubs["nome"] = clubs.index.astype(str)
+    clubs["abreviacao"] = clubs["nome"]
+    clubs["escudos"] = [{"45x45": "", "30x30": ""} for _ in range(len(clubs))]
+    return players, clubs
+
+
+# Worker state. It is set once per process by _init_worker.
+_BACKTEST: Dict[str, Any] = {}
+
+
+def _init_worker(
+    data: pd.DataFrame,
+    max_price: float,
+    method: str,
+    draft_parameters: Dict[str, Any],
+    seed: int,
+    model_path: Optional[str],
+) -> None:
+    """ Initialize a backtest worker process. """
+    if model_path is not None:
+        palpiteiro.set_model(palpiteiro.inference.load_model(model_path))
+
+    _BACKTEST.update(
+        data=data,
+        max_price=max_price,
+        method=method,
+        draft_parameters=draft_parameters,
+        seed=seed,
+        schemes=[palpiteiro.Scheme(*scheme) for scheme in SCHEMES],
+    )
+
+
+def _backtest_round(task: Tuple[int, int]) -> Dict[str, Any]:
+    """ Draft a past round inside a worker process and score it. """
+    year, round_ = task
+    data = _BACKTEST["data"]
+    schemes = _BACKTEST["schemes"]
+    max_price = _BACKTEST["max_price"]
+    start = time.perf_counter()
+
+    # Players that could be drafted before the round.
+    players_data, clubs = round_pool(data, year, round_)
+    players = palpiteiro.create_all_players(players_data, clubs)
+    players = [player for player in players if player.status in STATUSES]
+    players = [player for player in players if pd.notna(player.club.win_odds)]
+
+    result: Dict[str, Any] = {"year": year, "round": round_, "players": len(players)}
+
+    # Each round has its own random stream.
+    random.seed(f"{_BACKTEST['seed']}-{year}-{round_}")
+    try:
+        line_up = palpiteiro.draft.draft(
+            players=players,
+            schemes=schemes,
+            max_price=max_price,
+            method=_BACKTEST["method"],
+            **_BACKTEST["draft_parameters"],
+        )
+    except palpiteiro.draft.InfeasibleBudget:
+        result["elapsed"] = time.perf_counter() - start
+        return result
+
+    # Actual points. The captain scores twice.
+    rows = data[(data["year"] == year) & (data["round"] == round_)]
+    points = dict(zip(rows["id"].tolist(), rows["point"].tolist()))
+    result.update(
+        scheme=str(line_up.scheme),
+        price=line_up.price,
+        predicted_points=line_up.predicted_points,
+        points=sum(points[player.id] for player in line_up)
+        + points[line_up.captain.id],
+    )
+
+    # The best line-up, had the points been known.
+    table = players[0].table
+    table.set_predicted_points(range(len(table)), [points[i] for i in table.id])
+    best = palpiteiro.draft.exact_draft(players, schemes, max_price)
+    result["best_points"] = best.predicted_points
+
+    result["elapsed"] = time.perf_counter() - start
+    return result
+
+
+def backtest(
+    data: pd.DataFrame,
+    max_price: float = 100,
+    method: str = "genetic",
+    draft_parameters: Optional[Dict[str, Any]] = None,
+    seed: int = 0,
+    processes: Optional[int] = None,
+    model_path: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Draft every round of the historical dataset and score it with actual points.
+
+    Data is the dataset of palpiteiro.dataset.load. Rounds run in parallel, one per
+    worker process at a time. Each round gets its own random seed, so results don't
+    depend on the amount of processes. Pass a model path to use another model
+    instead of the shipped one, which was fit on these seasons and so scores them
+    in-sample.
+
+    Returns one row per round with the drafted line-up scheme, price, predicted and
+    actual points, and the actual points of the best line-up possible. Points are
+    missing for rounds that were not affordable.
+    """
+    parameters = dict(DRAFT_PARAMETERS)
+    if method == "exact":
+        parameters.pop("patience")  # Nothing to stop early.
+    if draft_parameters is not None:
+        parameters.update(draft_parameters)
+
+    tasks = palpiteiro.history.rounds(data)
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=processes,
+        initializer=_init_worker,
+        initargs=(data, max_price, method, parameters, seed, model_path),
+    ) as executor:
+        results = list(executor.map(_backtest_round, tasks))
+
+    columns = [
+        "year",
+        "round",
+        "players",
+        "scheme",
+        "price",
+        "predicted_points",
+        "points",
+        "best_points",
+        "elapsed",
+    ]
+    return pd.DataFrame(results, columns=columns)
+
+
+def season_report(results: pd.DataFrame) -> pd.DataFrame:
+    """ Summarize backtest results by season. """
+    seasons = results.groupby("year")
+    report = pd.DataFrame(
+        {
+            "rounds": seasons["round"].count(),
+            "points": seasons["points"].sum(),
+            "mean_points": seasons["points"].mean(),
+            "mean_predicted_points": seasons["predicted_points"].mean(),
+            "mean_best_points": seasons["best_points"].mean(),
+            "mean_absolute_error": (results["predicted_points"] - results["points"])
+            .abs()
+            .groupby(results["year"])
+            .mean(),
+            "elapsed": seasons["elapsed"].sum(),
+        }
+    )
+    report["efficiency"] = report["points"] / seasons["best_points"].sum()
+    return report
+
+
+def main(args: Optional[Sequence[str]] = None):
+    """ Backtest the recommendations on past seasons. """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--years", type=int, nargs="+", default=None)
+    parser.add_argument("--folder", default=palpiteiro.history.HISTORY_FOLDER)
+    parser.add_argument("--max-price", type=float, default=100)
+    parser.add_argument("--method", default="genetic")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--output", default=None, help="Write rounds as CSV.")
+    parsed = parser.parse_args(args)
+
+    data = palpiteiro.dataset.load(parsed.years, parsed.folder)
+    results = backtest(
+        data,
+        max_price=parsed.max_price,
+        method=parsed.method,
+        seed=parsed.seed,
+        processes=parsed.processes,
+        model_path=parsed.model,
+    )
+    if parsed.output is not None:
+        results.to_csv(parsed.output, index=False)
+    print(season_report(results).to_string(float_format="{:.2f}".format))
+
+
+if __name__ == "__main__":
+    main()
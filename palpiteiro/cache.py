@@ -0,0 +1,439 @@
+""" Caching of requested data. """
+
+import contextlib
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, Optional, Set
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+def create_session(retries: int = 3, backoff_factor: float = 0.5) -> requests.Session:
+    """
+    Create a HTTP session with keep-alive connections and bounded retries.
+
+    Retries connection errors and server errors with an exponential backoff.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=[429, 500, 502, 503, 504],
+    )
+    session = requests.Session()
+    adapter = HTTPAdapter(max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _key_file_name(key: str) -> str:
+    """ Create a file name safe for any key. """
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+class CacheBackend:
+    """
+    Interface of cache backends.
+
+    Values are any picklable object, like cleaned data frames.
+    """
+
+    def get(self, key: str) -> Optional[Any]:
+        """ Get value. None if it is not cached. """
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any) -> None:
+        """ Cache value. """
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        """ Remove all entries. """
+        raise NotImplementedError
+
+
+class MemoryCache(CacheBackend):
+    """ In-memory least recently used cache. """
+
+    def __init__(self, maxsize: int = 16):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Optional[Any]:
+        """ Get value. None if it is not cached. """
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key: str, value: Any) -> None:
+        """ Cache value. Forgets the least recently used if it is full. """
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        """ Remove all entries. """
+        with self._lock:
+            self._data.clear()
+
+
+class DirectoryCache(CacheBackend):
+    """
+    On-disk cache with one pickle file per entry.
+
+    Entries older than max_age seconds are evicted, and so are the oldest entries
+    while the folder is larger than max_size bytes.
+    """
+
+    suffix = ".pkl"
+
+    def __init__(
+        self,
+        folder: str,
+        max_age: float = 7 * 24 * 60 * 60,
+        max_size: int = 50 * 2 ** 20,
+    ):
+        self.folder = folder
+        self.max_age = max_age
+        self.max_size = max_size
+
+    def _file_name(self, key: str) -> str:
+        """ Create cache file name. """
+        return os.path.join(self.folder, _key_file_name(key) + self.suffix)
+
+    def get(self, key: str) -> Optional[Any]:
+        """ Get value. None if it is not cached or too old. """
+        file_name = self._file_name(key)
+        try:
+            if time.time() - os.path.getmtime(file_name) > self.max_age:
+                return None
+            with open(file_name, "rb") as file:
+                return pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def set(self, key: str, value: Any) -> None:
+        """ Cache value and evict old entries. """
+        os.makedirs(self.folder, exist_ok=True)
+
+        # Write to a temporary file first, so readers never see half a file.
+        file_name = self._file_name(key)
+        temporary = f"{file_name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary, "wb") as file:
+            pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, file_name)
+
+        self.evict()
+
+    def _entries(self):
+        """ Get cache files paths, modification times and sizes. """
+        entries = []
+        for name in os.listdir(self.folder):
+            if not name.endswith(self.suffix):
+                continue
+            path = os.path.join(self.folder, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, stat.st_mtime, stat.st_size))
+        return entries
+
+    def evict(self) -> None:
+        """ Remove entries that are too old or beyond the maximum size. """
+        if not os.path.isdir(self.folder):
+            return
+
+        now = time.time()
+        total = 0
+        # From the newest to the oldest.
+        for path, mtime, size in sorted(self._entries(), key=lambda x: -x[1]):
+            total += size
+            if now - mtime > self.max_age or total > self.max_size:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def clear(self) -> None:
+        """ Remove all entries. """
+        if not os.path.isdir(self.folder):
+            return
+        for path, _, _ in self._entries():
+            os.remove(path)
+
+
+class SQLiteCache(CacheBackend):
+    """
+    Cache in a single SQLite database file.
+
+    Entries older than max_age seconds are evicted, and so are the oldest entries
+    beyond max_entries.
+    """
+
+    def __init__(
+        self, path: str, max_age: float = 7 * 24 * 60 * 60, max_entries: int = 100
+    ):
+        self.path = path
+        self.max_age = max_age
+        self.max_entries = max_entries
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache "
+                "(key TEXT PRIMARY KEY, created REAL, value BLOB)"
+            )
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """ Connect to the database, commit and close. """
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def get(self, key: str) -> Optional[Any]:
+        """ Get value. None if it is not cached or too old. """
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT value FROM cache WHERE key = ? AND created >= ?",
+                (key, time.time() - self.max_age),
+            ).fetchone()
+        if row is None:
+            return None
+        return pickle.loads(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        """ Cache value and evict old entries. """
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?)",
+                (key, time.time(), sqlite3.Binary(blob)),
+            )
+            connection.execute(
+                "DELETE FROM cache WHERE created < ?", (time.time() - self.max_age,)
+            )
+            connection.execute(
+                "DELETE FROM cache WHERE key NOT IN "
+                "(SELECT key FROM cache ORDER BY created DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self) -> None:
+        """ Remove all entries. """
+        with self._connect() as connection:
+            connection.execute("DELETE FROM cache")
+
+
+def copy_session(session: requests.Session) -> requests.Session:
+    """
+    Create a session with the same headers and retries, but its own connections.
+
+    Adapters without retries, like the ones of a bare requests.Session, get the
+    retries of create_session instead.
+    """
+    copy = create_session()
+    copy.headers.clear()
+    copy.headers.update(session.headers)
+    for prefix, adapter in session.adapters.items():
+        if isinstance(adapter, HTTPAdapter) and adapter.max_retries.total:
+            copy.mount(prefix, HTTPAdapter(max_retries=adapter.max_retries))
+    return copy
+
+
+class HTTPCache:
+    """
+    Persistent cache of JSON responses.
+
+    Each URL is kept for a time to live (TTL). After that, it is revalidated with
+    If-None-Match and If-Modified-Since headers, so an unchanged response costs an
+    empty 304 instead of the whole payload. During the stale period after the TTL,
+    the cached data is served right away while it is revalidated in the background.
+
+    Entries are kept in memory and persisted as JSON files in the cache folder, so
+    they survive between processes. URLs are requested through the given session,
+    or else through a pooled session with retries that the cache owns.
+    """
+
+    def __init__(
+        self,
+        folder: str,
+        ttl: float = 600,
+        stale_ttl: float = 3600,
+        timeout: Any = (5, 30),
+    ):
+        self.folder = folder
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.timeout = timeout
+        self.session = create_session()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._revalidating: Set[str] = set()
+        self._threads: Set[threading.Thread] = set()
+
+    def _file_name(self, url: str) -> str:
+        """ Create cache file name. """
+        return os.path.join(self.folder, _key_file_name(url) + ".json")
+
+    def _load(self, url: str) -> Optional[Dict[str, Any]]:
+        """ Get entry from memory or from disk. """
+        if url in self._entries:
+            return self._entries[url]
+
+        try:
+            with open(self._file_name(url), encoding="utf-8") as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            return None
+
+        self._entries[url] = entry
+        return entry
+
+    def _store(self, url: str, entry: Dict[str, Any]) -> None:
+        """ Keep entry in memory and on disk. """
+        self._entries[url] = entry
+        os.makedirs(self.folder, exist_ok=True)
+
+        # Write to a temporary file first, so readers never see half a file.
+        file_name = self._file_name(url)
+        temporary = f"{file_name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(entry, file)
+        os.replace(temporary, file_name)
+
+    def _fetch(
+        self, url: str, session: requests.Session, entry: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """ Request URL, revalidating the entry if there is one. """
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = session.get(url, headers=headers, timeout=self.timeout, verify=False)
+
+        # Not modified, but there is nothing cached, like after a clear. Ask for the
+        # whole response, removing any conditional headers of the session.
+        if response.status_code == 304 and entry is None:
+            headers = {"If-None-Match": None, "If-Modified-Since": None}
+            response = session.get(
+                url, headers=headers, timeout=self.timeout, verify=False
+            )
+            if response.status_code == 304:
+                raise requests.HTTPError(
+                    f"Not modified, but nothing is cached: {url}", response=response
+                )
+
+        # Not modified. Keep the data and restart the TTL.
+        if response.status_code == 304 and entry is not None:
+            entry = dict(entry, fetched_at=time.time())
+        else:
+            response.raise_for_status()
+            entry = {
+                "url": url,
+                "fetched_at": time.time(),
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "data": response.json(),
+            }
+
+        self._store(url, entry)
+        return entry
+
+    def _revalidate(self, url: str, session: requests.Session) -> None:
+        """
+        Revalidate entry in a background thread.
+
+        Sessions are not thread-safe, so the thread uses its own session, with the
+        headers and retries of the caller's one.
+        """
+        with self._lock:
+            if url in self._revalidating:
+                return
+            self._revalidating.add(url)
+        thread_session = copy_session(session)
+
+        def target():
+            try:
+                self._fetch(url, thread_session, self._load(url))
+            except (requests.RequestException, ValueError):
+                # Keep serving stale data. It will try again next time.
+                pass
+            finally:
+                thread_session.close()
+                with self._lock:
+                    self._revalidating.discard(url)
+                    self._threads.discard(thread)
+
+        thread = threading.Thread(target=target, daemon=True)
+        with self._lock:
+            self._threads.add(thread)
+        thread.start()
+
+    def join(self) -> None:
+        """ Wait for background revalidations to finish and close idle connections. """
+        with self._lock:
+            threads = list(self._threads)
+        for thread in threads:
+            thread.join()
+        self.session.close()
+
+    def get(
+        self,
+        url: str,
+        session: Optional[requests.Session] = None,
+        ttl: Optional[float] = None,
+    ) -> Any:
+        """ Get URL JSON data, requesting it only if needed. """
+        if session is None:
+            session = self.session
+        if ttl is None:
+            ttl = self.ttl
+
+        entry = self._load(url)
+        if entry is not None:
+            age = time.time() - entry["fetched_at"]
+
+            # Fresh.
+            if age < ttl:
+                return entry["data"]
+
+            # Stale. Serve it and revalidate in the background.
+            if age < ttl + self.stale_ttl:
+                self._revalidate(url, session)
+                return entry["data"]
+
+        return self._fetch(url, session, entry)["data"]
+
+    def clear(self) -> None:
+        """ Remove all entries and close idle connections. """
+        self._entries.clear()
+        self.session.close()
+        if not os.path.isdir(self.folder):
+            return
+        for file_name in os.listdir(self.folder):
+            if file_name.endswith(".json"):
+                os.remove(os.path.join(self.folder, file_name))
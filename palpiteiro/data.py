@@ -1,21 +1,38 @@
 """ Data requesting and wrangling. """
 
 import datetime
+import io
 import json
 import os
-from typing import Optional, Sequence, List
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, Optional, Sequence, List, Tuple
 
 import numpy as np
 import pandas as pd
 import requests
 
+import palpiteiro.cache
+from palpiteiro.cache import create_session
+
 THIS_FOLDER = os.path.dirname(__file__)
+CLUBS_NAMES_PATH = os.path.join(THIS_FOLDER, "data", "clubs_names.json")
 
+# Seconds to wait for the server to connect and to send data.
+TIMEOUT = (5, 30)
 
-def request_to_dict(url: str, key: Optional[str] = None, **kwargs) -> pd.DataFrame:
-    """ Create dict from request data. """
-    data = requests.get(url, verify=False, **kwargs).json()
 
+def request_json(url: str, session: Optional[requests.Session] = None, **kwargs):
+    """ Request and parse JSON data. """
+    get = requests.get if session is None else session.get
+    kwargs.setdefault("timeout", TIMEOUT)
+    response = get(url, verify=False, **kwargs)
+    response.raise_for_status()
+    return response.json()
+
+
+def json_to_dict(data, key: Optional[str] = None) -> dict:
+    """ Get inner data from JSON data. """
     # If specified some inner key.
     if key is not None:
         data = data[key]
@@ -23,13 +40,9 @@ def request_to_dict(url: str, key: Optional[str] = None, **kwargs) -> pd.DataFra
     return data
 
 
-def request_to_df(url: str, key: Optional[str] = None, **kwargs) -> pd.DataFrame:
-    """ Create dataframe from request data. """
-    data = requests.get(url, verify=False, **kwargs).json()
-
-    # If specified some inner key.
-    if key is not None:
-        data = data[key]
+def json_to_df(data, key: Optional[str] = None) -> pd.DataFrame:
+    """ Create dataframe from JSON data. """
+    data = json_to_dict(data, key)
 
     # If it is a dictionary, use the values method.
     if isinstance(data, dict):
@@ -38,40 +51,121 @@ def request_to_df(url: str, key: Optional[str] = None, **kwargs) -> pd.DataFrame
     return pd.DataFrame(data)
 
 
+def request_to_dict(
+    url: str,
+    key: Optional[str] = None,
+    session: Optional[requests.Session] = None,
+    **kwargs,
+) -> dict:
+    """ Create dict from request data. """
+    return json_to_dict(request_json(url, session=session, **kwargs), key)
+
+
+def request_to_df(
+    url: str,
+    key: Optional[str] = None,
+    session: Optional[requests.Session] = None,
+    **kwargs,
+) -> pd.DataFrame:
+    """ Create dataframe from request data. """
+    return json_to_df(request_json(url, session=session, **kwargs), key)
+
+
 class CartolaFCAPI:
-    """ A high level wrapper for the Cartola FC API. """
+    """
+    A high level wrapper for the Cartola FC API.
+
+    Each endpoint is requested at most once per instance through a pooled session.
+    Create a new instance to get fresh data. If a HTTPCache is given, endpoints come
+    from it instead, shared between instances and processes for their time to live,
+    so a long lived instance gets fresh data too.
+    """
 
     host = r"https://api.cartolafc.globo.com/"
 
+    # Seconds each endpoint is kept in cache.
+    # The market changes a few times a day, clubs and schemes barely change.
+    ttl = {
+        "clubes": 24 * 60 * 60,
+        "esquemas": 24 * 60 * 60,
+        "partidas": 15 * 60,
+        "atletas/mercado": 15 * 60,
+        "mercado/status": 5 * 60,
+    }
+
+    def __init__(
+        self,
+        session: Optional[requests.Session] = None,
+        cache: Optional[palpiteiro.cache.HTTPCache] = None,
+    ):
+        self.session = create_session() if session is None else session
+        self.cache = cache
+        self._responses: Dict[str, Any] = {}
+
+    def request(self, endpoint: str):
+        """ Get endpoint JSON data. Requests it once, or again when it expires. """
+        url = self.host + endpoint
+        if self.cache is not None:
+            return self.cache.get(url, session=self.session, ttl=self.ttl.get(endpoint))
+        if endpoint not in self._responses:
+            self._responses[endpoint] = request_json(url, session=self.session)
+        return self._responses[endpoint]
+
     def clubs(self) -> pd.DataFrame:
         """ Get clubs data frame. """
-        return request_to_df(self.host + r"clubes").set_index("id")
+        return json_to_df(self.request(r"clubes")).set_index("id")
 
     def matches(self) -> pd.DataFrame:
         """ Get next matches data frame. """
-        return request_to_df(self.host + r"partidas", "partidas")
+        return json_to_df(self.request(r"partidas"), "partidas")
 
     def players(self) -> pd.DataFrame:
         """ Get players data frame. """
-        return request_to_df(self.host + r"atletas/mercado", "atletas").set_index(
+        return json_to_df(self.request(r"atletas/mercado"), "atletas").set_index(
             "atleta_id"
         )
 
     def schemes(self):
         """ Get schemes data frame. """
-        return request_to_df(self.host + r"esquemas")
+        return json_to_df(self.request(r"esquemas"))
 
     def positions(self) -> pd.DataFrame:
         """ Get positions data frame. """
-        return request_to_df(self.host + r"atletas/mercado", "posicoes")
+        return json_to_df(self.request(r"atletas/mercado"), "posicoes")
 
     def status(self) -> pd.DataFrame:
         """ Get status data frame. """
-        return request_to_df(self.host + r"atletas/mercado", "status")
+        return json_to_df(self.request(r"atletas/mercado"), "status")
+
+    def market_status(self) -> dict:
+        """ Get market status, like the current round and if the market is open. """
+        return json_to_dict(self.request(r"mercado/status"))
+
+
+def odds_bucket(time: Optional[datetime.datetime] = None) -> str:
+    """
+    Get the period of time betting lines are requested once for, like 2020-12-10-9.
+
+    Periods are 3 hours long. Defaults to now.
+    """
+    if time is None:
+        time = datetime.datetime.now()
+    hour = max([hour for hour in range(0, 24, 3) if hour <= time.hour])
+    return f"{time.date()}-{hour}"
+
+
+# Cleaned betting lines shared by every TheOddsAPI instance in the process.
+BETTING_LINES_CACHE = palpiteiro.cache.MemoryCache(maxsize=16)
 
 
 class TheOddsAPI:
-    """ A high level wrapper for the-odds-api.com. User must provide a private key. """
+    """
+    A high level wrapper for the-odds-api.com. User must provide a private key.
+
+    Cleaned betting lines are kept in memory for the whole process and persisted in
+    a self-evicting cache backend (on-disk directory inside the cache folder by
+    default). Raw JSON files already in the cache folder are also read.
+    """
 
     host = r"https://api.the-odds-api.com/v3/"
 
@@ -80,133 +174,205 @@ class TheOddsAPI:
         key: str,
         cache_folder: Optional[str] = None,
         cache_file: Optional[str] = None,
+        backend: Optional[palpiteiro.cache.CacheBackend] = None,
     ):
         self.key = key
         self.cache_folder = "cache" if cache_folder is None else cache_folder
         self.cache_file = (
-            f"{self._cache_file_name(datetime.datetime.now())}.json"
+            self._cache_file_name(datetime.datetime.now())
             if cache_file is None
             else cache_file
         )
+        self.backend = (
+            palpiteiro.cache.DirectoryCache(
+                os.path.join(self.cache_folder, "betting_lines")
+            )
+            if backend is None
+            else backend
+        )
 
     @staticmethod
     def _cache_file_name(time: datetime.datetime):
         """ Create cache file name. """
-        hour = max([hour for hour in range(0, 24, 3) if hour <= time.hour])
-        return f"{time.date()}-{hour}.json"
+        return f"{odds_bucket(time)}.json"
 
     @staticmethod
     def clean_betting_lines(data: pd.DataFrame) -> pd.DataFrame:
-        """ Clean betting lines dataframe. """
+        """
+        Clean betting lines dataframe.
+
+        Head to head odds are averaged over all sites, counting each site once even
+        if it shows up in several regions. Sites without head to head odds are
+        ignored, and so are matches without any.
+        """
         # Remove entries with no odds.
         data = data[data["sites_count"] > 0]
 
-        delta = datetime.timedelta(hours=3)  # From UTC to BRT
-        data["date"] = [time_stamp - delta for time_stamp in data["commence_time"]]
+        # Head to head odds of each site, in a single pass over the sites. The first
+        # time a site shows up for a match is the one kept.
+        sites: Dict[Tuple[int, str], list] = {}
+        for match, match_sites in enumerate(data["sites"]):
+            for site in match_sites:
+                h2h = site["odds"].get("h2h", ())
+                if len(h2h) == 3:
+                    sites.setdefault((match, site["site_key"]), h2h)
+        matches = np.array([match for match, _ in sites], dtype=int)
+        h2h = np.array(list(sites.values()), dtype=float).reshape(-1, 3)
+
+        # Average odds of each match.
+        counts = np.bincount(matches, minlength=len(data))
+        totals = np.column_stack(
+            [np.bincount(matches, h2h[:, i], minlength=len(data)) for i in range(3)]
+        )
+        with_odds = counts > 0
+        odds = totals[with_odds] / counts[with_odds, np.newaxis]
+        data = data[with_odds]
 
         # Order is kind of random, so we cannot trust that the provider
         # arranged home team first, then away in the teams list.
-        data["home_team_index"] = [
-            teams.index(home) for teams, home in zip(data["teams"], data["home_team"])
-        ]
-        data["away_team_index"] = 1 - data["home_team_index"]
-
-        # Create a column for the away team.
-        data["away_team"] = [
-            teams[home_idx]
-            for teams, home_idx in zip(data["teams"], data["away_team_index"])
-        ]
-
-        # Organize odds in smaller sub-samples.
-        odds = [
-            np.array([row["odds"]["h2h"] for row in sites]).mean(0)
-            for sites in data["sites"]
-        ]
-
-        # Create odds columns.
         # The odds array has length equals to 3, and the index 1 is always the draw.
-        data["home_team_odds"] = [
-            row[i] for row, i in zip(odds, data["home_team_index"] * 2)
-        ]
-        data["draw_odds"] = [row[1] for row in odds]
-        data["away_team_odds"] = [
-            row[i] for row, i in zip(odds, data["away_team_index"] * 2)
-        ]
-
-        # Select columns to maintain.
-        return data[
-            [
-                "date",
-                "home_team",
-                "away_team",
-                "home_team_odds",
-                "draw_odds",
-                "away_team_odds",
-            ]
-        ]
+        teams = data["teams"].tolist()
+        first = np.array([match_teams[0] for match_teams in teams], dtype=object)
+        second = np.array([match_teams[1] for match_teams in teams], dtype=object)
+        home_team = data["home_team"].to_numpy()
+        home_first = first == home_team
+        home_second = second == home_team
+        if not (home_first | home_second).all():
+            unknown = home_team[~(home_first | home_second)].tolist()
+            raise ValueError(f"Home teams are not among the match teams: {unknown}.")
+
+        delta = datetime.timedelta(hours=3)  # From UTC to BRT
+        return pd.DataFrame(
+            {
+                "date": data["commence_time"] - delta,
+                "home_team": data["home_team"],
+                "away_team": np.where(home_first, second, first),
+                "home_team_odds": np.where(home_first, odds[:, 0], odds[:, 2]),
+                "draw_odds": odds[:, 1],
+                "away_team_odds": np.where(home_first, odds[:, 2], odds[:, 0]),
+            },
+            index=data.index,
+        )
+
+    def request_betting_lines(self) -> pd.DataFrame:
+        """ Request raw betting lines data frame. """
+        print("Requesting from The Odds API")
+        rqst = request_to_dict(
+            self.host + "odds",
+            key="data",
+            params={
+                "api_key": self.key,
+                "sport": "soccer_brazil_campeonato",
+                "region": "eu",
+                "mkt": "h2h",
+            },
+        )
+        # Parse it just like it was a cached file.
+        return pd.read_json(io.StringIO(json.dumps(rqst)))
 
     def betting_lines(self) -> pd.DataFrame:
         """ Get betting lines data frame. """
         # First check if the request wasn't already made to avoid excessive requests.
         cache_file_name = os.path.join(self.cache_folder, self.cache_file)
-        if not os.path.exists(cache_file_name):
+        data = BETTING_LINES_CACHE.get(cache_file_name)
+
+        if data is None:
+            data = self.backend.get(self.cache_file)
 
-            # Create cache folder if doesn't exist yet.
-            os.makedirs("cache", exist_ok=True)
+            if data is not None:
+                print("Loading from cache")
 
-            print("Requesting from The Odds API")
-            # Request.
-            rqst = requests.get(
-                url=self.host + "odds",
-                verify=False,
-                params={
-                    "api_key": self.key,
-                    "sport": "soccer_brazil_campeonato",
-                    "region": "eu",
-                    "mkt": "h2h",
-                },
-            ).json()["data"]
+            elif os.path.exists(cache_file_name):
+                print("Loading from cache")
+                data = self.clean_betting_lines(pd.read_json(cache_file_name))
 
-            # Save JSON to cache.
-            with open(cache_file_name, "w") as file:
-                json.dump(rqst, file)
+            else:
+                data = self.clean_betting_lines(self.request_betting_lines())
+                self.backend.set(self.cache_file, data)
 
-        else:
-            print("Loading from cache")
+            BETTING_LINES_CACHE.set(cache_file_name, data)
 
-        return self.clean_betting_lines(pd.read_json(cache_file_name))
+        # Avoid in-place transformations on the shared copy.
+        return data.copy()
 
     def get_matches(self, strf):
         """ Get matches with odds. """
-        games = [
-            f"{row.date.strftime(strf)} {row.home_team} x {row.away_team}"
-            for row in self.betting_lines().itertuples()
-        ]
-        return "\n".join(games)
-
-
-def get_club_id(club_names: Sequence[str]) -> List[int]:
-    """ Get club IDs from a sequence of names."""
-    # Load club names mapping.
-    with open(
-        os.path.join(THIS_FOLDER, "data", "clubs_names.json"), encoding="utf-8"
-    ) as file:
-        names_mapping = json.load(file)["nome"]
-
-    # Iterate through the sequence passe by the user.
-    club_id = []
-    for club in club_names:
-        # iterate through the mapping.
-        for i, names in names_mapping.items():
-            # If the mapping is present in values, append the club ID.
-            if club.lower() in [name.lower() for name in names]:
-                club_id.append(i)
-                break
-        # If it iterated through all keys without finding it, append None.
-        else:
-            club_id.append(None)
-
-    return club_id
+        return format_matches(self.betting_lines(), strf)
+
+
+def format_matches(odds: pd.DataFrame, strf: str) -> str:
+    """ Format matches as one line per match. """
+    games = [
+        f"{row.date.strftime(strf)} {row.home_team} x {row.away_team}"
+        for row in odds.itertuples()
+    ]
+    return "\n".join(games)
+
+
+def normalize_name(name: str) -> str:
+    """ Lowercase name without accents and surrounding spaces. """
+    name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode()
+    return name.lower().strip()
+
+
+def normalize_names(names: pd.Series) -> pd.Series:
+    """ Lowercase names without accents and surrounding spaces. """
+    names = names.astype(str).str.normalize("NFKD")
+    names = names.str.encode("ascii", "ignore").str.decode("ascii")
+    return names.str.lower().str.strip()
+
+
+class ClubNamesIndex:
+    """
+    Club ID by normalized club name, built from all known aliases.
+
+    Keeps track of the names it could not resolve.
+    """
+
+    def __init__(self, path: str = CLUBS_NAMES_PATH):
+        with open(path, encoding="utf-8") as file:
+            names_mapping = json.load(file)["nome"]
+
+        self.ids = {
+            normalize_name(name): int(club_id)
+            for club_id, names in names_mapping.items()
+            for name in names
+        }
+        self.hits = 0
+        self.misses = 0
+        self.unknown: Counter = Counter()
+
+    def resolve(self, names: Sequence[str]) -> pd.Series:
+        """ Get club IDs from a sequence of names. Missing for unknown names. """
+        names = pd.Series(names, dtype=object)
+        ids = normalize_names(names).map(self.ids).astype("Int64")
+
+        # Report.
+        missing = ids.isna()
+        self.misses += int(missing.sum())
+        self.hits += int(len(ids) - missing.sum())
+        self.unknown.update(names[missing.to_numpy()])
+
+        return ids
+
+
+_CLUB_NAMES_INDEX: Optional[ClubNamesIndex] = None
+
+
+def club_names_index() -> ClubNamesIndex:
+    """ Get the club names index. It is built only the first time. """
+    global _CLUB_NAMES_INDEX  # pylint: disable=global-statement
+    if _CLUB_NAMES_INDEX is None:
+        _CLUB_NAMES_INDEX = ClubNamesIndex()
+    return _CLUB_NAMES_INDEX
+
+
+def get_club_id(club_names: Sequence[str]) -> List[Optional[int]]:
+    """ Get club IDs from a sequence of names. None for unknown names. """
+    return [
+        None if pd.isna(club_id) else int(club_id)
+        for club_id in club_names_index().resolve(club_names)
+    ]
 
 
 def merge_clubs_and_odds(clubs: pd.DataFrame, odds: pd.DataFrame) -> pd.DataFrame:
@@ -244,7 +410,10 @@ def merge_clubs_and_odds(clubs: pd.DataFrame, odds: pd.DataFrame) -> pd.DataFram
 
 
 def get_clubs_with_odds(
-    key: str, cache_folder: Optional[str] = None, cache_file: Optional[str] = None
+    key: str,
+    cache_folder: Optional[str] = None,
+    cache_file: Optional[str] = None,
+    cartola_api: Optional[CartolaFCAPI] = None,
 ) -> pd.DataFrame:
     """ Get clubs data with odds included.. """
     # Get odds dataset.
@@ -252,7 +421,8 @@ def get_clubs_with_odds(
     odds = odds_api.betting_lines()
 
     # Get clubs dataset.
-    cartola_api = CartolaFCAPI()
+    if cartola_api is None:
+        cartola_api = CartolaFCAPI()
     clubs = cartola_api.clubs()
 
     # Merge them.
@@ -269,19 +439,14 @@ def get_matches(
     """ Get matches that that have odds available. """
     # Get odds dataset.
     odds_api = TheOddsAPI(key=key, cache_folder=cache_folder, cache_file=cache_file)
-    matches = odds_api.get_matches(strf=strf)
-
-    # Read clubs names.
-    with open(
-        os.path.join(THIS_FOLDER, "data", "clubs_names.json"), encoding="utf-8"
-    ) as file:
-        clubs_names = json.load(file)["nome"]
-
-    # Transform clubs into IDs
-    for id_, names in clubs_names.items():
-        for name in names:
-            if name in matches:
-                cartola_name = clubs.loc[int(id_)]["nome"]
-                matches = matches.replace(f" {name}", f" {cartola_name}")
-
-    return matches
+    odds = odds_api.betting_lines()
+
+    # Use Cartola FC clubs names. Keep the original name if the club is unknown.
+    cartola_names = clubs["nome"].copy()
+    cartola_names.index = cartola_names.index.astype(int)
+    index = club_names_index()
+    for column in ["home_team", "away_team"]:
+        names = index.resolve(odds[column]).map(cartola_names)
+        odds[column] = names.fillna(odds[column])
+
+    return format_matches(odds, strf)
@@ -0,0 +1,364 @@
+""" Columnar cache of the historical dataset, in the model features schema. """
+
+import argparse
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+import palpiteiro
+import palpiteiro.data
+import palpiteiro.history
+import palpiteiro.inference
+
+CACHE_FOLDER = os.path.join(palpiteiro.history.HISTORY_FOLDER, "columnar")
+
+# Version of the cache layout. Seasons of other versions are rebuilt.
+CACHE_FORMAT = 2
+
+# Columns of notebooks/data/README.md, with player and club IDs instead of names.
+COLUMNS = {
+    "year": np.int16,
+    "round": np.int8,
+    "id": np.int32,
+    "club": np.int16,
+    "position": np.int8,
+    "status": np.int8,
+    "matches": np.int8,
+    "mean": np.float32,
+    "price": np.float32,
+    "variation": np.float32,
+    "win": np.float32,
+    "lose": np.float32,
+    "draw": np.float32,
+    "point": np.float32,
+}
+
+# Machine learning model features, in the order of PlayerTable.features.
+FEATURES = [
+    "position",
+    "status",
+    "matches",
+    "mean",
+    "price",
+    "variation",
+    "win",
+    "lose",
+    "draw",
+]
+TARGET = "point"
+
+
+def normalize(data: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    Convert players from palpiteiro.history to the dataset columns.
+
+    Unknown positions and status are -1.
+    """
+    columns = {
+        "year": data["year"],
+        "round": data["round"],
+        "id": data["id"],
+        "club": data["club"],
+        "position": data["position_id"].map(palpiteiro.Player.position_map).fillna(-1),
+        "status": data["status_id"].map(palpiteiro.Player.status_map).fillna(-1),
+        "matches": data["matches"],
+        "mean": data["mean"],
+        "price": data["price"],
+        "variation": data["variation"],
+        "win": data["win"],
+        "lose": data["lose"],
+        "draw": data["draw"],
+        "point": data["points"],
+    }
+    return {
+        name: values.to_numpy().astype(COLUMNS[name])
+        for name, values in columns.items()
+    }
+
+
+def sources(season: int, folder: str = palpiteiro.history.HISTORY_FOLDER) -> List[str]:
+    """ Get the files a season is built from. """
+    cartola_folder = os.path.join(folder, "cartola")
+    return [
+        *palpiteiro.history.round_files(season, folder).values(),
+        os.path.join(cartola_folder, str(season), f"{season}_partidas.csv"),
+        os.path.join(cartola_folder, "times_ids.csv"),
+        os.path.join(folder, "betting", "historical_betting_lines.csv"),
+        palpiteiro.data.CLUBS_NAMES_PATH,
+    ]
+
+
+def signature(
+    season: int,
+    folder: str = palpiteiro.history.HISTORY_FOLDER,
+    cached: Optional[Dict[str, dict]] = None,
+) -> Dict[str, dict]:
+    """
+    Get the size, modification time and SHA-1 of each file a season is built from.
+
+    Files with the same size and modification time as in the cached signature are
+    not read, they keep their cached SHA-1.
+    """
+    cached = {} if cached is None else cached
+    files = {}
+    for path in sources(season, folder):
+        name = os.path.relpath(path, folder)
+        stat = os.stat(path)
+        files[name] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        previous = cached.get(name, {})
+        if all(previous.get(key) == value for key, value in files[name].items()):
+            files[name]["sha1"] = previous["sha1"]
+        else:
+            files[name]["sha1"] = palpiteiro.inference.file_sha1(path)
+    return files
+
+
+def build_season(
+    season: int,
+    folder: str = palpiteiro.history.HISTORY_FOLDER,
+    reader: Optional[palpiteiro.history.SeasonReader] = None,
+    rounds: Optional[Dict[int, str]] = None,
+) -> Tuple[Dict[str, np.ndarray], palpiteiro.history.SeasonReader]:
+    """
+    Build the dataset columns of a season.
+
+    Round files are read one at a time and converted as soon as they are read, so
+    only the columns of previous rounds are kept in memory. Pass the reader of a
+    cached season and its new rounds files to build the new rounds only.
+
+    Returns the columns and the reader, to go on with later rounds.
+    """
+    reader = palpiteiro.history.SeasonReader(season) if reader is None else reader
+    if rounds is None:
+        rounds = palpiteiro.history.round_files(season, folder)
+    matches = palpiteiro.history.load_matches(season, folder)
+    lines = palpiteiro.history.load_betting_lines(folder)
+    lines = lines[lines["year"] == season]
+
+    chunks = []
+    for round_, path in rounds.items():
+        data = reader.read(round_, path)
+        if data is not None:
+            chunks.append(normalize(palpiteiro.history.join_odds(data, matches, lines)))
+    columns = {
+        name: np.concatenate([chunk[name] for chunk in chunks] or [np.empty(0, dtype)])
+        for name, dtype in COLUMNS.items()
+    }
+    return columns, reader
+
+
+def read_metadata(season_folder: str) -> Optional[dict]:
+    """ Read the metadata of a cached season. None if it is not cached. """
+    path = os.path.join(season_folder, "metadata.json")
+    if not os.path.isfile(path):
+        return None
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def replace_file(path: str, write) -> None:
+    """ Write a file next to path and then move it there, so readers never see half. """
+    temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporary, "wb") as file:
+        write(file)
+    os.replace(temporary, path)
+
+
+def save_metadata(
+    season_folder: str, rows: int, season_signature: Dict[str, dict]
+) -> None:
+    """ Save the metadata.json file of a cached season. """
+    metadata = {
+        "format": CACHE_FORMAT,
+        "rows": rows,
+        "columns": {name: np.dtype(dtype).name for name, dtype in COLUMNS.items()},
+        "sources": season_signature,
+    }
+    replace_file(
+        os.path.join(season_folder, "metadata.json"),
+        lambda file: file.write(json.dumps(metadata, indent=4).encode("utf-8")),
+    )
+
+
+def save_season(
+    columns: Dict[str, np.ndarray],
+    season_folder: str,
+    season_signature: Dict[str, dict],
+    reader: palpiteiro.history.SeasonReader,
+) -> None:
+    """
+    Save the columns of a season as .npy files, its reader and a metadata.json file.
+
+    Files are replaced, not overwritten, so seasons memory-mapped by someone else
+    stay valid. Metadata goes last, so a season is complete once it has metadata.
+    """
+    os.makedirs(season_folder, exist_ok=True)
+    for name, array in columns.items():
+        replace_file(
+            os.path.join(season_folder, f"{name}.npy"),
+            lambda file, array=array: np.save(file, array),
+        )
+    replace_file(
+        os.path.join(season_folder, "reader.pkl"),
+        lambda file: pd.to_pickle(reader, file),
+    )
+    save_metadata(season_folder, len(columns["year"]), season_signature)
+
+
+def append_season(
+    season: int, folder: str, season_folder: str, rounds: Dict[int, str]
+) -> Tuple[Dict[str, np.ndarray], palpiteiro.history.SeasonReader]:
+    """ Build the new rounds of a cached season and append them to its columns. """
+    reader = pd.read_pickle(os.path.join(season_folder, "reader.pkl"))
+    new, reader = build_season(season, folder, reader, rounds)
+    columns = {
+        name: np.concatenate(
+            [np.load(os.path.join(season_folder, f"{name}.npy")), new[name]]
+        )
+        for name in COLUMNS
+    }
+    return columns, reader
+
+
+def build(
+    years: Optional[Sequence[int]] = None,
+    folder: str = palpiteiro.history.HISTORY_FOLDER,
+    cache_folder: str = CACHE_FOLDER,
+    force: bool = False,
+    verify: bool = True,
+) -> List[int]:
+    """
+    Build the cache of the seasons that are missing or out of date.
+
+    A season is out of date when any file it is built from changed. Files with the
+    size and modification time they were cached with are taken as unchanged, unless
+    verify is set, and others are hashed to tell. New rounds files after the last
+    cached round are built and appended, without reading the cached rounds again.
+    Other changes build the whole season again.
+
+    Returns the seasons that were built.
+    """
+    if years is None:
+        years = palpiteiro.history.seasons(folder)
+
+    built = []
+    for season in years:
+        season_folder = os.path.join(cache_folder, str(season))
+        metadata = read_metadata(season_folder)
+        if force or metadata is None or metadata["format"] != CACHE_FORMAT:
+            columns, reader = build_season(season, folder)
+            save_season(columns, season_folder, signature(season, folder), reader)
+            built.append(season)
+            continue
+
+        cached = metadata["sources"]
+        season_signature = signature(season, folder, None if verify else cached)
+        changed = {
+            name
+            for name in {*cached, *season_signature}
+            if cached.get(name, {}).get("sha1")
+            != season_signature.get(name, {}).get("sha1")
+        }
+        if not changed:
+            if season_signature != cached:  # Touched, but the same.
+                save_metadata(season_folder, metadata["rows"], season_signature)
+            continue
+
+        # Append new rounds files, if nothing else changed and they come last.
+        rounds = palpiteiro.history.round_files(season, folder)
+        new_rounds = {
+            round_: path
+            for round_, path in rounds.items()
+            if os.path.relpath(path, folder) not in cached
+        }
+        new_paths = {os.path.relpath(path, folder) for path in new_rounds.values()}
+        cached_rounds = [round_ for round_ in rounds if round_ not in new_rounds]
+        if changed == new_paths and min(new_rounds) > max(cached_rounds, default=0):
+            columns, reader = append_season(season, folder, season_folder, new_rounds)
+        else:
+            columns, reader = build_season(season, folder)
+        save_season(columns, season_folder, season_signature, reader)
+        built.append(season)
+    return built
+
+
+def load_columns(
+    years: Optional[Sequence[int]] = None,
+    folder: str = palpiteiro.history.HISTORY_FOLDER,
+    cache_folder: str = CACHE_FOLDER,
+    mmap_mode: Optional[str] = "r",
+) -> Dict[str, np.ndarray]:
+    """
+    Load the dataset columns of the seasons, building the cache first if needed.
+
+    The cache is checked by the size and modification time of the source files, so
+    a warm cache doesn't read them. A single season is memory-mapped read-only by
+    default. Several seasons are concatenated into memory.
+    """
+    if years is None:
+        years = palpiteiro.history.seasons(folder)
+    build(years, folder, cache_folder, verify=False)
+
+    seasons = [
+        {
+            name: np.load(
+                os.path.join(cache_folder, str(season), f"{name}.npy"),
+                mmap_mode=mmap_mode,
+            )
+            for name in COLUMNS
+        }
+        for season in years
+    ]
+    if len(seasons) == 1:
+        return seasons[0]
+    return {
+        name: np.concatenate([columns[name] for columns in seasons]) for name in COLUMNS
+    }
+
+
+def load(
+    years: Optional[Sequence[int]] = None,
+    folder: str = palpiteiro.history.HISTORY_FOLDER,
+    cache_folder: str = CACHE_FOLDER,
+) -> pd.DataFrame:
+    """ Load the dataset of the seasons as a data frame. See load_columns. """
+    return pd.DataFrame(load_columns(years, folder, cache_folder))
+
+
+def predictable(columns: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    Get which players of the dataset columns the model predicts.
+
+    Like in PlayerTable.features, players that are suspended, injured or null are
+    left out, as well as players missing some feature.
+    """
+    missing = np.column_stack([np.isnan(columns[name]) for name in FEATURES])
+    return (np.asarray(columns["status"]) > 2) & ~missing.any(axis=1)
+
+
+def features(columns: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """ Get the machine learning model features and target of predictable players. """
+    rows = predictable(columns)
+    x = np.column_stack([columns[name][rows] for name in FEATURES])
+    return x.astype(np.float64), np.asarray(columns[TARGET][rows], dtype=np.float64)
+
+
+def main():
+    """ Build the columnar cache of the historical dataset. """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--years", type=int, nargs="+", default=None)
+    parser.add_argument("--folder", default=palpiteiro.history.HISTORY_FOLDER)
+    parser.add_argument("--cache-folder", default=CACHE_FOLDER)
+    parser.add_argument("--force", action="store_true", help="Rebuild every season.")
+    args = parser.parse_args()
+
+    built = build(args.years, args.folder, args.cache_folder, force=args.force)
+    print(f"Built seasons: {', '.join(map(str, built)) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
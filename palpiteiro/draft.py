@@ -1,34 +1,170 @@
 """ Athletes draft. """
 
+import bisect
+import concurrent.futures
+import csv
+import json
+import math
+import os
 import random
-from typing import Sequence
+import time
+from collections import Counter, OrderedDict
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
 
 import numpy as np
 
 import palpiteiro
 
+# Line-up fitness, price and captain.
+Evaluation = Tuple[float, float, palpiteiro.Player]
+
 
 def assign_captain(line_up: palpiteiro.LineUp) -> palpiteiro.LineUp:
     """ Assign the player with the most expected points as captain. """
-    idx = np.argmax([player.predicted_points for player in line_up])
-    line_up.captain = line_up[idx]
+    line_up.captain = line_up.best_player
     return line_up
 
 
+class PlayerIndex:
+    """
+    Players grouped by position and sorted by price.
+
+    Built once per draft, so that finding affordable players at a position is a
+    bisect and a slice instead of a scan through the whole market.
+    """
+
+    # Random draws before falling back to filtering the affordable players.
+    max_tries = 10
+
+    def __init__(self, players: Sequence[palpiteiro.Player]):
+        self.players = list(players)
+        self.positions: Dict[int, List[palpiteiro.Player]] = {}
+        for player in sorted(self.players, key=lambda x: x.price):
+            self.positions.setdefault(player.position, []).append(player)
+        self.prices = {
+            pos: [player.price for player in players_list]
+            for pos, players_list in self.positions.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.players)
+
+    def affordable(self, position: int, budget: float) -> List[palpiteiro.Player]:
+        """ Get players from a position that cost up to the budget. """
+        if position not in self.positions:
+            return []
+        end = bisect.bisect_right(self.prices[position], budget)
+        return self.positions[position][:end]
+
+    def cheapest(
+        self, position: int, line_up: Optional[palpiteiro.LineUp] = None,
+    ) -> Optional[palpiteiro.Player]:
+        """ Get the cheapest player from a position that is not in the line-up. """
+        for player in self.positions.get(position, []):
+            if line_up is None or player not in line_up:
+                return player
+        return None
+
+    def cheapest_price(
+        self,
+        positions: Sequence[int],
+        line_up: Optional[palpiteiro.LineUp] = None,
+        player: Optional[palpiteiro.Player] = None,
+    ) -> float:
+        """
+        Get the price of filling the positions with the cheapest players.
+
+        Positions may be repeated. Players in the line-up and the given player are not
+        considered. Returns infinity if there aren't enough players.
+        """
+        total = 0.0
+        for pos, amount in Counter(positions).items():
+            for candidate in self.positions.get(pos, []):
+                if amount == 0:
+                    break
+                if (line_up is not None and candidate in line_up) or (
+                    player is not None and candidate.id == player.id
+                ):
+                    continue
+                total += candidate.price
+                amount -= 1
+            if amount > 0:
+                return math.inf
+        return total
+
+    def choice(
+        self,
+        positions: Sequence[int],
+        budget: float,
+        line_up: Optional[palpiteiro.LineUp] = None,
+    ) -> Optional[palpiteiro.Player]:
+        """
+        Randomly choose an affordable player from any of the positions.
+
+        Players already in the line-up are not chosen. Returns None if there is no
+        available player.
+        """
+        candidates = [self.affordable(pos, budget) for pos in positions]
+        total = sum(len(players_list) for players_list in candidates)
+        if total == 0:
+            return None
+
+        # Most of the times a random draw is not in the line-up yet.
+        for _ in range(self.max_tries):
+            draw = random.randrange(total)
+            for players_list in candidates:
+                if draw < len(players_list):
+                    player = players_list[draw]
+                    break
+                draw -= len(players_list)
+            if line_up is None or player not in line_up:
+                return player
+
+        # Otherwise filter the available players.
+        available = [
+            player
+            for players_list in candidates
+            for player in players_list
+            if line_up is None or player not in line_up
+        ]
+        if len(available) == 0:
+            return None
+        return random.choice(available)
+
+
+class InfeasibleBudget(ValueError):
+    """ It is not possible to draft a line-up with the available money. """
+
+
 def random_line_up(
     players: Sequence[palpiteiro.Player],
     schemes: Sequence[palpiteiro.Scheme],
     max_price: float,
+    index: Optional[PlayerIndex] = None,
 ) -> palpiteiro.LineUp:
-    """ Create a random valid line-up. """
-    # Select a random scheme.
-    scheme = random.choice(schemes)
+    """
+    Create a random valid line-up.
 
+    Each player is chosen leaving enough money to fill the remaining positions with
+    the cheapest players, so it never goes down a dead end. Raises InfeasibleBudget
+    if no scheme is affordable.
+    """
     # Separates players by position.
-    players_dict = {
-        pos: [player for player in players if player.position == pos]
-        for pos in scheme.dict.keys()
-    }
+    if index is None:
+        index = PlayerIndex(players)
+
+    # Select a random affordable scheme.
+    scheme = random.choice(feasible_schemes(index, schemes, max_price))
 
     # Create an empty line_up
     line_up = palpiteiro.LineUp([])
@@ -38,21 +174,24 @@ def random_line_up(
     random.shuffle(positions)
 
     remaining_money = max_price
-    for pos in positions:
+    for i, pos in enumerate(positions):
 
-        # Filter affordable players.
-        affordable_players = [
-            player
-            for player in players_dict[pos]
-            if player.price <= remaining_money and player not in line_up
-        ]
+        # Money needed to fill the next positions with the cheapest players.
+        next_positions = positions[i + 1 :]
+        reserve = index.cheapest_price(next_positions, line_up)
 
-        # If no affordable players, restart function.
-        if len(affordable_players) == 0:
-            return random_line_up(players=players, schemes=schemes, max_price=max_price)
+        # Randomly choose an affordable player.
+        random_choice = index.choice([pos], remaining_money - reserve, line_up)
 
-        # Randomly choose a player and add to the line up.
-        random_choice = random.choice(affordable_players)
+        # If the choice is one of the cheapest players for the next positions,
+        # the reserve might not be enough anymore. Then take the cheapest player.
+        if random_choice is None or (
+            index.cheapest_price(next_positions, line_up, random_choice)
+            > remaining_money - random_choice.price
+        ):
+            random_choice = index.cheapest(pos, line_up)
+
+        # Add to the line up.
         line_up.add(random_choice)
 
         # Remove price from money.
@@ -77,86 +216,293 @@ def mutate_line_up(
     players: Sequence[palpiteiro.Player],
     schemes: Sequence[palpiteiro.Scheme],
     max_price: float,
+    index: Optional[PlayerIndex] = None,
+    counters: Optional[Counter] = None,
 ) -> palpiteiro.LineUp:
-    """ Change a single random player in the line up. """
-    # Avoid inplace transformations.
-    line_up = line_up.copy()
+    """
+    Change a single random player in the line up.
 
-    # Choose a random player to remove.
-    player_to_remove = random.choice(line_up)
-    line_up.remove(player_to_remove)
+    Tries to remove each player in a random order until one of them can be replaced.
+    If none can, the line-up is returned unchanged. Counts players tried and
+    failures as "mutation_tries" and "mutation_failures" in counters.
+    """
+    # Separates players by position.
+    if index is None:
+        index = PlayerIndex(players)
+    if counters is None:
+        counters = Counter()
 
-    positions = line_up.scheme.open_positions(schemes)
+    # Choose players to remove in a random order.
+    players_to_remove = random.sample(line_up.players, len(line_up))
+    for player_to_remove in players_to_remove:
+        counters["mutation_tries"] += 1
 
-    # Estimate the maximum price that the new player can cost.
-    max_player_price = max_price - line_up.price
+        # Avoid inplace transformations.
+        new_line_up = line_up.copy()
+        new_line_up.remove(player_to_remove)
 
-    # Filter available players.
-    available_players = [
-        player
-        for player in players
-        if (player not in line_up.players)
-        and (player.position in positions)
-        and (player.price < max_player_price)
-    ]
+        positions = new_line_up.scheme.open_positions(schemes)
 
-    if len(available_players) == 0:
-        # If no available player. Apply recursion.
-        return mutate_line_up(
-            line_up=line_up, players=players, schemes=schemes, max_price=max_price,
-        )
+        # Estimate the maximum price that the new player can cost.
+        max_player_price = max_price - new_line_up.price
 
-    new_player = random.choice(available_players)
+        # Randomly choose an available player.
+        new_player = index.choice(positions, max_player_price, new_line_up)
 
-    # Add new player.
-    line_up.add(new_player)
+        # If no available player, try to remove another one.
+        if new_player is None:
+            continue
 
-    return assign_captain(line_up)
+        # Add new player.
+        new_line_up.add(new_player)
+
+        return assign_captain(new_line_up)
+
+    counters["mutation_failures"] += 1
+    return assign_captain(line_up.copy())
 
 
 def crossover_line_up(
-    line_up1: palpiteiro.LineUp, line_up2: palpiteiro.LineUp, max_price: float,
+    line_up1: palpiteiro.LineUp,
+    line_up2: palpiteiro.LineUp,
+    max_price: float,
+    tries: int = 10,
+    counters: Optional[Counter] = None,
 ) -> palpiteiro.LineUp:
     """
     Cross-over two line_ups.
 
-    Keeps line-up 1 scheme.
+    Keeps line-up 1 scheme. If neither offspring is affordable, it keeps crossing
+    them over up to the amount of tries, and then gives up returning line-up 1.
+    Counts tries and failures as "crossover_tries" and "crossover_failures" in
+    counters.
     """
+    if counters is None:
+        counters = Counter()
+
     # Avoid inplace transformations.
+    original = line_up1
     line_up1 = line_up1.copy()
     line_up2 = line_up2.copy()
 
-    # Iterates through each player.
-    for i in range(len(line_up1)):
+    # Players are only swapped within a position, so positions never change.
+    positions1 = [player.position for player in line_up1]
+    positions2 = [player.position for player in line_up2]
 
-        # Randomly decide to switch genes or not.
-        if not random.choice([True, False]):
-            # If false goes to the next player from line up 1.
-            continue
+    for _ in range(tries):
+        counters["crossover_tries"] += 1
 
-        # If True, search for a player from the same position on Line Up 2.
-        for j in range(len(line_up2)):
-            if (
-                line_up1[i].position == line_up2[j].position
-                and line_up2[j] not in line_up1
-                and line_up1[i] not in line_up2
-            ):
-                # Swap players and exit loop.
-                line_up1[i], line_up2[j] = line_up2[j], line_up1[i]
-                break
+        # Iterates through each player.
+        for i in range(len(line_up1)):
+
+            # Randomly decide to switch genes or not.
+            if not random.choice([True, False]):
+                # If false goes to the next player from line up 1.
+                continue
+
+            # If True, search for a player from the same position on Line Up 2.
+            for j in range(len(line_up2)):
+                if (
+                    positions1[i] == positions2[j]
+                    and line_up2[j] not in line_up1
+                    and line_up1[i] not in line_up2
+                ):
+                    # Swap players and exit loop.
+                    line_up1[i], line_up2[j] = line_up2[j], line_up1[i]
+                    break
+
+            # If no player from the same position is found. Nothing will happen.
+
+        # If line up 1 price is affordable, return line up 1.
+        if line_up1.price <= max_price:
+            return assign_captain(line_up1)
+
+        # If line up 1 is not affordable and line up 2 is, return line up 2.
+        if line_up2.price <= max_price:
+            return assign_captain(line_up2)
+
+    counters["crossover_failures"] += 1
+    return assign_captain(original.copy())
+
+
+def feasible_schemes(
+    index: PlayerIndex, schemes: Sequence[palpiteiro.Scheme], max_price: float,
+) -> List[palpiteiro.Scheme]:
+    """
+    Get schemes whose cheapest line-up is affordable.
+
+    Raises InfeasibleBudget if there is none.
+    """
+    feasible = [
+        scheme
+        for scheme in schemes
+        if index.cheapest_price(
+            [pos for pos, amount in scheme.dict.items() for _ in range(amount)]
+        )
+        <= max_price
+    ]
+    if len(feasible) == 0:
+        raise InfeasibleBudget(
+            f"It is not possible to draft a line-up with {max_price} cartoletas."
+        )
+    return feasible
+
+
+class FitnessCache:
+    """
+    Bounded least recently used cache of line-ups fitness.
+
+    Keyed by the line-up players IDs, so the same team is only evaluated once no
+    matter how many times the genetic algorithm creates it again.
+    """
 
-        # If no player from the same position is found. Nothing will happen.
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[FrozenSet[int], Evaluation]" = OrderedDict()
 
-    # If line up 1 price is affordable, return line up 1.
-    if line_up1.price <= max_price:
-        return assign_captain(line_up1)
+    def __len__(self) -> int:
+        return len(self._data)
 
-    # If line up 1 is not affordable and line up 2 is, return line up 2.
-    if line_up2.price <= max_price:
-        return assign_captain(line_up2)
+    @property
+    def hit_ratio(self) -> float:
+        """ Fraction of evaluations served from the cache. """
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
 
-    # If price is too high, apply recursion.
-    crossover_line_up(line_up1=line_up1, line_up2=line_up2, max_price=max_price)
+    def evaluate(self, line_up: palpiteiro.LineUp) -> Evaluation:
+        """ Get line-up fitness, price and captain. """
+        key = frozenset(line_up.players_ids)
+        if key in self._data:
+            self.hits += 1
+            self._data.move_to_end(key)
+            return self._data[key]
+
+        self.misses += 1
+        captain = max(line_up, key=lambda x: x.predicted_points)
+        fitness = (
+            sum([player.predicted_points for player in line_up])
+            + captain.predicted_points
+        )
+        value = (fitness, line_up.price, captain)
+
+        # Store it and forget the least recently used if it is full.
+        self._data[key] = value
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+        return value
+
+    def fitness(self, line_up: palpiteiro.LineUp) -> float:
+        """ Get line-up fitness. """
+        return self.evaluate(line_up)[0]
+
+
+class DraftReport:
+    """
+    Summary of a genetic algorithm run.
+
+    Pass one to draft to find out how many generations ran and why it stopped.
+    """
+
+    # Stop reasons.
+    GENERATIONS = "generations"  # Ran all generations.
+    PATIENCE = "patience"  # Best fitness stopped improving.
+    DEADLINE = "deadline"  # Ran out of time.
+
+    def __init__(self):
+        self.generations = 0
+        self.reason: Optional[str] = None
+        self.best_fitness = -math.inf
+        self.elapsed = 0.0
+
+    def __repr__(self) -> str:
+        return (
+            f"<DraftReport {self.reason} after {self.generations} generations "
+            f"in {self.elapsed:.2f}s>"
+        )
+
+
+class GenerationStats(NamedTuple):
+    """
+    Statistics of a genetic algorithm generation.
+
+    Fitness and unique individuals are from the ranked population that breeds the
+    next one. Seconds are spent ranking it (evaluating new individuals), in
+    tournaments and in each operator.
+    """
+
+    generation: int
+    elapsed: float
+    best_fitness: float
+    mean_fitness: float
+    unique_ratio: float
+    evaluations: int
+    crossovers: int
+    mutations: int
+    crossover_tries: int
+    crossover_failures: int
+    mutation_tries: int
+    mutation_failures: int
+    ranking_seconds: float
+    tournament_seconds: float
+    crossover_seconds: float
+    mutation_seconds: float
+
+
+class GenerationRecorder:
+    """
+    Draft observer that keeps the statistics of every generation.
+
+    Pass one as the draft observer and dump them as CSV or JSON afterwards.
+    """
+
+    def __init__(self):
+        self.generations: List[GenerationStats] = []
+
+    def __call__(self, stats: GenerationStats) -> None:
+        self.generations.append(stats)
+
+    def __len__(self) -> int:
+        return len(self.generations)
+
+    def to_csv(self, path: str) -> None:
+        """ Write one row per generation. """
+        with open(path, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(GenerationStats._fields)
+            writer.writerows(self.generations)
+
+    def to_json(self, path: str) -> None:
+        """ Write a list with one object per generation. """
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump([stats._asdict() for stats in self.generations], file, indent=4)
+
+
+def monotonic_deadline(
+    time_budget: Optional[float] = None, deadline: Optional[float] = None
+) -> Optional[float]:
+    """
+    Get the earliest deadline on the time.monotonic clock.
+
+    The time budget is in seconds from now and the deadline is a time.time timestamp.
+    """
+    now = time.monotonic()
+    deadlines = []
+    if time_budget is not None:
+        deadlines.append(now + time_budget)
+    if deadline is not None:
+        deadlines.append(now + deadline - time.time())
+    return min(deadlines) if deadlines else None
+
+
+# Options of draft supported by each method, besides the genetic algorithm ones.
+METHOD_OPTIONS = {
+    "genetic": {"cache", "time_budget", "deadline", "patience", "report", "observer"},
+    "array": {"time_budget", "deadline", "patience", "report"},
+    "island": {"time_budget", "deadline", "patience", "report"},
+    "exact": set(),
+}
 
 
 def draft(
@@ -167,50 +513,797 @@ def draft(
     max_price: float,
     tournament_size: int,
     elite: int = 1,
+    method: str = "genetic",
+    cache: Optional[FitnessCache] = None,
+    time_budget: Optional[float] = None,
+    deadline: Optional[float] = None,
+    patience: Optional[int] = None,
+    report: Optional[DraftReport] = None,
+    observer: Optional[Callable[[GenerationStats], Any]] = None,
 ) -> palpiteiro.LineUp:
-    """ Draft best team possible using genetic algorithm. """
+    """
+    Draft best team possible using genetic algorithm.
+
+    Method "genetic" evolves a population of LineUp objects, while "array" runs the
+    same algorithm on a matrix of player indices (see array_draft). Method "island"
+    evolves one population per CPU in parallel, splitting the generations among them
+    (see island_draft). Method "exact" ignores the genetic algorithm parameters and
+    returns the optimal line-up (see exact_draft).
+
+    The "genetic" method evaluates line-ups through a FitnessCache. Pass one to
+    inspect its hit and miss counters after the draft.
+
+    The "genetic", "array" and "island" methods stop early after time_budget
+    seconds, at the deadline timestamp or after patience generations without
+    improving the best fitness, returning the best line-up so far. Pass a
+    DraftReport to find out why it stopped.
+
+    The "genetic" method calls the observer with the GenerationStats of every
+    generation, like a GenerationRecorder does.
+
+    Raises ValueError if an option is passed to a method that does not support it.
+    """
+    if method not in METHOD_OPTIONS:
+        raise ValueError(f"Unknown draft method: {method}")
+    options = {
+        "cache": cache,
+        "time_budget": time_budget,
+        "deadline": deadline,
+        "patience": patience,
+        "report": report,
+        "observer": observer,
+    }
+    unsupported = [
+        name
+        for name, value in options.items()
+        if value is not None and name not in METHOD_OPTIONS[method]
+    ]
+    if unsupported:
+        raise ValueError(
+            f"Draft method {method} does not support: {', '.join(unsupported)}."
+        )
+
+    stop_at = monotonic_deadline(time_budget, deadline)
+
+    if method == "exact":
+        return exact_draft(players=players, schemes=schemes, max_price=max_price)
+    if method == "array":
+        return array_draft(
+            individuals=individuals,
+            generations=generations,
+            players=players,
+            schemes=schemes,
+            max_price=max_price,
+            tournament_size=tournament_size,
+            elite=elite,
+            deadline=stop_at,
+            patience=patience,
+            report=report,
+        )
+    if method == "island":
+        return island_draft(
+            individuals=individuals,
+            generations=generations,
+            players=players,
+            schemes=schemes,
+            max_price=max_price,
+            tournament_size=tournament_size,
+            elite=elite,
+            deadline=stop_at,
+            patience=patience,
+            report=report,
+        )
+
+    # Separates players by position once for the whole draft.
+    index = PlayerIndex(players)
+
+    if cache is None:
+        cache = FitnessCache()
+
     # Create initial population.
-    pop = [random_line_up(players, schemes, max_price) for _ in range(individuals)]
+    pop = [
+        random_line_up(players, schemes, max_price, index) for _ in range(individuals)
+    ]
 
     # Run for the selected number of generations.
-    for i in range(generations):
+    pop = evolve(
+        pop=pop,
+        generations=generations,
+        players=players,
+        schemes=schemes,
+        max_price=max_price,
+        tournament_size=tournament_size,
+        elite=elite,
+        index=index,
+        cache=cache,
+        deadline=stop_at,
+        patience=patience,
+        report=report,
+        observer=observer,
+    )
+
+    # Return the line up with the most predicted points.
+    return pop[0]
+
+
+def evolve(
+    pop: List[palpiteiro.LineUp],
+    generations: int,
+    players: Sequence[palpiteiro.Player],
+    schemes: Sequence[palpiteiro.Scheme],
+    max_price: float,
+    tournament_size: int,
+    elite: int,
+    index: PlayerIndex,
+    cache: FitnessCache,
+    deadline: Optional[float] = None,
+    patience: Optional[int] = None,
+    report: Optional[DraftReport] = None,
+    observer: Optional[Callable[[GenerationStats], Any]] = None,
+) -> List[palpiteiro.LineUp]:
+    """
+    Evolve a population. Returns it ranked from the best to the worst.
+
+    Stops early at the deadline (on the time.monotonic clock) or after patience
+    generations without improvement. The best line-up so far is always kept. The
+    observer is called with the statistics of every generation.
+    """
+    if report is None:
+        report = DraftReport()
+    start = time.monotonic()
+    individuals = len(pop)
+    best = max(pop, key=cache.fitness)
+    report.best_fitness = cache.fitness(best)
+    report.reason = DraftReport.GENERATIONS
+    stale = 0
+
+    for _ in range(generations):
+
+        # Check time before starting a new generation.
+        if deadline is not None and time.monotonic() >= deadline:
+            report.reason = DraftReport.DEADLINE
+            break
 
         # Rank entire population.
-        pop = sorted(pop, key=lambda x: x.predicted_points, reverse=True)
+        generation_start = time.perf_counter()
+        misses = cache.misses
+        pop = sorted(pop, key=cache.fitness, reverse=True)
+        ranking_end = time.perf_counter()
+
+        # Keep track of the best line-up so far.
+        if cache.fitness(pop[0]) > report.best_fitness:
+            best = pop[0]
+            report.best_fitness = cache.fitness(best)
+            stale = 0
+        else:
+            stale += 1
+            if patience is not None and stale >= patience:
+                report.reason = DraftReport.PATIENCE
+                break
 
         # Create new population.
-        new_pop = []
+        new_pop: List[palpiteiro.LineUp] = []
+        counters: Counter = Counter()
         while len(new_pop) < individuals:
 
             # If elitism is activate:
             # Keep the best individual and do not create a new individual instead.
             if len(new_pop) < elite:
-                new_pop.append(pop[len(new_pop) + 1])
+                new_pop.append(pop[len(new_pop)])
                 continue
 
             # If elite was already separated, begin tournaments.
             # Rank randomly selected individuals and rank them by fitness.
+            tournament_start = time.perf_counter()
             ranking = sorted(
-                random.sample(pop, tournament_size),
-                key=lambda x: x.predicted_points,
-                reverse=True,
+                random.sample(pop, tournament_size), key=cache.fitness, reverse=True,
             )
+            operator_start = time.perf_counter()
+            counters["tournament_seconds"] += operator_start - tournament_start
 
             # Coin-flip. If True crossover, else mutation.
             if random.choice([True, False]):
                 offspring = crossover_line_up(
-                    line_up1=ranking[0], line_up2=ranking[1], max_price=max_price
+                    line_up1=ranking[0],
+                    line_up2=ranking[1],
+                    max_price=max_price,
+                    counters=counters,
                 )
+                counters["crossovers"] += 1
+                counters["crossover_seconds"] += time.perf_counter() - operator_start
             else:
                 offspring = mutate_line_up(
                     line_up=ranking[0],
                     players=players,
                     schemes=schemes,
                     max_price=max_price,
+                    index=index,
+                    counters=counters,
                 )
+                counters["mutations"] += 1
+                counters["mutation_seconds"] += time.perf_counter() - operator_start
 
             new_pop.append(offspring)
+
+        if observer is not None:
+            fitness = [cache.fitness(line_up) for line_up in pop]
+            unique = {frozenset(line_up.players_ids) for line_up in pop}
+            observer(
+                GenerationStats(
+                    generation=report.generations,
+                    elapsed=time.perf_counter() - generation_start,
+                    best_fitness=fitness[0],
+                    mean_fitness=sum(fitness) / len(fitness),
+                    unique_ratio=len(unique) / len(pop),
+                    evaluations=cache.misses - misses,
+                    crossovers=counters["crossovers"],
+                    mutations=counters["mutations"],
+                    crossover_tries=counters["crossover_tries"],
+                    crossover_failures=counters["crossover_failures"],
+                    mutation_tries=counters["mutation_tries"],
+                    mutation_failures=counters["mutation_failures"],
+                    ranking_seconds=ranking_end - generation_start,
+                    tournament_seconds=counters["tournament_seconds"],
+                    crossover_seconds=counters["crossover_seconds"],
+                    mutation_seconds=counters["mutation_seconds"],
+                )
+            )
+
         pop = new_pop
+        report.generations += 1
 
-    # Return the line up with the most predicted points.
-    return sorted(pop, key=lambda x: x.predicted_points, reverse=True)[0]
+    report.elapsed = time.monotonic() - start
+
+    # Make sure the best line-up so far was not lost.
+    pop = sorted(pop, key=cache.fitness, reverse=True)
+    if cache.fitness(best) > cache.fitness(pop[0]):
+        pop = [best] + pop[:-1]
+    report.best_fitness = cache.fitness(pop[0])
+    return pop
+
+
+# Island model worker state. It is set once per process by _init_island.
+_ISLAND: Dict[str, Any] = {}
+
+
+def _init_island(
+    players: Sequence[palpiteiro.Player],
+    schemes: Sequence[palpiteiro.Scheme],
+    max_price: float,
+    tournament_size: int,
+    elite: int,
+) -> None:
+    """ Initialize an island model worker process. """
+    _ISLAND.update(
+        players=players,
+        schemes=schemes,
+        max_price=max_price,
+        tournament_size=tournament_size,
+        elite=elite,
+        index=PlayerIndex(players),
+        cache=FitnessCache(),
+        positions={player.id: i for i, player in enumerate(players)},
+    )
+
+
+def _evolve_island(
+    task: Tuple[int, int, int, Optional[List[List[int]]], Optional[float]]
+) -> Tuple[List[List[int]], int, float]:
+    """
+    Evolve an island population inside a worker process.
+
+    The task holds a random seed, the amount of individuals and generations, the
+    population as lists of players positions in the players sequence (None to create
+    a random one) and the deadline. Returns the evolved population in the same
+    format, how many generations ran and the best fitness.
+    """
+    seed, individuals, generations, rows, deadline = task
+    players = _ISLAND["players"]
+    schemes = _ISLAND["schemes"]
+    max_price = _ISLAND["max_price"]
+    index = _ISLAND["index"]
+
+    # Each island has its own random stream.
+    random.seed(seed)
+
+    if rows is None:
+        pop = [
+            random_line_up(players, schemes, max_price, index)
+            for _ in range(individuals)
+        ]
+    else:
+        pop = [
+            assign_captain(palpiteiro.LineUp([players[i] for i in row]))
+            for row in rows
+        ]
+
+    report = DraftReport()
+    pop = evolve(
+        pop=pop,
+        generations=generations,
+        players=players,
+        schemes=schemes,
+        max_price=max_price,
+        tournament_size=_ISLAND["tournament_size"],
+        elite=_ISLAND["elite"],
+        index=index,
+        cache=_ISLAND["cache"],
+        deadline=deadline,
+        report=report,
+    )
+    rows = [[_ISLAND["positions"][player.id] for player in line_up] for line_up in pop]
+    return rows, report.generations, report.best_fitness
+
+
+def island_draft(
+    individuals: int,
+    generations: int,
+    players: Sequence[palpiteiro.Player],
+    schemes: Sequence[palpiteiro.Scheme],
+    max_price: float,
+    tournament_size: int,
+    elite: int = 1,
+    islands: Optional[int] = None,
+    migration_interval: int = 50,
+    migrants: int = 1,
+    processes: Optional[int] = None,
+    deadline: Optional[float] = None,
+    patience: Optional[int] = None,
+    report: Optional[DraftReport] = None,
+) -> palpiteiro.LineUp:
+    """
+    Draft best team possible using an island model genetic algorithm.
+
+    Each island is an independent population with the given amount of individuals,
+    evolving in a worker process. Generations are the total budget, split evenly
+    among islands: each one evolves for ceil(generations / islands) generations, so
+    the draft evaluates about as many line-ups as draft() with the same arguments.
+    Every migration_interval generations the best line-ups from each island replace
+    the worst ones from the next island. By default there is one island per CPU.
+
+    Islands stop at the deadline (on the time.monotonic clock). Patience is checked
+    between migrations, against the best fitness among all islands. Like the report
+    generations, it counts the generations of every island.
+    """
+    if not 0 <= migrants < individuals:
+        raise ValueError("Migrants must be at least zero and less than individuals.")
+    if islands is None:
+        islands = os.cpu_count() or 1
+    if report is None:
+        report = DraftReport()
+    start = time.monotonic()
+    report.reason = DraftReport.GENERATIONS
+    stale = 0
+
+    # Fail before starting the workers if no line-up is affordable.
+    feasible_schemes(PlayerIndex(players), schemes, max_price)
+
+    populations: List[Optional[List[List[int]]]] = [None] * islands
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=processes,
+        initializer=_init_island,
+        initargs=(players, schemes, max_price, tournament_size, elite),
+    ) as executor:
+
+        remaining = math.ceil(generations / islands)
+        while True:
+            epoch = min(migration_interval, remaining)
+            remaining -= epoch
+            tasks = [
+                (random.getrandbits(32), individuals, epoch, rows, deadline)
+                for rows in populations
+            ]
+            results = list(executor.map(_evolve_island, tasks))
+            populations = [rows for rows, _, _ in results]
+
+            # Islands run in lockstep, unless some of them ran out of time.
+            ran = [island_generations for _, island_generations, _ in results]
+            report.generations += sum(ran)
+            best_fitness = max(fitness for _, _, fitness in results)
+            if best_fitness > report.best_fitness:
+                report.best_fitness = best_fitness
+                stale = 0
+            else:
+                stale += sum(ran)
+
+            if min(ran) < epoch or (
+                deadline is not None and time.monotonic() >= deadline
+            ):
+                report.reason = DraftReport.DEADLINE
+                break
+            if patience is not None and stale >= patience:
+                report.reason = DraftReport.PATIENCE
+                break
+            if remaining == 0:
+                break
+
+            # Migration. Populations are ranked, so the best are the first ones.
+            if migrants > 0:
+                bests = [rows[:migrants] for rows in populations]
+                for i, rows in enumerate(populations):
+                    rows[-migrants:] = bests[i - 1]
+
+    # Return the line up with the most predicted points among all islands.
+    line_ups = [
+        assign_captain(palpiteiro.LineUp([players[i] for i in rows[0]]))
+        for rows in populations
+    ]
+    best = max(line_ups, key=lambda x: x.predicted_points)
+    report.best_fitness = best.predicted_points
+    report.elapsed = time.monotonic() - start
+    return best
+
+
+def players_arrays(
+    players: Sequence[palpiteiro.Player],
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Get price, predicted points and position vectors from a players sequence.
+
+    An extra null player (zero price, zero points, position zero) is appended at
+    index len(players) to fill the empty slots of a line-up.
+    """
+    # Players from a single table are gathered straight from its arrays.
+    tables = {id(player.table): player.table for player in players}
+    if len(tables) == 1:
+        (table,) = tables.values()
+        rows = np.array([player.row for player in players], dtype=int)
+        price = np.append(table.price[rows], 0.0)
+        points = np.append(table.predicted_points[rows], 0.0)
+        position = np.append(table.position[rows], 0)
+        return price, points, position
+
+    price = np.array([player.price for player in players] + [0.0], dtype=float)
+    points = np.array(
+        [player.predicted_points for player in players] + [0.0], dtype=float
+    )
+    position = np.array([player.position for player in players] + [0], dtype=int)
+    return price, points, position
+
+
+def slots_positions(schemes: Sequence[palpiteiro.Scheme]) -> np.ndarray:
+    """
+    Get the position of each slot in a line-up row.
+
+    Slots are grouped by position, with as many slots as the maximum amount of that
+    position among all schemes. So every scheme fits in the same row layout.
+    """
+    max_amount: Dict[int, int] = {}
+    for scheme in schemes:
+        for pos, amount in scheme.dict.items():
+            max_amount[pos] = max(max_amount.get(pos, 0), amount)
+    return np.array(
+        [pos for pos in sorted(max_amount) for _ in range(max_amount[pos])], dtype=int
+    )
+
+
+def line_up_to_row(
+    line_up: palpiteiro.LineUp, index: Dict[int, int], slots: np.ndarray, null: int,
+) -> np.ndarray:
+    """ Transform a line-up into a row of player indices. """
+    row = np.full(len(slots), null, dtype=int)
+    for player in line_up:
+        # Fill the first empty slot from the player position.
+        slot = np.flatnonzero((slots == player.position) & (row == null))[0]
+        row[slot] = index[player.id]
+    return row
+
+
+def evaluate_population(
+    pop: np.ndarray, price: np.ndarray, points: np.ndarray, max_price: float, null: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Get fitness and price of each row in a population matrix.
+
+    Fitness is the predicted points with the best player doubled as captain.
+    Line-ups above the max price have minus infinity fitness.
+    """
+    cost = price[pop].sum(axis=1)
+    gathered = points[pop]
+    captain = np.where(pop == null, -np.inf, gathered).max(axis=1)
+    fitness = gathered.sum(axis=1) + captain
+    fitness[cost > max_price] = -np.inf
+    return fitness, cost
+
+
+def array_draft(
+    individuals: int,
+    generations: int,
+    players: Sequence[palpiteiro.Player],
+    schemes: Sequence[palpiteiro.Scheme],
+    max_price: float,
+    tournament_size: int,
+    elite: int = 1,
+    mutation_tries: int = 8,
+    deadline: Optional[float] = None,
+    patience: Optional[int] = None,
+    report: Optional[DraftReport] = None,
+) -> palpiteiro.LineUp:
+    """
+    Draft best team possible using a genetic algorithm on arrays.
+
+    The population is an integer matrix with one row per line-up and one column per
+    slot (see slots_positions). Fitness, price and captain bonus are computed with
+    vectorized gathers on vectors pulled once from the players sequence.
+
+    Crossovers keep line-up 1 scheme and fall back to line-up 1 if the offspring is
+    not affordable. Mutations replace a random player by another player from the
+    same position, sampling up to mutation_tries candidates.
+
+    Stops early at the deadline (on the time.monotonic clock) or after patience
+    generations without improvement.
+    """
+    if report is None:
+        report = DraftReport()
+    start = time.monotonic()
+
+    # The numpy generator is seeded from the random module,
+    # so random.seed keeps the results reproducible.
+    rng = np.random.default_rng(random.getrandbits(64))
+
+    price, points, position = players_arrays(players)
+    null = len(players)
+    index = {player.id: i for i, player in enumerate(players)}
+    slots = slots_positions(schemes)
+
+    # Players indices by position padded with the null player.
+    pool = [np.flatnonzero(position[:null] == pos) for pos in range(position.max() + 1)]
+    pool_size = np.array([len(indices) for indices in pool])
+    pool_matrix = np.full((len(pool), max(pool_size.max(), 1)), null, dtype=int)
+    for pos, indices in enumerate(pool):
+        pool_matrix[pos, : len(indices)] = indices
+
+    # Create initial population.
+    player_index = PlayerIndex(players)
+    pop = np.array(
+        [
+            line_up_to_row(
+                random_line_up(players, schemes, max_price, player_index),
+                index,
+                slots,
+                null,
+            )
+            for _ in range(individuals)
+        ]
+    )
+    fitness, cost = evaluate_population(pop, price, points, max_price, null)
+    best = pop[fitness.argmax()]
+    report.best_fitness = fitness.max()
+    report.reason = DraftReport.GENERATIONS
+    stale = 0
+
+    offsprings = individuals - elite
+    rows = np.arange(offsprings)
+    for generation in range(generations):
+
+        # Check time before starting a new generation.
+        if deadline is not None and time.monotonic() >= deadline:
+            report.reason = DraftReport.DEADLINE
+            break
+
+        # Keep track of the best line-up so far.
+        if generation > 0 and fitness.max() > report.best_fitness:
+            best = pop[fitness.argmax()]
+            report.best_fitness = fitness.max()
+            stale = 0
+        elif generation > 0:
+            stale += 1
+            if patience is not None and stale >= patience:
+                report.reason = DraftReport.PATIENCE
+                break
+
+        # Keep the best individuals.
+        elite_pop = pop[np.argsort(-fitness)[:elite]]
+
+        # Tournaments. Each row holds randomly selected individuals without repetition.
+        contenders = rng.random((offsprings, individuals)).argsort(axis=1)
+        contenders = contenders[:, :tournament_size]
+        ranking = np.argsort(-fitness[contenders], axis=1)
+        parent1 = contenders[rows, ranking[:, 0]]
+        parent2 = contenders[rows, ranking[:, 1]]
+        line_ups1 = pop[parent1]
+        line_ups2 = pop[parent2]
+
+        # Crossover. Randomly swap slots with players from the same position that
+        # are not in line-up 1. Empty slots are never swapped, to keep the scheme.
+        swap = rng.random(line_ups1.shape) < 0.5
+        swap &= (line_ups1 != null) & (line_ups2 != null)
+        swap &= ~(line_ups2[:, :, None] == line_ups1[:, None, :]).any(axis=2)
+        crossed = np.where(swap, line_ups2, line_ups1)
+        # If not affordable, keep line-up 1.
+        crossed_cost = price[crossed].sum(axis=1)
+        crossed[crossed_cost > max_price] = line_ups1[crossed_cost > max_price]
+
+        # Mutation. Choose a random filled slot to replace.
+        keys = np.where(line_ups1 != null, rng.random(line_ups1.shape), -1.0)
+        slot = keys.argmax(axis=1)
+        slot_pos = slots[slot]
+        budget = max_price - cost[parent1] + price[line_ups1[rows, slot]]
+        draws = rng.random((offsprings, mutation_tries)) * pool_size[slot_pos, None]
+        candidates = pool_matrix[slot_pos[:, None], draws.astype(int)]
+        valid = (candidates != null) & (price[candidates] <= budget[:, None])
+        valid &= ~(candidates[:, :, None] == line_ups1[:, None, :]).any(axis=2)
+        # Keep the first valid candidate. If there is none, nothing will happen.
+        mutated = line_ups1.copy()
+        has_valid = valid.any(axis=1)
+        mutated[rows[has_valid], slot[has_valid]] = candidates[
+            rows[has_valid], valid.argmax(axis=1)[has_valid]
+        ]
+
+        # Coin-flip. If True crossover, else mutation.
+        coin = rng.random(offsprings) < 0.5
+        pop = np.concatenate([elite_pop, np.where(coin[:, None], crossed, mutated)])
+        fitness, cost = evaluate_population(pop, price, points, max_price, null)
+        report.generations += 1
+
+    report.elapsed = time.monotonic() - start
+
+    # Return the line up with the most predicted points so far.
+    if fitness.max() > report.best_fitness:
+        best = pop[fitness.argmax()]
+        report.best_fitness = fitness.max()
+    return assign_captain(palpiteiro.LineUp([players[i] for i in best if i != null]))
+
+
+def to_cents(value: float) -> int:
+    """ Transform a price in cartoletas into integer cents. """
+    return int(round(value * 100))
+
+
+def prune_dominated(
+    candidates: Sequence[int], price: np.ndarray, points: np.ndarray, amount: int,
+) -> List[int]:
+    """
+    Remove players that can never be part of an optimal line-up.
+
+    A player is dominated by another that costs less (or the same) and is expected to
+    score more (or the same). If there are enough dominating players to fill all the
+    position slots, the dominated player can always be replaced without loss.
+    """
+    # Sort by price and then by points, so dominating players always come first.
+    ordered = sorted(candidates, key=lambda i: (price[i], -points[i], i))
+    values = points[ordered]
+    dominators = [(values[:i] >= values[i]).sum() for i in range(len(ordered))]
+    return [i for i, count in zip(ordered, dominators) if count < amount]
+
+
+def exact_scheme_drafts(
+    players: Sequence[palpiteiro.Player],
+    scheme: palpiteiro.Scheme,
+    max_prices: Sequence[float],
+) -> List[Optional[palpiteiro.LineUp]]:
+    """
+    Find the line-ups with the most predicted points for a single scheme and budgets.
+
+    Solves the multiple-choice knapsack with dynamic programming over integer cents.
+    Positions are processed one after the other and the state is the amount of
+    players from the current position, whether a captain was already chosen and the
+    money spent. The table has the best points for any money up to the largest
+    budget, so every budget is solved at once. Gets None for the budgets without an
+    affordable line-up.
+    """
+    price = np.array([to_cents(player.price) for player in players])
+    points = np.array([player.predicted_points for player in players], dtype=float)
+    position = np.array([player.position for player in players])
+    max_cents = to_cents(max(max_prices))
+
+    # Candidates for each position that is part of the scheme.
+    groups = []
+    for pos, amount in scheme.dict.items():
+        if amount == 0:
+            continue
+        candidates = np.flatnonzero((position == pos) & (price <= max_cents))
+        candidates = prune_dominated(candidates, price, points, amount)
+        if len(candidates) < amount:
+            return [None for _ in max_prices]
+        groups.append((amount, candidates))
+
+    # There is no need to go beyond the price of the most expensive line-up.
+    budget = min(
+        max_cents,
+        sum(np.sort(price[cand])[::-1][:amount].sum() for amount, cand in groups),
+    )
+
+    # Best points by [amount of players, amount of captains, money available].
+    best = np.full((1, 2, budget + 1), -np.inf)
+    best[0, 0] = 0.0
+
+    decisions = []
+    for group, (amount, candidates) in enumerate(groups):
+        # Start a new position from the line-ups that completed the last one.
+        previous = best[-1]
+        best = np.full((amount + 1, 2, budget + 1), -np.inf)
+        best[0] = previous
+
+        for i in candidates:
+            cost, value = price[i], points[i]
+            # 0 means skipped, 1 means picked and 2 means picked as captain.
+            take = np.zeros((amount + 1, 2, budget + 1), dtype=np.int8)
+            # Go backwards so that each player is picked at most once.
+            for count in range(amount, 0, -1):
+                current = best[count, :, cost:]
+                picked = best[count - 1, :, : budget + 1 - cost] + value
+                better = picked > current
+                current[better] = picked[better]
+                take[count, :, cost:][better] = 1
+
+                current = best[count, 1, cost:]
+                captain = best[count - 1, 0, : budget + 1 - cost] + 2 * value
+                better = captain > current
+                current[better] = captain[better]
+                take[count, 1, cost:][better] = 2
+            decisions.append((group, amount, i, take))
+
+    line_ups: List[Optional[palpiteiro.LineUp]] = []
+    for max_price in max_prices:
+        money = min(to_cents(max_price), budget)
+        if best[-1, 1, money] == -np.inf:
+            line_ups.append(None)
+            continue
+
+        # Walk the decisions backwards to find out which players were picked.
+        picked_players = []
+        count, captains = 0, 1
+        last_group = None
+        for group, amount, i, take in reversed(decisions):
+            # Each position starts with all its slots filled.
+            if group != last_group:
+                count, last_group = amount, group
+            choice = take[count, captains, money]
+            if choice:
+                picked_players.append(players[i])
+                count -= 1
+                captains -= choice == 2
+                money -= price[i]
+
+        line_ups.append(assign_captain(palpiteiro.LineUp(picked_players)))
+
+    return line_ups
+
+
+def exact_scheme_draft(
+    players: Sequence[palpiteiro.Player],
+    scheme: palpiteiro.Scheme,
+    max_price: float,
+) -> Optional[palpiteiro.LineUp]:
+    """
+    Find the line-up with the most predicted points for a single scheme.
+
+    Returns None if there isn't an affordable line-up.
+    """
+    return exact_scheme_drafts(players, scheme, [max_price])[0]
+
+
+def exact_drafts(
+    players: Sequence[palpiteiro.Player],
+    schemes: Sequence[palpiteiro.Scheme],
+    max_prices: Sequence[float],
+) -> List[Optional[palpiteiro.LineUp]]:
+    """
+    Draft the line-ups with the most predicted points among all schemes for budgets.
+
+    Gets None for the budgets without an affordable line-up.
+    """
+    best: List[Optional[palpiteiro.LineUp]] = [None for _ in max_prices]
+    for scheme in schemes:
+        line_ups = exact_scheme_drafts(players, scheme, max_prices)
+        for i, line_up in enumerate(line_ups):
+            if line_up is not None and (
+                best[i] is None or line_up.predicted_points > best[i].predicted_points
+            ):
+                best[i] = line_up
+    return best
+
+
+def exact_draft(
+    players: Sequence[palpiteiro.Player],
+    schemes: Sequence[palpiteiro.Scheme],
+    max_price: float,
+) -> palpiteiro.LineUp:
+    """ Draft the line-up with the most predicted points among all schemes. """
+    line_up = exact_drafts(players, schemes, [max_price])[0]
+    if line_up is None:
+        raise InfeasibleBudget(
+            f"It is not possible to draft a line-up with {max_price} cartoletas."
+        )
+    return line_up
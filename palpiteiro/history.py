@@ -0,0 +1,233 @@
+""" Historical Cartola FC rounds and betting lines, as they were before each round. """
+
+import os
+import re
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import pandas as pd
+
+import palpiteiro
+import palpiteiro.data
+
+HISTORY_FOLDER = os.path.join(palpiteiro.THIS_FOLDER, "..", "notebooks", "data")
+
+# Cartola FC IDs of the names used in the rounds files.
+POSITION_IDS = {"gol": 1, "lat": 2, "zag": 3, "mei": 4, "ata": 5, "tec": 6}
+STATUS_IDS = {
+    "Dúvida": 2,
+    "Suspenso": 3,
+    "Contundido": 5,
+    "Nulo": 6,
+    "Provável": 7,
+}
+
+# Matches and betting lines are a few hours apart, depending on the time zone.
+DATE_TOLERANCE = pd.Timedelta(days=1)
+
+# Betting lines kick-off times are 4 hours ahead of Brasília time.
+BETTING_LINES_DELAY = pd.Timedelta(hours=4)
+
+
+def seasons(folder: str = HISTORY_FOLDER) -> List[int]:
+    """ Get seasons with rounds files. """
+    cartola_folder = os.path.join(folder, "cartola")
+    return sorted(int(name) for name in os.listdir(cartola_folder) if name.isdigit())
+
+
+def round_files(season: int, folder: str = HISTORY_FOLDER) -> Dict[int, str]:
+    """ Get rounds files of a season by round. """
+    season_folder = os.path.join(folder, "cartola", str(season))
+    files = {}
+    for name in os.listdir(season_folder):
+        match = re.fullmatch(r"rodada-(\d+)\.csv", name)
+        if match:
+            files[int(match.group(1))] = os.path.join(season_folder, name)
+    return dict(sorted(files.items()))
+
+
+def club_ids(values: pd.Series) -> pd.Series:
+    """ Get club IDs from names or IDs written as text. Missing if unknown. """
+    values = values.astype(str)
+    numeric = values.str.fullmatch(r"\d+")
+    ids = pd.Series(pd.NA, index=values.index, dtype="Int64")
+    ids[numeric] = values[numeric].astype(int)
+    ids[~numeric] = palpiteiro.data.club_names_index().resolve(values[~numeric]).values
+    return ids
+
+
+def read_round(path: str) -> pd.DataFrame:
+    """ Read a round file. One row per player, with Cartola FC IDs. """
+    data = pd.read_csv(path, index_col=0)
+    data.columns = [col.replace("atletas.", "") for col in data.columns]
+    return pd.DataFrame(
+        {
+            "id": data["atleta_id"].astype(int),
+            "round": data["rodada_id"].astype(int),
+            "name": data["apelido"],
+            "photo": data["foto"],
+            "club": club_ids(data["clube.id.full.name"]),
+            "position_id": data["posicao_id"].map(POSITION_IDS),
+            "status_id": data["status_id"].map(STATUS_IDS),
+            "points": data["pontos_num"].astype(float),
+            "price": data["preco_num"].astype(float),
+            "variation": data["variacao_num"].astype(float),
+            "mean": data["media_num"].astype(float),
+        }
+    )
+
+
+class SeasonReader:
+    """
+    Read the rounds files of a season in order, with what was known before each round.
+
+    The status is the one for the round. Price, variation, mean, matches played and
+    last points come from the previous round file, so players that aren't there are
+    left out, as well as the first round. Points are the ones scored in the round.
+
+    Only the matches played so far and the previous round are kept, so a reader can
+    be saved and go on later with new rounds files.
+    """
+
+    def __init__(self, season: int):
+        self.season = season
+        self.matches = pd.Series(dtype=int)
+        self.previous: Optional[pd.DataFrame] = None
+        self.previous_round: Optional[int] = None
+
+    def read(self, round_: int, path: str) -> Optional[pd.DataFrame]:
+        """ Read the next round file. None if the previous round is missing. """
+        data = read_round(path).drop_duplicates("id").set_index("id").sort_index()
+
+        # Matches played so far. Older files don't have it, so count rounds with points.
+        self.matches = self.matches.add((data["points"] != 0).astype(int), fill_value=0)
+        data["matches"] = self.matches[data.index].astype(int)
+
+        # Numbers known before the round come from the previous round.
+        rows = None
+        if self.previous_round == round_ - 1:
+            known = self.previous.rename(columns={"points": "last_points"})
+            rows = data.drop(columns=["price", "variation", "mean", "matches"])
+            rows = rows.join(known, how="inner").reset_index()
+            rows.insert(0, "year", self.season)
+
+        self.previous = data[["price", "variation", "mean", "matches", "points"]]
+        self.previous_round = round_
+        return rows
+
+
+def iter_season(season: int, folder: str = HISTORY_FOLDER) -> Iterator[pd.DataFrame]:
+    """
+    Load players round by round. See SeasonReader.
+
+    Only one round file is read at a time.
+    """
+    reader = SeasonReader(season)
+    for round_, path in round_files(season, folder).items():
+        rows = reader.read(round_, path)
+        if rows is not None:
+            yield rows
+
+
+def load_season(season: int, folder: str = HISTORY_FOLDER) -> pd.DataFrame:
+    """ Load players of each round of a season. See iter_season. """
+    return pd.concat(list(iter_season(season, folder)), ignore_index=True)
+
+
+def parse_dates(values: pd.Series, formats: Sequence[str]) -> pd.Series:
+    """ Parse dates written in any of the formats. Missing if none matches. """
+    dates = pd.Series(pd.NaT, index=values.index)
+    for date_format in formats:
+        parsed = pd.to_datetime(values, format=date_format, errors="coerce")
+        dates = dates.fillna(parsed)
+    return dates
+
+
+def load_matches(season: int, folder: str = HISTORY_FOLDER) -> pd.DataFrame:
+    """ Load date of each club match by round. """
+    path = os.path.join(folder, "cartola", str(season), f"{season}_partidas.csv")
+    matches = pd.read_csv(path)
+    dates = parse_dates(
+        matches["date"].astype(str), ["%d/%m/%Y - %H:%M", "%Y-%m-%d"]
+    ).dt.normalize()
+
+    # Older files use CBF clubs names.
+    cbf_names = pd.read_csv(os.path.join(folder, "cartola", "times_ids.csv"))
+    cbf_ids = dict(zip(cbf_names["nome.cbf"], cbf_names["id"].astype(str)))
+
+    clubs = []
+    for side in ["home_team", "away_team"]:
+        clubs.append(
+            pd.DataFrame(
+                {
+                    "year": season,
+                    "round": matches["round"].astype(int),
+                    "club": club_ids(matches[side].astype(str).replace(cbf_ids)),
+                    "date": dates,
+                }
+            )
+        )
+    return pd.concat(clubs, ignore_index=True).dropna()
+
+
+def load_betting_lines(folder: str = HISTORY_FOLDER) -> pd.DataFrame:
+    """ Load average winning, drawing and losing odds of each club match. """
+    path = os.path.join(folder, "betting", "historical_betting_lines.csv")
+    lines = pd.read_csv(path)
+    dates = pd.to_datetime(lines["Date"] + " " + lines["Time"], format="%d/%m/%Y %H:%M")
+    dates = (dates - BETTING_LINES_DELAY).dt.normalize()
+
+    home = pd.DataFrame(
+        {
+            "year": lines["Season"],
+            "club": club_ids(lines["Home"]),
+            "date": dates,
+            "win": lines["AvgH"],
+            "draw": lines["AvgD"],
+            "lose": lines["AvgA"],
+        }
+    )
+    away = home.assign(club=club_ids(lines["Away"]), win=home["lose"], lose=home["win"])
+    return pd.concat([home, away], ignore_index=True).dropna(subset=["club"])
+
+
+def join_odds(
+    data: pd.DataFrame, matches: pd.DataFrame, lines: pd.DataFrame
+) -> pd.DataFrame:
+    """
+    Add the date and odds of the club match to players.
+
+    Rounds of clubs without a match, like postponed ones, are left out. Odds are
+    missing when the match isn't found in the betting lines.
+    """
+    data = data.merge(matches, on=["year", "round", "club"], how="inner")
+
+    # Nearest betting line of the club.
+    data = pd.merge_asof(
+        data.sort_values("date"),
+        lines.drop(columns="year").sort_values("date"),
+        on="date",
+        by="club",
+        direction="nearest",
+        tolerance=DATE_TOLERANCE,
+    )
+    data["club"] = data["club"].astype(int)
+    return data.sort_values(["year", "round", "id"], ignore_index=True)
+
+
+def load_dataset(
+    years: Optional[Sequence[int]] = None, folder: str = HISTORY_FOLDER
+) -> pd.DataFrame:
+    """ Load players of each round of the seasons, with their club match odds. """
+    if years is None:
+        years = seasons(folder)
+
+    data = pd.concat([load_season(year, folder) for year in years], ignore_index=True)
+    matches = pd.concat([load_matches(year, folder) for year in years])
+    lines = load_betting_lines(folder)
+    return join_odds(data, matches, lines[lines["year"].isin(years)])
+
+
+def rounds(data: pd.DataFrame) -> List[tuple]:
+    """ Get the (year, round) pairs in a dataset. """
+    pairs = data[["year", "round"]].drop_duplicates().itertuples(index=False)
+    return [(int(year), int(round_)) for year, round_ in pairs]
@@ -0,0 +1,294 @@
+""" Fast inference for the nearest neighbors model. """
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, Optional
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+import palpiteiro
+
+# Version of the memory-mapped model artifact layout.
+ARTIFACT_FORMAT = 1
+
+# Minkowski p of each supported nearest neighbors metric.
+METRICS_P = {
+    "manhattan": 1,
+    "cityblock": 1,
+    "l1": 1,
+    "euclidean": 2,
+    "l2": 2,
+}
+
+
+class KNNPredictor:
+    """
+    Nearest neighbors regression predictor extracted from a fitted pipeline.
+
+    Reproduces the exported pipeline (see notebooks/tpot_export.py): an optional
+    linear model stacking its prediction as the first feature, a standard scaler,
+    and a k nearest neighbors regressor. Neighbors are searched in a KD-tree built
+    once, so batches are answered without scikit-learn input validation.
+
+    The training matrix is kept only once, as the float64 data of the tree. Given a
+    float64 memory-mapped matrix, like the one from load, the tree uses it in place,
+    so processes loading the same artifact share its pages. Training targets are
+    kept as float32.
+    """
+
+    # Arrays saved as .npy files in artifacts.
+    arrays = ["fit_x", "fit_y", "mean", "scale", "stack_coef"]
+
+    # Training samples per KD-tree leaf.
+    leafsize = 32
+
+    def __init__(
+        self,
+        fit_x: np.ndarray,
+        fit_y: np.ndarray,
+        n_neighbors: int,
+        p: float = 1,
+        weights: str = "distance",
+        mean: Optional[np.ndarray] = None,
+        scale: Optional[np.ndarray] = None,
+        stack_coef: Optional[np.ndarray] = None,
+        stack_intercept: float = 0.0,
+        workers: int = 1,
+    ):
+        if weights not in ["distance", "uniform"]:
+            raise ValueError(f"Unsupported weights: {weights}.")
+        if n_neighbors > len(fit_x):
+            raise ValueError("There are less training samples than neighbors.")
+
+        self.fit_y = np.asarray(fit_y, dtype=np.float32)
+        self.n_neighbors = n_neighbors
+        self.p = p
+        self.weights = weights
+        self.mean = None if mean is None else np.asarray(mean, dtype=np.float64)
+        self.scale = None if scale is None else np.asarray(scale, dtype=np.float64)
+        self.stack_coef = (
+            None if stack_coef is None else np.asarray(stack_coef, dtype=np.float64)
+        )
+        self.stack_intercept = float(stack_intercept)
+        self.workers = workers
+        self.tree = cKDTree(
+            np.asarray(fit_x, dtype=np.float64),
+            leafsize=self.leafsize,
+            balanced_tree=False,
+        )
+
+    @property
+    def fit_x(self) -> np.ndarray:
+        """ Training matrix, after stacking and scaling. """
+        return self.tree.data
+
+    @classmethod
+    def from_pipeline(cls, pipeline: Any, **kwargs) -> "KNNPredictor":
+        """
+        Extract parameters from a fitted pipeline.
+
+        Raises ValueError if the pipeline has some other structure.
+        """
+        steps = [step for _, step in getattr(pipeline, "steps", [])]
+        if not steps or not hasattr(steps[-1], "_fit_X"):
+            raise ValueError("The last step must be a nearest neighbors regressor.")
+        knn = steps.pop()
+
+        # Metric.
+        metric = getattr(knn, "effective_metric_", knn.metric)
+        p = knn.p if metric == "minkowski" else METRICS_P.get(metric)
+        if p is None:
+            raise ValueError(f"Unsupported metric: {metric}.")
+        if not isinstance(knn.weights, str):
+            raise ValueError("Weights must be 'uniform' or 'distance'.")
+
+        # Scaler.
+        mean = scale = None
+        if steps and hasattr(steps[-1], "scale_"):
+            scaler = steps.pop()
+            mean, scale = scaler.mean_, scaler.scale_
+
+        # Stacking estimator adding a linear prediction as the first feature.
+        stack_coef, stack_intercept = None, 0.0
+        if steps and hasattr(getattr(steps[-1], "estimator", None), "coef_"):
+            estimator = steps.pop().estimator
+            stack_coef = np.ravel(estimator.coef_)
+            stack_intercept = float(np.ravel(estimator.intercept_)[0])
+
+        if steps:
+            raise ValueError(f"Unsupported pipeline steps: {steps}.")
+
+        return cls(
+            fit_x=knn._fit_X,  # pylint: disable=protected-access
+            fit_y=knn._y,  # pylint: disable=protected-access
+            n_neighbors=knn.n_neighbors,
+            p=p,
+            weights=knn.weights,
+            mean=mean,
+            scale=scale,
+            stack_coef=stack_coef,
+            stack_intercept=stack_intercept,
+            **kwargs,
+        )
+
+    def save(self, folder: str, source_sha1: Optional[str] = None) -> None:
+        """
+        Save as an artifact folder, with .npy arrays and a metadata.json file.
+
+        The SHA-1 of the pickled model it came from tells when it is out of date.
+        """
+        os.makedirs(folder, exist_ok=True)
+        arrays = {name: getattr(self, name) for name in self.arrays}
+        arrays = {name: array for name, array in arrays.items() if array is not None}
+        for name, array in arrays.items():
+            np.save(os.path.join(folder, f"{name}.npy"), array)
+
+        metadata = {
+            "format": ARTIFACT_FORMAT,
+            "source_sha1": source_sha1,
+            "arrays": list(arrays),
+            "n_neighbors": self.n_neighbors,
+            "p": self.p,
+            "weights": self.weights,
+            "stack_intercept": float(self.stack_intercept),
+        }
+
+        # Metadata goes last, so an artifact is complete once it has metadata.
+        file_name = os.path.join(folder, "metadata.json")
+        temporary = f"{file_name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(metadata, file, indent=4)
+        os.replace(temporary, file_name)
+
+    @classmethod
+    def load(
+        cls, folder: str, mmap_mode: Optional[str] = "r", **kwargs
+    ) -> "KNNPredictor":
+        """ Load an artifact folder. Arrays are memory-mapped read-only by default. """
+        metadata = read_metadata(folder)
+        if metadata.get("format") != ARTIFACT_FORMAT:
+            raise ValueError(f"Unsupported artifact format: {metadata.get('format')}.")
+
+        arrays = {
+            name: np.load(os.path.join(folder, f"{name}.npy"), mmap_mode=mmap_mode)
+            for name in metadata["arrays"]
+        }
+        return cls(
+            n_neighbors=metadata["n_neighbors"],
+            p=metadata["p"],
+            weights=metadata["weights"],
+            stack_intercept=metadata["stack_intercept"],
+            **arrays,
+            **kwargs,
+        )
+
+    def transform(self, features: Any) -> np.ndarray:
+        """ Stack and scale features like the pipeline steps before the regressor. """
+        features = np.asarray(features, dtype=np.float64).reshape(len(features), -1)
+        if self.stack_coef is not None:
+            stacked = features @ self.stack_coef + self.stack_intercept
+            features = np.hstack([stacked[:, None], features])
+        if self.mean is not None:
+            features = features - self.mean
+        if self.scale is not None:
+            features = features / self.scale
+        return features
+
+    def predict(self, features: Any) -> np.ndarray:
+        """
+        Predict a batch of samples.
+
+        Same shape as the regressor predictions: (samples, outputs) if it was fitted
+        with a 2D target.
+        """
+        queries = self.transform(features)
+        target = self.fit_y.reshape(len(self.fit_y), -1)
+        if len(queries) == 0:
+            return np.empty((0,) + self.fit_y.shape[1:], dtype=np.float32)
+
+        distances, indices = self.tree.query(
+            queries, k=self.n_neighbors, p=self.p, workers=self.workers
+        )
+        distances = distances.reshape(len(queries), -1)
+        indices = indices.reshape(len(queries), -1)
+
+        if self.weights == "uniform":
+            weights = np.ones_like(distances)
+        else:
+            # Exact matches take all the weight, like scikit-learn does.
+            with np.errstate(divide="ignore"):
+                weights = 1 / distances
+            exact = np.isinf(weights)
+            exact_rows = exact.any(axis=1)
+            weights[exact_rows] = exact[exact_rows]
+
+        predictions = np.einsum("ij,ijk->ik", weights, target[indices])
+        predictions /= weights.sum(axis=1, keepdims=True)
+        return predictions.reshape((len(queries),) + self.fit_y.shape[1:])
+
+
+def file_sha1(path: str) -> str:
+    """ Get SHA-1 hex digest of a file contents. """
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(2 ** 20), b""):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def read_metadata(folder: str) -> Dict[str, Any]:
+    """ Read artifact metadata. """
+    with open(os.path.join(folder, "metadata.json"), encoding="utf-8") as file:
+        return json.load(file)
+
+
+def export_model(path: str, folder: str) -> KNNPredictor:
+    """ Convert a pickled pipeline into a memory-mapped artifact folder. """
+    import joblib  # pylint: disable=import-outside-toplevel
+
+    predictor = KNNPredictor.from_pipeline(joblib.load(path))
+    predictor.save(folder, source_sha1=file_sha1(path))
+    return predictor
+
+
+def load_model(path: str, artifact: Optional[str] = None) -> Any:
+    """
+    Load the model for predictions.
+
+    Uses the artifact folder if it was exported from the pickled model at path.
+    Otherwise unpickles it, using a KNNPredictor when possible.
+    """
+    if artifact is not None and os.path.isfile(os.path.join(artifact, "metadata.json")):
+        metadata = read_metadata(artifact)
+        current = not os.path.isfile(path) or metadata["source_sha1"] == file_sha1(path)
+        if current and metadata["format"] == ARTIFACT_FORMAT:
+            return KNNPredictor.load(artifact)
+
+    import joblib  # pylint: disable=import-outside-toplevel
+
+    return fast_predictor(joblib.load(path))
+
+
+def fast_predictor(model: Any) -> Any:
+    """ Get a KNNPredictor from the model, or the model itself if unsupported. """
+    try:
+        return KNNPredictor.from_pipeline(model)
+    except ValueError:
+        return model
+
+
+def main():
+    """ Export the pickled model as a memory-mapped artifact. """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--model", default=palpiteiro.MODEL_PATH)
+    parser.add_argument("--artifact", default=palpiteiro.MODEL_ARTIFACT_PATH)
+    args = parser.parse_args()
+    export_model(args.model, args.artifact)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+""" Line-ups precomputed for the default selections of the app. """
+
+from typing import Dict, Optional, Sequence
+
+import palpiteiro
+import palpiteiro.draft
+
+
+def max_line_up_price(
+    players: Sequence[palpiteiro.Player], schemes: Sequence[palpiteiro.Scheme],
+) -> float:
+    """ Get the price of the most expensive line-up. More money doesn't help. """
+    prices: Dict[int, list] = {}
+    for player in players:
+        prices.setdefault(player.position, []).append(player.price)
+    for position_prices in prices.values():
+        position_prices.sort(reverse=True)
+
+    line_ups_prices = [
+        sum(sum(prices.get(pos, [])[:amount]) for pos, amount in scheme.dict.items())
+        for scheme in schemes
+    ]
+    return max(line_ups_prices, default=0.0)
+
+
+class RecommendationTable:
+    """
+    Best line-ups for a grid of budgets, with every player and scheme.
+
+    Budgets go every step cartoletas up to the price of the most expensive line-up,
+    which also answers any larger budget. Other budgets are answered with the line-up
+    of the grid budget right below them.
+
+    Line-ups are shared by everyone asking for the same budget, don't change them.
+    """
+
+    def __init__(
+        self, line_ups: Dict[int, Optional[palpiteiro.LineUp]], step: float = 0.5,
+    ):
+        # Line-ups by budget in cents. None if the budget is not enough.
+        self.line_ups = line_ups
+        self.step = step
+        self.max_cents = max(line_ups, default=0)
+
+    def __len__(self) -> int:
+        return len(self.line_ups)
+
+    @classmethod
+    def precompute(
+        cls,
+        players: Sequence[palpiteiro.Player],
+        schemes: Sequence[palpiteiro.Scheme],
+        step: float = 0.5,
+    ) -> "RecommendationTable":
+        """
+        Draft the line-ups for all budgets.
+
+        Uses the exact method, which drafts every budget in a single pass per scheme.
+        """
+        step_cents = palpiteiro.draft.to_cents(step)
+        max_cents = palpiteiro.draft.to_cents(max_line_up_price(players, schemes))
+        budgets = list(range(step_cents, max_cents, step_cents)) + [max_cents]
+
+        line_ups = palpiteiro.draft.exact_drafts(
+            players=players, schemes=schemes, max_prices=[x / 100 for x in budgets],
+        )
+        return cls(dict(zip(budgets, line_ups)), step=step)
+
+    def line_up(self, max_price: float) -> Optional[palpiteiro.LineUp]:
+        """
+        Get the best line-up for the budget.
+
+        None if the grid budget right below it is not enough, although a live draft
+        may still find a line-up.
+        """
+        cents = palpiteiro.draft.to_cents(max_price)
+        if cents >= self.max_cents:
+            return self.line_ups.get(self.max_cents)
+        step_cents = palpiteiro.draft.to_cents(self.step)
+        return self.line_ups.get(cents // step_cents * step_cents)
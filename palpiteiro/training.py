@@ -0,0 +1,193 @@
+""" Retrain the machine learning model from the historical dataset. """
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import joblib
+import numpy as np
+import sklearn
+from sklearn.base import clone
+from sklearn.linear_model import RidgeCV
+from sklearn.model_selection import GridSearchCV, GroupKFold
+from sklearn.neighbors import KNeighborsRegressor
+from sklearn.pipeline import Pipeline, make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+import palpiteiro
+import palpiteiro.dataset
+import palpiteiro.history
+import palpiteiro.inference
+
+MODELS_FOLDER = os.path.join(palpiteiro.THIS_FOLDER, "..", "notebooks", "models")
+
+# Candidates around the pipeline found by TPOT. Only the last step changes, so the
+# fitted stacking estimator and scaler of each fold are shared by all of them.
+PARAMETERS_GRID = {
+    "kneighborsregressor__n_neighbors": [63, 93, 127],
+    "kneighborsregressor__p": [1, 2],
+}
+
+# Cross-validation scores. The first one chooses the best candidate.
+SCORING = {"mse": "neg_mean_squared_error", "mae": "neg_mean_absolute_error"}
+
+
+def create_pipeline() -> Pipeline:
+    """ Create the pipeline found by TPOT (see notebooks/tpot_export.py). """
+    from tpot.builtins import (  # pylint: disable=import-outside-toplevel
+        StackingEstimator,
+    )
+
+    return make_pipeline(
+        StackingEstimator(estimator=RidgeCV()),
+        StandardScaler(),
+        KNeighborsRegressor(n_neighbors=93, p=1, weights="distance"),
+    )
+
+
+def train(
+    years: Optional[Sequence[int]] = None,
+    folder: str = palpiteiro.history.HISTORY_FOLDER,
+    cache_folder: str = palpiteiro.dataset.CACHE_FOLDER,
+    pipeline: Optional[Pipeline] = None,
+    grid: Optional[Dict[str, list]] = None,
+    folds: int = 5,
+    n_jobs: Optional[int] = -1,
+    memory: Optional[str] = None,
+) -> Tuple[Pipeline, Dict[str, Any]]:
+    """
+    Choose the best pipeline candidate by cross-validation and fit it on everything.
+
+    Folds hold whole rounds out, so players are never validated against their own
+    round. Candidates are cross-validated in parallel by n_jobs processes, and the
+    fitted steps before the regressor are cached in the memory folder, a temporary
+    one by default, so candidates sharing them don't fit them again.
+
+    Returns the fitted pipeline and its metrics, with errors and seconds taken.
+    """
+    start = time.perf_counter()
+    pipeline = create_pipeline() if pipeline is None else pipeline
+    grid = PARAMETERS_GRID if grid is None else grid
+
+    # Features of the seasons, with their round as the cross-validation group.
+    columns = palpiteiro.dataset.load_columns(years, folder, cache_folder)
+    x, y = palpiteiro.dataset.features(columns)
+    rows = palpiteiro.dataset.predictable(columns)
+    groups = columns["year"][rows].astype(int) * 100 + columns["round"][rows]
+    load_seconds = time.perf_counter() - start
+
+    cache_dir = tempfile.mkdtemp() if memory is None else memory
+    try:
+        search = GridSearchCV(
+            clone(pipeline).set_params(memory=cache_dir),
+            grid,
+            scoring=SCORING,
+            refit=next(iter(SCORING)),
+            cv=GroupKFold(n_splits=folds),
+            n_jobs=n_jobs,
+        )
+        search.fit(x, y, groups=groups)
+    finally:
+        if memory is None:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+    # The pickled model must not point to the cache.
+    model = search.best_estimator_.set_params(memory=None)
+    best = search.best_index_
+    metrics = {
+        "years": [int(year) for year in np.unique(columns["year"])],
+        "rows": len(y),
+        "folds": folds,
+        "n_jobs": n_jobs,
+        "params": {key: search.best_params_[key] for key in sorted(grid)},
+        "candidates": len(search.cv_results_["params"]),
+        "errors": {
+            name: {
+                "mean": -float(search.cv_results_[f"mean_test_{name}"][best]),
+                "std": float(search.cv_results_[f"std_test_{name}"][best]),
+            }
+            for name in SCORING
+        },
+        "seconds": {
+            "load": load_seconds,
+            "search": time.perf_counter() - start - load_seconds,
+            "refit": float(search.refit_time_),
+            "total": time.perf_counter() - start,
+        },
+        "python": platform.python_version(),
+        "scikit-learn": sklearn.__version__,
+    }
+    return model, metrics
+
+
+def save(model: Pipeline, metrics: Dict[str, Any], folder: str = MODELS_FOLDER) -> str:
+    """
+    Save a model and its metrics into a new version folder.
+
+    Versions are named by date and the model SHA-1, so the same data and candidates
+    lead to the same model file.
+
+    Returns the version folder.
+    """
+    os.makedirs(folder, exist_ok=True)
+    temporary = tempfile.mkdtemp(dir=folder)
+    model_path = os.path.join(temporary, "model.pkl")
+    joblib.dump(model, model_path)
+
+    sha1 = palpiteiro.inference.file_sha1(model_path)
+    version = f"{datetime.datetime.utcnow():%Y%m%d}-{sha1[:8]}"
+    with open(os.path.join(temporary, "metrics.json"), "w", encoding="utf-8") as file:
+        json.dump({"version": version, "sha1": sha1, **metrics}, file, indent=4)
+
+    version_folder = os.path.join(folder, version)
+    shutil.rmtree(version_folder, ignore_errors=True)
+    os.replace(temporary, version_folder)
+    return version_folder
+
+
+def install(
+    version_folder: str,
+    path: str = palpiteiro.MODEL_PATH,
+    artifact: str = palpiteiro.MODEL_ARTIFACT_PATH,
+) -> palpiteiro.inference.KNNPredictor:
+    """ Use a saved model version, exporting its memory-mapped artifact too. """
+    shutil.copyfile(os.path.join(version_folder, "model.pkl"), path)
+    return palpiteiro.inference.export_model(path, artifact)
+
+
+def main():
+    """ Retrain the model and save it as a new version. """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--years", type=int, nargs="+", default=None)
+    parser.add_argument("--folder", default=palpiteiro.history.HISTORY_FOLDER)
+    parser.add_argument("--cache-folder", default=palpiteiro.dataset.CACHE_FOLDER)
+    parser.add_argument("--models-folder", default=MODELS_FOLDER)
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    parser.add_argument("--memory", default=None, help="Keep fitted steps here.")
+    parser.add_argument("--install", action="store_true", help="Use the new model.")
+    args = parser.parse_args()
+
+    model, metrics = train(
+        args.years,
+        args.folder,
+        args.cache_folder,
+        folds=args.folds,
+        n_jobs=args.n_jobs,
+        memory=args.memory,
+    )
+    version_folder = save(model, metrics, args.models_folder)
+    if args.install:
+        install(version_folder)
+    version = os.path.basename(version_folder)
+    print(json.dumps({"version": version, **metrics}, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,11 @@
 """ Unit-tests for palpiteiro package. """
 
 import os
+import subprocess
+import sys
 
 import pandas as pd
+import pytest
 
 import palpiteiro
 import palpiteiro.data
@@ -144,6 +147,132 @@ class TestAthlete:
         player = palpiteiro.Player(107173, self.players, self.clubs)
         assert player.predicted_points > 0
 
+    def test_create_all_players(self):
+        """ Test if batched predictions match the ones made per player. """
+        players = palpiteiro.create_all_players(self.players, self.clubs, chunk_size=50)
+        players_dict = self.players.to_dict(orient="index")
+        clubs_dict = self.clubs.to_dict(orient="index")
+        for player in players:
+            single = palpiteiro.Player(player.id, players_dict, clubs_dict)
+            assert player.predicted_points == pytest.approx(single.predicted_points)
+
+
+class TestPlayerTable:
+    """ Unit-tests for PlayerTable class. """
+
+    @classmethod
+    def setup_class(cls):
+        """ Setup class. """
+        # Get clubs dataset.
+        cls.clubs = palpiteiro.data.get_clubs_with_odds(
+            "1902",
+            cache_folder=os.path.join(THIS_FOLDER, "data"),
+            cache_file="betting_lines.json",
+        )  # Fake key. But doesn't matter.
+
+        # Get players.
+        cls.players = pd.read_csv(
+            os.path.join(THIS_FOLDER, "data", "players.csv"), index_col=0
+        )
+        cls.table = palpiteiro.PlayerTable(cls.players, cls.clubs)
+
+    def test_views(self):
+        """ Make sure players are views of the same table. """
+        players = self.table.players()
+        assert len(players) == len(self.players)
+        assert all(player.table is self.table for player in players)
+        assert not hasattr(players[0], "__dict__")
+
+    def test_columns(self):
+        """ Test players attributes against the data frame. """
+        player = self.table.player(38162)
+        assert player.id == 38162
+        assert player.name == self.players.loc[38162, "apelido"]
+        assert player.price == self.players.loc[38162, "preco_num"]
+        assert player.position == self.players.loc[38162, "posicao_id"]
+        assert player.club.id == self.players.loc[38162, "clube_id"]
+        assert self.table.price.tolist() == self.players["preco_num"].tolist()
+
+    def test_read_only(self):
+        """ Make sure arrays can't get out of sync with the players. """
+        with pytest.raises(ValueError):
+            self.table.price[0] = 0
+
+    def test_predicted_points(self):
+        """ Make sure predicted points are updated in arrays and players. """
+        table = palpiteiro.PlayerTable(self.players, self.clubs)
+        player = table[3]
+        player.predicted_points = 7.5
+        assert table.predicted_points[3] == 7.5
+        assert table[3].predicted_points == 7.5
+        assert table.predicted_points.sum() == 7.5
+
+    def test_predicted_points_snapshot(self):
+        """ Make sure setting points replaces the array instead of writing it. """
+        table = palpiteiro.PlayerTable(self.players, self.clubs)
+        predicted_points = table.predicted_points
+        for player in table.players():
+            player.predicted_points = player.row
+        assert (predicted_points == 0).all()
+        assert table.predicted_points.tolist() == list(range(len(table)))
+        assert table[5].predicted_points == 5
+        with pytest.raises(ValueError):
+            table.predicted_points[0] = 0
+
+    def test_features(self):
+        """ Make sure the table features match the ones of each player. """
+        rows, features = self.table.features()
+        for row, row_features in zip(rows, features):
+            assert self.table[row].features == row_features.tolist()
+
+
+class ConstantModel:
+    """ Fake model that predicts the same points for everyone. """
+
+    def __init__(self, points):
+        self.points = points
+
+    def predict(self, features):
+        """ Predict constant points. """
+        return [[self.points] for _ in features]
+
+
+class TestModel:
+    """ Unit-tests for model loading. """
+
+    def test_lazy(self):
+        """ Make sure importing does not load the model. """
+        code = "import sys, palpiteiro.draft; print('sklearn' in sys.modules)"
+        output = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=os.path.join(THIS_FOLDER, ".."),
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        assert output.strip() == "False"
+
+    def test_set_model(self):
+        """ Make sure an injected model is used for predictions. """
+        players = pd.read_csv(
+            os.path.join(THIS_FOLDER, "data", "players.csv"), index_col=0
+        )
+        clubs = palpiteiro.data.get_clubs_with_odds(
+            "1902",
+            cache_folder=os.path.join(THIS_FOLDER, "data"),
+            cache_file="betting_lines.json",
+        )  # Fake key. But doesn't matter.
+
+        model = palpiteiro.get_model()
+        try:
+            palpiteiro.set_model(ConstantModel(5.0))
+            players = palpiteiro.create_all_players(players, clubs)
+        finally:
+            palpiteiro.set_model(model)
+
+        assert {player.predicted_points for player in players} <= {0.0, 5.0}
+        assert any(player.predicted_points == 5.0 for player in players)
+
 
 class TestScheme:
     """ Unit tests for Scheme class. """
@@ -312,3 +441,38 @@ class TestLineUp:
         line_up = palpiteiro.LineUp(self.line_up_list)
         line_up.captain = line_up.players[0]
         assert line_up.predicted_points > 0
+
+    def test_price(self):
+        """ Test line up price. """
+        line_up = palpiteiro.LineUp(self.line_up_list)
+        assert line_up.price == sum(player.price for player in self.line_up_list)
+
+    def test_aggregates_setitem(self):
+        """ Make sure aggregates are kept up to date when a player is replaced. """
+        line_up = palpiteiro.LineUp(self.line_up_list)
+        line_up[1] = self.midfielders[-1]
+        expected = palpiteiro.LineUp(line_up.players)
+        assert line_up.price == pytest.approx(expected.price)
+        assert line_up.scheme == expected.scheme
+        assert line_up.best_player == expected.best_player
+        assert self.midfielders[-1] in line_up
+        assert self.fullbacks[0] not in line_up
+
+    def test_aggregates_remove(self):
+        """ Make sure aggregates are kept up to date when a player is removed. """
+        line_up = palpiteiro.LineUp(self.line_up_list)
+        best_player = line_up.best_player
+        line_up.remove(best_player)
+        expected = palpiteiro.LineUp(line_up.players)
+        assert line_up.price == pytest.approx(expected.price)
+        assert line_up.scheme == expected.scheme
+        assert line_up.best_player == expected.best_player
+
+    def test_copy(self):
+        """ Make sure copies do not share aggregates. """
+        line_up = palpiteiro.LineUp(self.line_up_list)
+        copy = line_up.copy()
+        copy.remove(copy[0])
+        assert line_up.price == pytest.approx(copy.price + self.line_up_list[0].price)
+        assert len(line_up.goalkeepers) == 1
+        assert line_up.scheme != copy.scheme
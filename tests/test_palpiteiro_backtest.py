@@ -0,0 +1,61 @@
+""" Unit-tests for palpiteiro.backtest """
+
+import tempfile
+
+import pandas as pd
+import pytest
+
+import palpiteiro
+import palpiteiro.backtest
+import palpiteiro.dataset
+
+# Historical dataset of a few rounds.
+data = palpiteiro.dataset.load([2020], cache_folder=tempfile.mkdtemp())
+data = data[data["round"].isin([2, 3])]
+
+
+def test_round_pool():
+    """ Make sure a past round can be turned into players. """
+    players_data, clubs = palpiteiro.backtest.round_pool(data, 2020, 2)
+    players = palpiteiro.create_all_players(players_data, clubs)
+    assert len(players) == (data["round"] == 2).sum()
+    assert set(players_data["clube_id"]) == set(clubs.index)
+    assert all(isinstance(player.predicted_points, float) for player in players)
+
+
+class TestBacktest:
+    """ Unit tests for backtest function. """
+
+    @classmethod
+    def setup_class(cls):
+        """ Setup class. """
+        cls.results = palpiteiro.backtest.backtest(
+            data, max_price=100, method="exact", processes=2
+        )
+
+    def test_rounds(self):
+        """ Make sure every round is drafted within the budget. """
+        assert list(self.results["round"]) == [2, 3]
+        assert (self.results["price"] <= 100).all()
+        assert self.results["points"].notna().all()
+
+    def test_best_points(self):
+        """ Make sure no line-up scores more than the best one possible. """
+        assert (self.results["points"] <= self.results["best_points"] + 1e-6).all()
+
+    def test_season_report(self):
+        """ Make sure rounds are summed up by season. """
+        report = palpiteiro.backtest.season_report(self.results)
+        assert list(report.index) == [2020]
+        assert report.loc[2020, "rounds"] == 2
+        assert report.loc[2020, "points"] == pytest.approx(self.results["points"].sum())
+        assert 0 < report.loc[2020, "efficiency"] <= 1
+
+    def test_infeasible(self):
+        """ Make sure rounds without an affordable line-up are not scored. """
+        results = palpiteiro.backtest.backtest(
+            data, max_price=1, method="exact", processes=1
+        )
+        assert len(results) == 2
+        assert results["points"].isna().all()
+        assert isinstance(results, pd.DataFrame)
@@ -0,0 +1,258 @@
+""" palpiteiro.cache unit-tests. """
+
+import http.server
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+import pandas as pd
+import requests
+
+import palpiteiro.cache
+import palpiteiro.data
+
+
+class TestMemoryCache:
+    """ Test MemoryCache class. """
+
+    def test_get(self):
+        """ Test getting cached values. """
+        cache = palpiteiro.cache.MemoryCache()
+        cache.set("a", 1)
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+
+    def test_evict(self):
+        """ Make sure the least recently used is forgotten. """
+        cache = palpiteiro.cache.MemoryCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert len(cache) == 2
+
+
+class TestDirectoryCache:
+    """ Test DirectoryCache class. """
+
+    def setup_method(self):
+        """ Setup method. """
+        self.folder = tempfile.mkdtemp()
+
+    def teardown_method(self):
+        """ Teardown method. """
+        shutil.rmtree(self.folder)
+
+    def test_get(self):
+        """ Test getting cached data frames from another instance. """
+        data = pd.DataFrame({"odds": [1.5, 2.0]})
+        palpiteiro.cache.DirectoryCache(self.folder).set("2020-12-10-9.json", data)
+        cached = palpiteiro.cache.DirectoryCache(self.folder).get("2020-12-10-9.json")
+        pd.testing.assert_frame_equal(cached, data)
+
+    def test_max_age(self):
+        """ Make sure old entries are evicted. """
+        cache = palpiteiro.cache.DirectoryCache(self.folder, max_age=-1)
+        cache.set("a", 1)
+        assert cache.get("a") is None
+        assert os.listdir(self.folder) == []
+
+    def test_max_size(self):
+        """ Make sure the folder does not grow beyond its maximum size. """
+        cache = palpiteiro.cache.DirectoryCache(self.folder, max_size=5000)
+        for i in range(10):
+            cache.set(str(i), b"0" * 1000)
+        size = sum(
+            os.path.getsize(os.path.join(self.folder, name))
+            for name in os.listdir(self.folder)
+        )
+        assert size <= 5000
+        assert cache.get("9") is not None
+
+
+class TestSQLiteCache:
+    """ Test SQLiteCache class. """
+
+    def setup_method(self):
+        """ Setup method. """
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "cache.sqlite")
+
+    def teardown_method(self):
+        """ Teardown method. """
+        shutil.rmtree(self.folder)
+
+    def test_get(self):
+        """ Test getting cached data frames from another instance. """
+        data = pd.DataFrame({"odds": [1.5, 2.0]})
+        palpiteiro.cache.SQLiteCache(self.path).set("a", data)
+        pd.testing.assert_frame_equal(
+            palpiteiro.cache.SQLiteCache(self.path).get("a"), data
+        )
+
+    def test_max_entries(self):
+        """ Make sure only the newest entries are kept. """
+        cache = palpiteiro.cache.SQLiteCache(self.path, max_entries=3)
+        for i in range(10):
+            cache.set(str(i), i)
+        assert cache.get("0") is None
+        assert cache.get("9") == 9
+
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    """ Serve a JSON payload with an ETag and count requests. """
+
+    payload = [{"esquema_id": 1, "nome": "3-4-3"}]
+    etag = '"v1"'
+    received = []
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """ Handle GET requests. """
+        self.received.append((self.path, self.headers.get("If-None-Match")))
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        body = json.dumps(self.payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("ETag", self.etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        """ Keep tests output clean. """
+
+
+class TestHTTPCache:
+    """ Test HTTPCache class against a local stub server. """
+
+    @classmethod
+    def setup_class(cls):
+        """ Setup class. """
+        cls.server = http.server.HTTPServer(("127.0.0.1", 0), StubHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.host = f"http://127.0.0.1:{cls.server.server_port}/"
+
+    @classmethod
+    def teardown_class(cls):
+        """ Teardown class. """
+        cls.server.shutdown()
+
+    def setup_method(self):
+        """ Setup method. """
+        self.folder = tempfile.mkdtemp()
+        StubHandler.received = []
+        StubHandler.payload = [{"esquema_id": 1, "nome": "3-4-3"}]
+        StubHandler.etag = '"v1"'
+
+    def teardown_method(self):
+        """ Teardown method. """
+        shutil.rmtree(self.folder)
+
+    def test_fresh(self):
+        """ Make sure fresh entries are served without requests. """
+        cache = palpiteiro.cache.HTTPCache(self.folder, ttl=60)
+        for _ in range(5):
+            data = cache.get(self.host + "esquemas", requests.Session())
+        assert data == StubHandler.payload
+        assert len(StubHandler.received) == 1
+
+    def test_persistent(self):
+        """ Make sure entries are shared between instances through the disk. """
+        palpiteiro.cache.HTTPCache(self.folder).get(self.host + "esquemas")
+        data = palpiteiro.cache.HTTPCache(self.folder).get(self.host + "esquemas")
+        assert data == StubHandler.payload
+        assert len(StubHandler.received) == 1
+
+    def test_revalidate(self):
+        """ Make sure expired entries are revalidated with the ETag. """
+        cache = palpiteiro.cache.HTTPCache(self.folder, ttl=0, stale_ttl=0)
+        cache.get(self.host + "esquemas")
+        data = cache.get(self.host + "esquemas")
+        assert data == StubHandler.payload
+        assert StubHandler.received == [("/esquemas", None), ("/esquemas", '"v1"')]
+
+    def test_stale_while_revalidate(self):
+        """ Make sure stale entries are served while updated in the background. """
+        cache = palpiteiro.cache.HTTPCache(self.folder, ttl=0, stale_ttl=60)
+        old = cache.get(self.host + "esquemas")
+
+        StubHandler.payload = [{"esquema_id": 2, "nome": "4-4-2"}]
+        StubHandler.etag = '"v2"'
+        assert cache.get(self.host + "esquemas") == old
+
+        cache.join()
+        assert cache.get(self.host + "esquemas", ttl=60) == StubHandler.payload
+
+    def test_not_modified_without_entry(self):
+        """ Make sure a 304 without a cached entry asks for the whole response. """
+        session = requests.Session()
+        session.headers["If-None-Match"] = StubHandler.etag
+        cache = palpiteiro.cache.HTTPCache(self.folder)
+        assert cache.get(self.host + "esquemas", session) == StubHandler.payload
+        assert StubHandler.received[-1] == ("/esquemas", None)
+
+    def test_revalidate_own_session(self):
+        """ Make sure background revalidations don't share the caller's session. """
+        threads = []
+
+        class Session(requests.Session):
+            """ Session that remembers which threads used it. """
+
+            def get(self, *args, **kwargs):  # pylint: disable=arguments-differ
+                threads.append(threading.get_ident())
+                return super().get(*args, **kwargs)
+
+        cache = palpiteiro.cache.HTTPCache(self.folder, ttl=0, stale_ttl=60)
+        cache.get(self.host + "esquemas", Session())
+        cache.get(self.host + "esquemas", Session())
+        cache.join()
+        assert len(StubHandler.received) == 2
+        assert threads == [threading.get_ident()]
+
+    def test_own_session(self):
+        """ Make sure calls without a session share one pooled session with retries. """
+        cache = palpiteiro.cache.HTTPCache(self.folder, ttl=0, stale_ttl=0)
+        adapter = cache.session.get_adapter(self.host)
+        assert adapter.max_retries.total == 3
+        cache.get(self.host + "esquemas")
+        cache.get(self.host + "esquemas")
+        assert cache.session.get_adapter(self.host) is adapter
+        assert len(StubHandler.received) == 2
+        cache.join()
+
+    def test_copy_session(self):
+        """ Make sure copied sessions retry, with the retries of the original one. """
+        copy = palpiteiro.cache.copy_session(requests.Session())
+        assert copy.get_adapter(self.host).max_retries.total == 3
+        session = palpiteiro.cache.create_session(retries=5)
+        copy = palpiteiro.cache.copy_session(session)
+        assert copy.get_adapter(self.host).max_retries.total == 5
+        assert copy.get_adapter(self.host) is not session.get_adapter(self.host)
+
+    def test_cartola_api(self):
+        """ Make sure repeated page loads cost no requests. """
+        cache = palpiteiro.cache.HTTPCache(self.folder)
+        for _ in range(3):
+            cartola_api = palpiteiro.data.CartolaFCAPI(cache=cache)
+            cartola_api.host = self.host
+            assert cartola_api.schemes()["nome"].tolist() == ["3-4-3"]
+        assert len(StubHandler.received) == 1
+
+    def test_cartola_api_expired(self):
+        """ Make sure a long lived instance requests endpoints again once expired. """
+        cache = palpiteiro.cache.HTTPCache(self.folder, stale_ttl=0)
+        cartola_api = palpiteiro.data.CartolaFCAPI(cache=cache)
+        cartola_api.host = self.host
+        cartola_api.ttl = {"esquemas": 0}
+        for _ in range(2):
+            assert cartola_api.schemes()["nome"].tolist() == ["3-4-3"]
+        assert len(StubHandler.received) == 2
@@ -4,7 +4,9 @@ import datetime
 import os
 
 import pandas as pd
+import pytest
 
+import palpiteiro.cache
 import palpiteiro.data
 
 THIS_FOLDER = os.path.dirname(__file__)
@@ -29,6 +31,81 @@ class TestTheOddsAPI:
 
         pd.testing.assert_frame_equal(loaded, cache)
 
+    def test_shared_copy(self):
+        """ Make sure the cleaned betting lines are parsed once per process. """
+        odds_api = palpiteiro.data.TheOddsAPI(
+            "1902",
+            cache_folder=os.path.join(THIS_FOLDER, "data"),
+            cache_file="betting_lines.json",
+        )  # Fake key.
+        loaded = odds_api.betting_lines()
+        cached = palpiteiro.data.BETTING_LINES_CACHE.get(
+            os.path.join(THIS_FOLDER, "data", "betting_lines.json")
+        )
+        pd.testing.assert_frame_equal(loaded, cached)
+
+    def test_backend(self):
+        """ Test loading cleaned betting lines from a cache backend. """
+        backend = palpiteiro.cache.MemoryCache()
+        odds = pd.read_csv(
+            os.path.join(THIS_FOLDER, "data", "odds_api", "odds.csv"), index_col=0
+        )
+        backend.set("missing.json", odds)
+        odds_api = palpiteiro.data.TheOddsAPI(
+            "1902",
+            cache_folder=os.path.join(THIS_FOLDER, "data"),
+            cache_file="missing.json",
+            backend=backend,
+        )  # Fake key. Never requested because it is in the backend.
+        pd.testing.assert_frame_equal(odds_api.betting_lines(), odds)
+
+    def test_clean_betting_lines(self):
+        """ Make sure repeated sites and sites without head to head are ignored. """
+        site = {"site_key": "betfair", "odds": {"h2h": [2.0, 3.0, 4.0]}}
+        data = pd.DataFrame(
+            {
+                "sites_count": [3, 1, 0],
+                "sites": [
+                    [
+                        site,
+                        site,
+                        {"site_key": "unibet", "odds": {"h2h": [3.0, 4.0, 5.0]}},
+                        {"site_key": "pinnacle", "odds": {"totals": [1.9, 1.9]}},
+                    ],
+                    [{"site_key": "pinnacle", "odds": {"spreads": [1.9, 1.9]}}],
+                    [],
+                ],
+                "teams": [
+                    ["Flamengo", "Santos"],
+                    ["Bahia", "Ceará"],
+                    ["Sport", "Vasco"],
+                ],
+                "home_team": ["Santos", "Bahia", "Sport"],
+                "commence_time": pd.to_datetime(["2020-12-10 22:00"] * 3),
+            }
+        )
+        cleaned = palpiteiro.data.TheOddsAPI.clean_betting_lines(data)
+        assert cleaned["home_team"].tolist() == ["Santos"]
+        assert cleaned["away_team"].tolist() == ["Flamengo"]
+        assert cleaned["home_team_odds"].tolist() == [4.5]
+        assert cleaned["draw_odds"].tolist() == [3.5]
+        assert cleaned["away_team_odds"].tolist() == [2.5]
+        assert cleaned["date"].tolist() == [pd.Timestamp("2020-12-10 19:00")]
+
+    def test_clean_betting_lines_unknown_home_team(self):
+        """ Make sure odds are not swapped when the home team is not playing. """
+        data = pd.DataFrame(
+            {
+                "sites_count": [1],
+                "sites": [[{"site_key": "betfair", "odds": {"h2h": [2.0, 3.0, 4.0]}}]],
+                "teams": [["Flamengo", "Santos"]],
+                "home_team": ["Vasco"],
+                "commence_time": pd.to_datetime(["2020-12-10 22:00"]),
+            }
+        )
+        with pytest.raises(ValueError):
+            palpiteiro.data.TheOddsAPI.clean_betting_lines(data)
+
     def test_cache_file_name(self):
         """ Test _cache_file_name method. """
         datetime_ = datetime.datetime(
@@ -37,6 +114,104 @@ class TestTheOddsAPI:
         name = palpiteiro.data.TheOddsAPI._cache_file_name(datetime_)
         assert name == "2020-12-10-9.json"
 
+    def test_odds_bucket(self):
+        """ Make sure betting lines are requested once every 3 hours. """
+        start = datetime.datetime(year=2020, month=12, day=10, hour=9, minute=0)
+        end = datetime.datetime(year=2020, month=12, day=10, hour=11, minute=59)
+        assert palpiteiro.data.odds_bucket(start) == "2020-12-10-9"
+        assert palpiteiro.data.odds_bucket(end) == "2020-12-10-9"
+        assert palpiteiro.data.odds_bucket(end + datetime.timedelta(minutes=1)) == (
+            "2020-12-10-12"
+        )
+
+
+class FakeResponse:
+    """ Fake HTTP response. """
+
+    def __init__(self, data):
+        self.data = data
+
+    def raise_for_status(self):
+        """ Never fails. """
+
+    def json(self):
+        """ Get JSON data. """
+        return self.data
+
+
+class FakeSession:
+    """ Fake HTTP session that counts requests. """
+
+    def __init__(self, data):
+        self.data = data
+        self.urls = []
+
+    def get(self, url, **kwargs):
+        """ Get fake response. """
+        self.urls.append(url)
+        return FakeResponse(self.data)
+
+
+class TestCartolaFCAPI:
+    """ Test CartolaFCAPI class. """
+
+    @classmethod
+    def setup_class(cls):
+        """ Setup class. """
+        cls.market = {
+            "atletas": [{"atleta_id": 1, "apelido": "Fred", "posicao_id": 5}],
+            "posicoes": {"5": {"id": 5, "nome": "Atacante", "abreviacao": "ata"}},
+            "status": {"7": {"id": 7, "nome": "Provável"}},
+        }
+
+    def test_single_market_request(self):
+        """ Make sure players, positions and status share a single request. """
+        session = FakeSession(self.market)
+        cartola_api = palpiteiro.data.CartolaFCAPI(session=session)
+        players = cartola_api.players()
+        positions = cartola_api.positions()
+        status = cartola_api.status()
+        assert session.urls == [cartola_api.host + "atletas/mercado"]
+        assert players.loc[1]["apelido"] == "Fred"
+        assert positions.loc[0]["nome"] == "Atacante"
+        assert status.loc[0]["id"] == 7
+
+    def test_market_status(self):
+        """ Test market_status method. """
+        session = FakeSession({"rodada_atual": 38, "status_mercado": 1})
+        cartola_api = palpiteiro.data.CartolaFCAPI(session=session)
+        assert cartola_api.market_status()["rodada_atual"] == 38
+        assert session.urls == [cartola_api.host + "mercado/status"]
+
+    def test_session(self):
+        """ Make sure the default session retries. """
+        session = palpiteiro.data.create_session(retries=5)
+        assert session.get_adapter("https://").max_retries.total == 5
+
+
+class TestClubNamesIndex:
+    """ Test ClubNamesIndex class. """
+
+    def test_resolve(self):
+        """ Test resolving names regardless of case and accents. """
+        index = palpiteiro.data.ClubNamesIndex()
+        club_id = index.resolve(pd.Series(["Grêmio", "GREMIO", " gremio "]))
+        assert club_id.tolist() == [284, 284, 284]
+        assert index.hits == 3
+
+    def test_unknown(self):
+        """ Make sure unknown names are reported. """
+        index = palpiteiro.data.ClubNamesIndex()
+        club_id = index.resolve(["Fluminense", "Unknown FC", "Unknown FC"])
+        assert club_id[0] == 266
+        assert pd.isna(club_id[1])
+        assert index.misses == 2
+        assert index.unknown == {"Unknown FC": 2}
+
+    def test_lazy(self):
+        """ Make sure the module index is built only once. """
+        assert palpiteiro.data.club_names_index() is palpiteiro.data.club_names_index()
+
 
 class TestClubsAndOddsMerge:
     """ Test functions related to merging odds to the clubs dataframe. """
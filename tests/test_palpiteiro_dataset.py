@@ -0,0 +1,176 @@
+""" Unit-tests for palpiteiro.dataset """
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import palpiteiro.dataset
+import palpiteiro.history
+import palpiteiro.inference
+
+
+def copy_rounds(folder: str, season: int, rounds: int):
+    """ Copy the first rounds files of a season into a historical data folder. """
+    source = os.path.join(palpiteiro.history.HISTORY_FOLDER, "cartola", str(season))
+    target = os.path.join(folder, "cartola", str(season))
+    os.makedirs(target, exist_ok=True)
+    shutil.copy(os.path.join(source, f"{season}_partidas.csv"), target)
+    for round_ in range(1, rounds + 1):
+        shutil.copy(os.path.join(source, f"rodada-{round_}.csv"), target)
+
+
+class TestBuild:
+    """ Unit tests for build function. """
+
+    def setup_method(self):
+        """ Setup method. """
+        self.folder = tempfile.mkdtemp()
+        self.cache_folder = os.path.join(self.folder, "columnar")
+        history = palpiteiro.history.HISTORY_FOLDER
+        os.makedirs(os.path.join(self.folder, "cartola"))
+        os.makedirs(os.path.join(self.folder, "betting"))
+        shutil.copy(
+            os.path.join(history, "cartola", "times_ids.csv"),
+            os.path.join(self.folder, "cartola"),
+        )
+        shutil.copy(
+            os.path.join(history, "betting", "historical_betting_lines.csv"),
+            os.path.join(self.folder, "betting"),
+        )
+        copy_rounds(self.folder, 2019, 3)
+        copy_rounds(self.folder, 2020, 3)
+
+    def teardown_method(self):
+        """ Teardown method. """
+        shutil.rmtree(self.folder)
+
+    def build(self):
+        """ Build the cache of the temporary folder. """
+        return palpiteiro.dataset.build(
+            folder=self.folder, cache_folder=self.cache_folder
+        )
+
+    def test_incremental(self):
+        """ Make sure only seasons with new round files are built again. """
+        assert self.build() == [2019, 2020]
+        assert self.build() == []
+        copy_rounds(self.folder, 2020, 4)
+        assert self.build() == [2020]
+        assert self.build() == []
+
+    def test_append(self, monkeypatch):
+        """ Make sure new rounds are appended, like in a full build. """
+        self.build()
+        copy_rounds(self.folder, 2020, 5)
+
+        paths = []
+        read_round = palpiteiro.history.read_round
+        monkeypatch.setattr(
+            palpiteiro.history,
+            "read_round",
+            lambda path: paths.append(path) or read_round(path),
+        )
+        appended = palpiteiro.dataset.load_columns(
+            [2020], folder=self.folder, cache_folder=self.cache_folder
+        )
+        assert [os.path.basename(path) for path in paths] == [
+            "rodada-4.csv",
+            "rodada-5.csv",
+        ]
+        monkeypatch.undo()
+
+        full, _ = palpiteiro.dataset.build_season(2020, folder=self.folder)
+        assert set(appended["round"]) == {2, 3, 4, 5}
+        for name in palpiteiro.dataset.COLUMNS:
+            np.testing.assert_array_equal(appended[name], full[name])
+
+    def test_changed_round(self):
+        """ Make sure a cached round file that changed builds the season again. """
+        self.build()
+        path = os.path.join(self.folder, "cartola", "2020", "rodada-3.csv")
+        data = pd.read_csv(path, index_col=0)
+        data.iloc[:10].to_csv(path)
+        assert self.build() == [2020]
+        columns = palpiteiro.dataset.load_columns(
+            [2020], folder=self.folder, cache_folder=self.cache_folder
+        )
+        assert (columns["round"] == 3).sum() <= 10
+
+    def test_warm_load(self, monkeypatch):
+        """ Make sure a warm cache is loaded without hashing the source files. """
+        self.build()
+
+        def file_sha1(path):
+            raise AssertionError(f"{path} was read.")
+
+        monkeypatch.setattr(palpiteiro.inference, "file_sha1", file_sha1)
+        data = palpiteiro.dataset.load(
+            folder=self.folder, cache_folder=self.cache_folder
+        )
+        assert set(data["year"]) == {2019, 2020}
+
+    def test_columns(self):
+        """ Make sure columns have the dataset types and match palpiteiro.history. """
+        columns = palpiteiro.dataset.load_columns(
+            [2020], folder=self.folder, cache_folder=self.cache_folder
+        )
+        assert isinstance(columns["price"], np.memmap)
+        for name, dtype in palpiteiro.dataset.COLUMNS.items():
+            assert columns[name].dtype == dtype
+
+        data = palpiteiro.history.load_dataset([2020], folder=self.folder)
+        assert len(columns["id"]) == len(data)
+        assert (columns["round"] == data["round"]).all()
+        assert (columns["id"] == data["id"]).all()
+        assert columns["point"] == pytest.approx(data["points"])
+        assert columns["price"] == pytest.approx(data["price"])
+
+    def test_load(self):
+        """ Make sure several seasons are loaded together. """
+        data = palpiteiro.dataset.load(
+            folder=self.folder, cache_folder=self.cache_folder
+        )
+        assert list(data.columns) == list(palpiteiro.dataset.COLUMNS)
+        assert set(data["year"]) == {2019, 2020}
+        assert set(data["round"]) == {2, 3}
+
+
+def test_normalize_unknown():
+    """ Make sure unknown positions and status are -1, not arbitrary numbers. """
+    data = pd.DataFrame(
+        {
+            "year": [2020, 2020],
+            "round": [2, 2],
+            "id": [1, 2],
+            "club": [262, 262],
+            "position_id": [1, 9],
+            "status_id": [7, 9],
+            "matches": [1, 1],
+            "mean": [1.0, 1.0],
+            "price": [5.0, 5.0],
+            "variation": [0.0, 0.0],
+            "win": [2.0, 2.0],
+            "lose": [3.0, 3.0],
+            "draw": [4.0, 4.0],
+            "points": [1.0, 1.0],
+        }
+    )
+    columns = palpiteiro.dataset.normalize(data)
+    assert columns["position"].tolist() == [1, -1]
+    assert columns["status"].tolist() == [4, -1]
+
+
+def test_features():
+    """ Make sure features are the ones of PlayerTable, for predictable players. """
+    columns = {name: np.zeros(3) for name in palpiteiro.dataset.COLUMNS}
+    columns["status"] = np.array([4, 0, 3])
+    columns["win"] = np.array([1.5, 1.5, np.nan])
+    columns["price"] = np.array([10.0, 20.0, 30.0])
+    x, y = palpiteiro.dataset.features(columns)
+    assert x.shape == (1, len(palpiteiro.dataset.FEATURES))
+    assert x[0, palpiteiro.dataset.FEATURES.index("price")] == 10
+    assert y.shape == (1,)
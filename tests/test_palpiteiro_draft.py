@@ -1,7 +1,12 @@
 """ Unit-tests for palpiteiro.draft """
 
+import csv
+import json
 import os
+import shutil
+import tempfile
 import time
+from collections import Counter
 
 import pandas as pd
 import pytest
@@ -32,6 +37,35 @@ players = [player for player in players if pd.notna(player.club.win_odds)]
 schemes = palpiteiro.create_schemes(cartola_fc_api.schemes())
 
 
+class TestPlayerIndex:
+    """ Unit tests for PlayerIndex class. """
+
+    @classmethod
+    def setup_class(cls):
+        """ Setup class. """
+        cls.index = palpiteiro.draft.PlayerIndex(players)
+
+    def test_affordable(self):
+        """ Make sure affordable players are from the position and below budget. """
+        affordable = self.index.affordable(4, 5)
+        assert len(affordable) > 0
+        assert all(player.position == 4 for player in affordable)
+        assert all(player.price <= 5 for player in affordable)
+        expected = [player for player in players if player.position == 4]
+        assert len(affordable) == len([p for p in expected if p.price <= 5])
+
+    def test_choice_not_in_line_up(self):
+        """ Make sure chosen players are not already in the line up. """
+        line_up = palpiteiro.LineUp(self.index.affordable(1, 1e6)[:-1])
+        for _ in range(100):
+            player = self.index.choice([1], 1e6, line_up)
+            assert player not in line_up
+
+    def test_choice_none(self):
+        """ Test choosing when there are no affordable players. """
+        assert self.index.choice([1, 2, 3], 0) is None
+
+
 class TestRandomLineUp:
     """ Test random_line_up function."""
 
@@ -45,9 +79,22 @@ class TestRandomLineUp:
         Test if it raises an error when it is impossible to create a team with the
         available money.
         """
-        with pytest.raises(RecursionError):
+        with pytest.raises(palpiteiro.draft.InfeasibleBudget):
             palpiteiro.draft.random_line_up(players, schemes, 0)
 
+    def test_cheapest(self):
+        """ Make sure it drafts a line up with just enough money. """
+        index = palpiteiro.draft.PlayerIndex(players)
+        cheapest = min(
+            index.cheapest_price(
+                [pos for pos, amount in scheme.dict.items() for _ in range(amount)]
+            )
+            for scheme in schemes
+        )
+        line_up = palpiteiro.draft.random_line_up(players, schemes, cheapest, index)
+        assert line_up.is_valid(schemes)
+        assert line_up.price == pytest.approx(cheapest)
+
     def test_affordable(self):
         """ Make sure all line ups generated are below max price."""
         prices = [
@@ -82,6 +129,17 @@ class TestMutateLineUp:
         )
         assert new_line_up != self.line_up
 
+    def test_no_available_players(self):
+        """ Make sure it returns the line up when no player can be replaced. """
+        new_line_up = palpiteiro.draft.mutate_line_up(
+            line_up=self.line_up,
+            players=players,
+            schemes=schemes,
+            max_price=self.line_up.price,
+            index=palpiteiro.draft.PlayerIndex(list(self.line_up)),
+        )
+        assert new_line_up == self.line_up
+
     def test_perfomance(self):
         """ Test if it runs functions 100 times in less than a second. """
         start = time.time()
@@ -104,6 +162,13 @@ class TestCrossoverLineUp:
             players=players, schemes=schemes, max_price=1e6
         )
 
+    def test_not_affordable(self):
+        """ Make sure it always returns a line up, even when none is affordable. """
+        line_up = palpiteiro.draft.crossover_line_up(
+            line_up1=self.line_up1, line_up2=self.line_up2, max_price=0
+        )
+        assert line_up == self.line_up1
+
     def test_perfomance(self):
         """ Test if it runs functions 100 times in less than a second. """
         start = time.time()
@@ -155,3 +220,413 @@ class TestDraft:
         ) for _ in range(2)]
 
         assert line_ups[0] == line_ups[-1]
+
+
+class TestArrayDraft:
+    """ Unit tests for array_draft function. """
+
+    def test_valid(self):
+        """ Make sure the drafted line up is valid and affordable. """
+        best_line_up = palpiteiro.draft.draft(
+            individuals=100,
+            generations=100,
+            players=players,
+            schemes=schemes,
+            max_price=100,
+            tournament_size=5,
+            method="array",
+        )
+        assert best_line_up.is_valid(schemes)
+        assert best_line_up.price <= 100
+
+    def test_duplicates(self):
+        """ Make sure there aren't duplicates on the final team. """
+        best_line_up = palpiteiro.draft.array_draft(
+            individuals=100,
+            generations=100,
+            players=players,
+            schemes=schemes,
+            max_price=1e6,
+            tournament_size=5,
+        )
+        players_ids = [player.id for player in best_line_up]
+        assert len(players_ids) == len(set(players_ids))
+
+    def test_perfomance(self):
+        """ Test if it runs 100 individuals for 1000 generations in a few seconds. """
+        start = time.time()
+        palpiteiro.draft.array_draft(
+            individuals=100,
+            generations=1000,
+            players=players,
+            schemes=schemes,
+            max_price=100,
+            tournament_size=5,
+        )
+        end = time.time()
+        assert end - start < 3  # seconds
+
+
+class TestExactDraft:
+    """ Unit tests for exact_draft function. """
+
+    def test_valid(self):
+        """ Make sure the drafted line up is valid and affordable. """
+        best_line_up = palpiteiro.draft.draft(
+            individuals=100,
+            generations=100,
+            players=players,
+            schemes=schemes,
+            max_price=100,
+            tournament_size=5,
+            method="exact",
+        )
+        assert best_line_up.is_valid(schemes)
+        assert best_line_up.price <= 100
+
+    def test_not_worse(self):
+        """ Make sure it is never worse than the genetic algorithm. """
+        exact = palpiteiro.draft.exact_draft(players, schemes, 100)
+        genetic = palpiteiro.draft.draft(
+            individuals=100,
+            generations=100,
+            players=players,
+            schemes=schemes,
+            max_price=100,
+            tournament_size=5,
+        )
+        assert exact.predicted_points >= genetic.predicted_points - 1e-6
+
+    def test_is_expensive(self):
+        """ Test if it raises an error when it is impossible to create a team. """
+        with pytest.raises(palpiteiro.draft.InfeasibleBudget):
+            palpiteiro.draft.exact_draft(players, schemes, 0)
+
+    def test_budgets(self):
+        """ Make sure drafting many budgets at once is the same as one at a time. """
+        budgets = [0, 60, 100, 100.5, 1e6]
+        line_ups = palpiteiro.draft.exact_drafts(players, schemes, budgets)
+        assert line_ups[0] is None
+        for budget, line_up in zip(budgets[1:], line_ups[1:]):
+            expected = palpiteiro.draft.exact_draft(players, schemes, budget)
+            assert line_up.price <= budget
+            assert line_up.predicted_points == pytest.approx(expected.predicted_points)
+
+    def test_perfomance(self):
+        """ Test if it runs in less than a second. """
+        start = time.time()
+        palpiteiro.draft.exact_draft(players, schemes, 100)
+        end = time.time()
+        assert end - start < 1  # seconds
+
+
+class TestFitnessCache:
+    """ Unit tests for FitnessCache class. """
+
+    @classmethod
+    def setup_class(cls):
+        """ Setup class. """
+        cls.line_up = palpiteiro.draft.random_line_up(
+            players=players, schemes=schemes, max_price=1e6
+        )
+
+    def test_fitness(self):
+        """ Make sure fitness is the line up predicted points. """
+        cache = palpiteiro.draft.FitnessCache()
+        fitness, price, captain = cache.evaluate(self.line_up)
+        assert fitness == pytest.approx(self.line_up.predicted_points)
+        assert price == pytest.approx(self.line_up.price)
+        assert captain == self.line_up.captain
+
+    def test_hits(self):
+        """ Test hit and miss counters. """
+        cache = palpiteiro.draft.FitnessCache()
+        cache.fitness(self.line_up)
+        cache.fitness(self.line_up.copy())
+        assert cache.misses == 1
+        assert cache.hits == 1
+
+    def test_maxsize(self):
+        """ Make sure the cache does not grow beyond its max size. """
+        cache = palpiteiro.draft.FitnessCache(maxsize=10)
+        for _ in range(100):
+            cache.fitness(palpiteiro.draft.random_line_up(players, schemes, 1e6))
+        assert len(cache) == 10
+
+    def test_draft(self):
+        """ Make sure the draft reuses evaluations. """
+        cache = palpiteiro.draft.FitnessCache()
+        palpiteiro.draft.draft(
+            individuals=50,
+            generations=50,
+            players=players,
+            schemes=schemes,
+            max_price=100,
+            tournament_size=5,
+            cache=cache,
+        )
+        assert cache.hits > 0
+
+
+class TestIslandDraft:
+    """ Unit tests for island_draft function. """
+
+    def test_valid(self):
+        """ Make sure the drafted line up is valid and affordable. """
+        best_line_up = palpiteiro.draft.island_draft(
+            individuals=50,
+            generations=20,
+            players=players,
+            schemes=schemes,
+            max_price=100,
+            tournament_size=5,
+            islands=2,
+            migration_interval=10,
+            processes=2,
+        )
+        assert best_line_up.is_valid(schemes)
+        assert best_line_up.price <= 100
+
+    def test_generations_split(self):
+        """ Make sure islands share the generations instead of each running them. """
+        report = palpiteiro.draft.DraftReport()
+        palpiteiro.draft.island_draft(
+            individuals=20,
+            generations=21,
+            players=players,
+            schemes=schemes,
+            max_price=100,
+            tournament_size=5,
+            islands=3,
+            migration_interval=4,
+            processes=2,
+            report=report,
+        )
+        assert report.generations == 21
+        assert report.reason == palpiteiro.draft.DraftReport.GENERATIONS
+
+    def test_no_migrants(self):
+        """ Make sure islands can evolve without migrations. """
+        best_line_up = palpiteiro.draft.island_draft(
+            individuals=20,
+            generations=20,
+            players=players,
+            schemes=schemes,
+            max_price=100,
+            tournament_size=5,
+            islands=2,
+            migration_interval=5,
+            migrants=0,
+            processes=2,
+        )
+        assert best_line_up.is_valid(schemes)
+        assert best_line_up.price <= 100
+
+    def test_invalid_migrants(self):
+        """ Make sure migrants must fit in the populations. """
+        for migrants in [-1, 20]:
+            with pytest.raises(ValueError):
+                palpiteiro.draft.island_draft(
+                    individuals=20,
+                    generations=20,
+                    players=players,
+                    schemes=schemes,
+                    max_price=100,
+                    tournament_size=5,
+                    islands=2,
+                    migrants=migrants,
+                )
+
+    def test_time_budget(self):
+        """ Make sure islands stop when they run out of time. """
+        report = palpiteiro.draft.DraftReport()
+        start = time.time()
+        best_line_up = palpiteiro.draft.draft(
+            individuals=50,
+            generations=int(1e6),
+            players=players,
+            schemes=schemes,
+            max_price=100,
+            tournament_size=5,
+            method="island",
+            time_budget=2,
+            report=report,
+        )
+        assert time.time() - start < 10  # seconds, with workers start up.
+        assert report.reason == palpiteiro.draft.DraftReport.DEADLINE
+        assert best_line_up.predicted_points == pytest.approx(report.best_fitness)
+
+    def test_patience(self):
+        """ Make sure islands stop when the best line up stops improving. """
+        report = palpiteiro.draft.DraftReport()
+        palpiteiro.draft.draft(
+            individuals=20,
+            generations=int(1e6),
+            players=players,
+            schemes=schemes,
+            max_price=100,
+            tournament_size=5,
+            method="island",
+            patience=10,
+            report=report,
+        )
+        assert report.reason == palpiteiro.draft.DraftReport.PATIENCE
+        assert report.generations < 1e6
+
+
+class TestDraftOptions:
+    """ Unit tests for draft options support by each method. """
+
+    def test_unsupported(self):
+        """ Make sure options a method would ignore are rejected. """
+        for method, option in [
+            ("exact", {"time_budget": 10}),
+            ("exact", {"report": palpiteiro.draft.DraftReport()}),
+            ("array", {"observer": print}),
+            ("island", {"cache": palpiteiro.draft.FitnessCache()}),
+        ]:
+            with pytest.raises(ValueError):
+                palpiteiro.draft.draft(
+                    individuals=10,
+                    generations=1,
+                    players=players,
+                    schemes=schemes,
+                    max_price=100,
+                    tournament_size=5,
+                    method=method,
+                    **option,
+                )
+
+    def test_unknown(self):
+        """ Make sure unknown methods are rejected. """
+        with pytest.raises(ValueError):
+            palpiteiro.draft.draft(
+                individuals=10,
+                generations=1,
+                players=players,
+                schemes=schemes,
+                max_price=100,
+                tournament_size=5,
+                method="unknown",
+            )
+
+
+class TestEarlyStopping:
+    """ Unit tests for draft early stopping. """
+
+    def test_time_budget(self):
+        """ Make sure it stops when it runs out of time. """
+        report = palpiteiro.draft.DraftReport()
+        start = time.time()
+        best_line_up = palpiteiro.draft.draft(
+            individuals=100,
+            generations=int(1e6),
+            players=players,
+            schemes=schemes,
+            max_price=100,
+            tournament_size=5,
+            time_budget=1,
+            report=report,
+        )
+        end = time.time()
+        assert end - start < 2  # seconds
+        assert report.reason == palpiteiro.draft.DraftReport.DEADLINE
+        assert best_line_up.predicted_points == pytest.approx(report.best_fitness)
+
+    def test_patience(self):
+        """ Make sure it stops when the best line up stops improving. """
+        report = palpiteiro.draft.DraftReport()
+        palpiteiro.draft.draft(
+            individuals=50,
+            generations=int(1e6),
+            players=players,
+            schemes=schemes,
+            max_price=100,
+            tournament_size=5,
+            patience=10,
+            report=report,
+        )
+        assert report.reason == palpiteiro.draft.DraftReport.PATIENCE
+        assert report.generations < 1e6
+
+    def test_generations(self):
+        """ Make sure it reports running all generations. """
+        report = palpiteiro.draft.DraftReport()
+        palpiteiro.draft.draft(
+            individuals=50,
+            generations=10,
+            players=players,
+            schemes=schemes,
+            max_price=100,
+            tournament_size=5,
+            method="array",
+            report=report,
+        )
+        assert report.reason == palpiteiro.draft.DraftReport.GENERATIONS
+        assert report.generations == 10
+
+
+class TestGenerationRecorder:
+    """ Unit tests for draft observers and GenerationRecorder class. """
+
+    def setup_method(self):
+        """ Setup method. """
+        self.folder = tempfile.mkdtemp()
+        self.recorder = palpiteiro.draft.GenerationRecorder()
+        self.report = palpiteiro.draft.DraftReport()
+        palpiteiro.draft.draft(
+            individuals=20,
+            generations=10,
+            players=players,
+            schemes=schemes,
+            max_price=100,
+            tournament_size=5,
+            elite=2,
+            report=self.report,
+            observer=self.recorder,
+        )
+
+    def teardown_method(self):
+        """ Teardown method. """
+        shutil.rmtree(self.folder)
+
+    def test_generations(self):
+        """ Make sure every generation is observed. """
+        assert len(self.recorder) == self.report.generations == 10
+        stats = self.recorder.generations
+        assert [x.generation for x in stats] == list(range(10))
+        assert all(x.crossovers + x.mutations == 18 for x in stats)
+        assert all(x.best_fitness >= x.mean_fitness for x in stats)
+        assert all(0 < x.unique_ratio <= 1 for x in stats)
+        assert all(x.crossover_tries >= x.crossovers for x in stats)
+        assert all(x.mutation_tries >= x.mutations for x in stats)
+
+    def test_to_csv(self):
+        """ Test writing one row per generation. """
+        path = os.path.join(self.folder, "stats.csv")
+        self.recorder.to_csv(path)
+        with open(path, newline="", encoding="utf-8") as file:
+            rows = list(csv.DictReader(file))
+        assert len(rows) == 10
+        assert float(rows[-1]["best_fitness"]) == pytest.approx(
+            self.recorder.generations[-1].best_fitness
+        )
+
+    def test_to_json(self):
+        """ Test writing one object per generation. """
+        path = os.path.join(self.folder, "stats.json")
+        self.recorder.to_json(path)
+        with open(path, encoding="utf-8") as file:
+            stats = json.load(file)
+        assert stats[3] == self.recorder.generations[3]._asdict()
+
+    def test_operators_counters(self):
+        """ Make sure operators count their tries. """
+        counters = Counter()
+        line_up = palpiteiro.draft.random_line_up(players, schemes, 100)
+        palpiteiro.draft.mutate_line_up(
+            line_up, players, schemes, 100, counters=counters
+        )
+        palpiteiro.draft.crossover_line_up(line_up, line_up, 100, counters=counters)
+        assert counters["mutation_tries"] >= 1
+        assert counters["crossover_tries"] == 1
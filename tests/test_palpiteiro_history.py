@@ -0,0 +1,50 @@
+""" Unit-tests for palpiteiro.history """
+
+import pandas as pd
+import pytest
+
+import palpiteiro.history
+
+
+class TestLoadDataset:
+    """ Unit tests for load_dataset function. """
+
+    @classmethod
+    def setup_class(cls):
+        """ Setup class. """
+        cls.data = palpiteiro.history.load_dataset([2018])
+
+    def test_columns(self):
+        """ Make sure players have what the model needs and the actual points. """
+        for col in ["year", "round", "id", "club", "position_id", "status_id"]:
+            assert col in self.data.columns
+        for col in ["price", "variation", "mean", "matches", "last_points", "points"]:
+            assert col in self.data.columns
+        for col in ["win", "draw", "lose"]:
+            assert col in self.data.columns
+        assert (self.data["year"] == 2018).all()
+        assert not self.data.duplicated(["round", "id"]).any()
+
+    def test_previous_round(self):
+        """ Make sure numbers known before the round come from the previous one. """
+        season = palpiteiro.history.load_season(2018)
+        files = palpiteiro.history.round_files(2018)
+        first = palpiteiro.history.read_round(files[1]).set_index("id")
+        second = season[season["round"] == 2].set_index("id")
+        assert len(second) > 0
+        assert second["price"].equals(first.loc[second.index, "price"])
+        assert second["last_points"].equals(first.loc[second.index, "points"])
+
+    def test_odds(self):
+        """ Make sure almost every player has the odds of his club match. """
+        assert self.data["win"].notna().mean() > 0.95
+        row = self.data[(self.data["round"] == 2) & (self.data["name"] == "Juan")]
+        assert row["win"].iloc[0] == pytest.approx(1.41)
+        assert row["draw"].iloc[0] == pytest.approx(4.43)
+        assert row["lose"].iloc[0] == pytest.approx(8.00)
+
+
+def test_rounds():
+    """ Make sure rounds are listed once, in order. """
+    data = pd.DataFrame({"year": [2019, 2019, 2020, 2020], "round": [1, 1, 1, 2]})
+    assert palpiteiro.history.rounds(data) == [(2019, 1), (2020, 1), (2020, 2)]
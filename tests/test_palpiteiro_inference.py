@@ -0,0 +1,166 @@
+""" palpiteiro.inference unit-tests. """
+
+import os
+import shutil
+import tempfile
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.decomposition import PCA
+from sklearn.linear_model import RidgeCV
+from sklearn.neighbors import KNeighborsRegressor
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+import palpiteiro
+import palpiteiro.data
+import palpiteiro.inference
+
+THIS_FOLDER = os.path.dirname(__file__)
+
+
+class StackingEstimator(BaseEstimator, TransformerMixin):
+    """ Stack an estimator prediction as the first feature, like TPOT does. """
+
+    def __init__(self, estimator=None):
+        self.estimator = estimator
+
+    def fit(self, X, y=None):  # pylint: disable=invalid-name
+        """ Fit estimator. """
+        self.estimator.fit(X, y)
+        return self
+
+    def transform(self, X):  # pylint: disable=invalid-name
+        """ Stack estimator prediction. """
+        return np.hstack([np.reshape(self.estimator.predict(X), (-1, 1)), X])
+
+
+class TestKNNPredictor:
+    """ Test KNNPredictor class. """
+
+    @classmethod
+    def setup_class(cls):
+        """ Setup class. """
+        rng = np.random.default_rng(0)
+        cls.x = rng.normal(size=(300, 4))
+        cls.y = (cls.x @ [1.0, -2.0, 0.5, 0.0] + rng.normal(size=300)).reshape(-1, 1)
+        cls.queries = rng.normal(size=(50, 4))
+
+    def test_predict(self):
+        """ Make sure predictions match the pipeline ones. """
+        pipeline = make_pipeline(
+            StackingEstimator(estimator=RidgeCV()),
+            StandardScaler(),
+            KNeighborsRegressor(n_neighbors=9, p=1, weights="distance"),
+        ).fit(self.x, self.y)
+        predictor = palpiteiro.inference.KNNPredictor.from_pipeline(pipeline)
+        predictions = predictor.predict(self.queries)
+        assert predictions.shape == (50, 1)
+        np.testing.assert_allclose(
+            predictions, pipeline.predict(self.queries), rtol=1e-4, atol=1e-4
+        )
+
+    def test_uniform(self):
+        """ Test uniform weights and euclidean distance. """
+        pipeline = make_pipeline(KNeighborsRegressor(n_neighbors=5)).fit(
+            self.x, self.y.ravel()
+        )
+        predictor = palpiteiro.inference.KNNPredictor.from_pipeline(pipeline)
+        np.testing.assert_allclose(
+            predictor.predict(self.queries),
+            pipeline.predict(self.queries),
+            rtol=1e-4,
+            atol=1e-4,
+        )
+
+    def test_exact_match(self):
+        """ Make sure training samples are predicted as their own target. """
+        pipeline = make_pipeline(
+            KNeighborsRegressor(n_neighbors=9, p=1, weights="distance")
+        ).fit(self.x, self.y)
+        predictor = palpiteiro.inference.KNNPredictor.from_pipeline(pipeline)
+        np.testing.assert_allclose(
+            predictor.predict(self.x[:10]), self.y[:10], rtol=1e-6
+        )
+
+    def test_unsupported(self):
+        """ Make sure unsupported pipelines are kept as they are. """
+        pipeline = make_pipeline(PCA(2), KNeighborsRegressor()).fit(self.x, self.y)
+        with pytest.raises(ValueError):
+            palpiteiro.inference.KNNPredictor.from_pipeline(pipeline)
+        assert palpiteiro.inference.fast_predictor(pipeline) is pipeline
+
+    def test_model(self):
+        """ Make sure the shipped model predictions are reproduced. """
+        clubs = palpiteiro.data.get_clubs_with_odds(
+            "1902",
+            cache_folder=os.path.join(THIS_FOLDER, "data"),
+            cache_file="betting_lines.json",
+        )  # Fake key. But doesn't matter.
+        players = pd.read_csv(
+            os.path.join(THIS_FOLDER, "data", "players.csv"), index_col=0
+        )
+        _, features = palpiteiro.PlayerTable(players, clubs).features()
+
+        pipeline = joblib.load(palpiteiro.MODEL_PATH)
+        predictor = palpiteiro.inference.KNNPredictor.from_pipeline(pipeline)
+        np.testing.assert_allclose(
+            predictor.predict(features), pipeline.predict(features), atol=1e-3
+        )
+
+
+class TestArtifact:
+    """ Test memory-mapped model artifacts. """
+
+    def setup_method(self):
+        """ Setup method. """
+        self.folder = tempfile.mkdtemp()
+        self.artifact = os.path.join(self.folder, "model")
+        self.path = os.path.join(self.folder, "model.pkl")
+
+        rng = np.random.default_rng(0)
+        self.x = rng.normal(size=(300, 4))
+        self.y = self.x.sum(axis=1)
+        self.pipeline = make_pipeline(
+            StackingEstimator(estimator=RidgeCV()),
+            StandardScaler(),
+            KNeighborsRegressor(n_neighbors=9, p=1, weights="distance"),
+        ).fit(self.x, self.y)
+        joblib.dump(self.pipeline, self.path)
+
+    def teardown_method(self):
+        """ Teardown method. """
+        shutil.rmtree(self.folder)
+
+    def test_save_load(self):
+        """ Make sure loaded artifacts are memory-mapped and predict the same. """
+        predictor = palpiteiro.inference.KNNPredictor.from_pipeline(self.pipeline)
+        predictor.save(self.artifact)
+        loaded = palpiteiro.inference.KNNPredictor.load(self.artifact)
+        assert not loaded.fit_x.flags.owndata
+        assert not loaded.fit_x.flags.writeable
+        np.testing.assert_array_equal(
+            loaded.predict(self.x[:20]), predictor.predict(self.x[:20])
+        )
+
+    def test_load_model(self):
+        """ Make sure artifacts are used only while the pickled model is the same. """
+        palpiteiro.inference.export_model(self.path, self.artifact)
+        model = palpiteiro.inference.load_model(self.path, self.artifact)
+        assert not model.fit_x.flags.owndata
+
+        # Retrain.
+        self.pipeline.fit(self.x[:100], self.y[:100])
+        joblib.dump(self.pipeline, self.path)
+        model = palpiteiro.inference.load_model(self.path, self.artifact)
+        assert len(model.fit_x) == 100
+
+    def test_shipped_artifact(self):
+        """ Make sure the shipped artifact was exported from the shipped model. """
+        metadata = palpiteiro.inference.read_metadata(palpiteiro.MODEL_ARTIFACT_PATH)
+        assert metadata["source_sha1"] == palpiteiro.inference.file_sha1(
+            palpiteiro.MODEL_PATH
+        )
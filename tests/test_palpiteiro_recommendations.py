@@ -0,0 +1,69 @@
+""" Unit-tests for palpiteiro.recommendations """
+
+import os
+
+import pandas as pd
+import pytest
+
+import palpiteiro
+import palpiteiro.data
+import palpiteiro.draft
+import palpiteiro.recommendations
+
+THIS_FOLDER = os.path.dirname(__file__)
+
+
+# Get clubs.
+clubs = palpiteiro.data.get_clubs_with_odds(
+    "1902",
+    cache_folder=os.path.join(THIS_FOLDER, "data"),
+    cache_file="betting_lines.json",
+)
+
+# Initialize Cartola FC API.
+cartola_fc_api = palpiteiro.data.CartolaFCAPI()
+
+# Players.
+players = palpiteiro.create_all_players(cartola_fc_api.players(), clubs)
+players = [player for player in players if player.status in [2, 7]]
+players = [player for player in players if pd.notna(player.club.win_odds)]
+
+# Schemes.
+schemes = palpiteiro.create_schemes(cartola_fc_api.schemes())
+
+
+class TestRecommendationTable:
+    """ Unit tests for RecommendationTable class. """
+
+    @classmethod
+    def setup_class(cls):
+        """ Setup class. """
+        cls.table = palpiteiro.recommendations.RecommendationTable.precompute(
+            players, schemes, step=0.5
+        )
+        cls.max_price = palpiteiro.recommendations.max_line_up_price(players, schemes)
+
+    def test_grid(self):
+        """ Make sure there is a budget every step up to the most expensive line-up. """
+        budgets = sorted(self.table.line_ups)
+        assert budgets[0] == 50
+        assert all(b - a == 50 for a, b in zip(budgets[:-2], budgets[1:-1]))
+        assert budgets[-1] == palpiteiro.draft.to_cents(self.max_price)
+
+    def test_line_up(self):
+        """ Make sure line-ups are the best ones for the grid budget below. """
+        line_up = self.table.line_up(100.3)
+        expected = palpiteiro.draft.exact_draft(players, schemes, 100)
+        assert line_up.price <= 100
+        assert line_up.is_valid(schemes)
+        assert line_up.predicted_points == pytest.approx(expected.predicted_points)
+
+    def test_larger_budgets(self):
+        """ Make sure budgets above the most expensive line-up are answered. """
+        assert self.table.line_up(1e6) is self.table.line_up(self.max_price)
+        assert self.table.line_up(1e6) is not None
+
+    def test_infeasible(self):
+        """ Make sure there are no line-ups below the cheapest one. """
+        assert self.table.line_up(0) is None
+        assert self.table.line_up(0.4) is None
@@ -0,0 +1,99 @@
+""" Unit-tests for palpiteiro.training """
+
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from sklearn.neighbors import KNeighborsRegressor
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+import palpiteiro.dataset
+import palpiteiro.inference
+import palpiteiro.training
+
+# Candidates of a small pipeline.
+GRID = {"kneighborsregressor__n_neighbors": [5, 15]}
+
+
+class TestTrain:
+    """ Unit tests for train, save and install functions. """
+
+    @classmethod
+    def setup_class(cls):
+        """ Setup class. """
+        cls.folder = tempfile.mkdtemp()
+        cls.cache_folder = os.path.join(cls.folder, "columnar")
+        cls.memory = os.path.join(cls.folder, "memory")
+        cls.model, cls.metrics = cls.train(memory=cls.memory)
+
+    @classmethod
+    def teardown_class(cls):
+        """ Teardown class. """
+        shutil.rmtree(cls.folder)
+
+    @classmethod
+    def train(cls, memory=None):
+        """ Train a small pipeline on a season. """
+        pipeline = make_pipeline(
+            StandardScaler(), KNeighborsRegressor(weights="distance")
+        )
+        return palpiteiro.training.train(
+            [2020],
+            cache_folder=cls.cache_folder,
+            pipeline=pipeline,
+            grid=GRID,
+            folds=3,
+            n_jobs=2,
+            memory=memory,
+        )
+
+    def test_metrics(self):
+        """ Make sure metrics tell the errors and time of the best candidate. """
+        assert self.metrics["years"] == [2020]
+        assert self.metrics["candidates"] == 2
+        assert self.metrics["params"]["kneighborsregressor__n_neighbors"] in [5, 15]
+        assert self.metrics["errors"]["mse"]["mean"] > 0
+        assert self.metrics["errors"]["mae"]["mean"] > 0
+        assert self.metrics["seconds"]["total"] >= self.metrics["seconds"]["search"]
+        json.dumps(self.metrics)
+
+    def test_memory(self):
+        """ Make sure fitted steps are cached, but the model doesn't point there. """
+        assert os.listdir(self.memory)
+        assert self.model.memory is None
+
+    def test_reproducible(self):
+        """ Make sure the same data leads to the same model version. """
+        models_folder = os.path.join(self.folder, "models")
+        first = palpiteiro.training.save(self.model, self.metrics, models_folder)
+        model, metrics = self.train()
+        second = palpiteiro.training.save(model, metrics, models_folder)
+        assert first == second
+        assert os.listdir(models_folder) == [os.path.basename(first)]
+        with open(os.path.join(first, "metrics.json"), encoding="utf-8") as file:
+            assert json.load(file)["version"] == os.path.basename(first)
+
+    def test_install(self):
+        """ Make sure installed models are exported as an artifact. """
+        version_folder = palpiteiro.training.save(
+            self.model, self.metrics, os.path.join(self.folder, "models")
+        )
+        path = os.path.join(self.folder, "model.pkl")
+        artifact = os.path.join(self.folder, "model")
+        palpiteiro.training.install(version_folder, path, artifact)
+
+        predictor = palpiteiro.inference.load_model(path, artifact)
+        assert isinstance(predictor, palpiteiro.inference.KNNPredictor)
+        columns = palpiteiro.dataset.load_columns(
+            [2020], cache_folder=self.cache_folder
+        )
+        x, _ = palpiteiro.dataset.features(columns)
+        np.testing.assert_allclose(
+            predictor.predict(x[:50]).ravel(),
+            self.model.predict(x[:50]).ravel(),
+            rtol=1e-4,
+            atol=1e-4,
+        )